@@ -0,0 +1,105 @@
+"""Микробенчмарк: сборка текста и клавиатур одного ответа бота.
+
+Сравнивает прежний способ (format() шаблона и новые объекты кнопок на каждое обновление)
+с разобранными шаблонами и заранее собранными клавиатурами, затем проверяет, что время сборки
+страницы вакансии не зависит от количества вакансий.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_dialog_render
+"""
+import timeit
+import tracemalloc
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.config import PRESENTATION, CANDIDATE_STATUSES, COMPANY_NAME, DEFAULT_VACANCIES
+from bot.scripts.dialog import DIALOG_SCRIPTS
+from bot.scripts.templates import DialogTemplates
+from bot.scripts.keyboards import PRESENTATION_KEYBOARD, status_keyboard
+from bot.handlers.callbacks import DIALOG_PRESENTATION, DIALOG_BACK, SET_STATUS, BACK_TO_CANDIDATES
+
+NAME = "Иван Петров"
+CANDIDATE_ID = "a1b2c3d4"
+ITERATIONS = 20000
+VACANCY_ID = 1
+VACANCY = DEFAULT_VACANCIES[VACANCY_ID]
+
+
+def presentation_before():
+    """Этап презентации: format() и новая клавиатура."""
+    text = DIALOG_SCRIPTS[PRESENTATION].format(
+        name=NAME, company=COMPANY_NAME, vacancy=VACANCY['title'],
+        description=VACANCY['description'], salary=VACANCY['salary']
+    )
+    keyboard = [
+        [InlineKeyboardButton("✅ Да", callback_data=DIALOG_PRESENTATION.encode("yes"))],
+        [InlineKeyboardButton("❌ Нет", callback_data=DIALOG_PRESENTATION.encode("no"))],
+        [InlineKeyboardButton("🔙 Назад", callback_data=DIALOG_BACK.encode("research"))]
+    ]
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+def presentation_after():
+    """Этап презентации: разобранная страница вакансии и готовая клавиатура."""
+    return DialogTemplates.render(PRESENTATION, VACANCY['id'], name=NAME), PRESENTATION_KEYBOARD
+
+
+def status_picker_before():
+    """Выбор статуса: клавиатура собирается заново на каждое нажатие."""
+    status_emojis = ["📞", "📝", "✅", "❌", "🕒"]
+    keyboard = []
+    for i, status in enumerate(CANDIDATE_STATUSES):
+        emoji = status_emojis[i] if i < len(status_emojis) else "📌"
+        keyboard.append([InlineKeyboardButton(f"{emoji} {status}", callback_data=SET_STATUS.encode(CANDIDATE_ID, i))])
+    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data=BACK_TO_CANDIDATES.encode("status"))])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def status_picker_after():
+    """Выбор статуса: клавиатура кандидата берется из кэша."""
+    return status_keyboard(CANDIDATE_ID)
+
+
+def measure(func):
+    """Возвращает время одного вызова в микросекундах и выделенную за вызов память в байтах."""
+    func()
+    seconds = timeit.timeit(func, number=ITERATIONS)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [func() for _ in range(1000)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del results
+
+    return seconds / ITERATIONS * 1e6, allocated / 1000
+
+
+def main():
+    """Печатает таблицу сравнения."""
+    DialogTemplates.warm_up(DEFAULT_VACANCIES)
+    assert presentation_before()[0] == presentation_after()[0]
+    cases = [
+        ("презентация", presentation_before, presentation_after),
+        ("выбор статуса", status_picker_before, status_picker_after),
+    ]
+    print(f"{'ответ':<16}{'было, мкс':>12}{'стало, мкс':>12}{'было, байт':>12}{'стало, байт':>13}")
+    for title, before, after in cases:
+        before_time, before_memory = measure(before)
+        after_time, after_memory = measure(after)
+        print(f"{title:<16}{before_time:>12.2f}{after_time:>12.2f}{before_memory:>12.0f}{after_memory:>13.0f}")
+
+    # Страницы разбираются при загрузке вакансий, сборка ответа от их количества не зависит
+    timings = {}
+    for count in (len(DEFAULT_VACANCIES), 1000, 10000):
+        vacancies = [dict(VACANCY, id=i + 1, title=f"{VACANCY['title']} {i}") for i in range(count)]
+        started = timeit.default_timer()
+        DialogTemplates.warm_up(vacancies)
+        warm_up = timeit.default_timer() - started
+        timings[count] = measure(lambda: DialogTemplates.render(PRESENTATION, count, name=NAME))[0]
+        print(f"{count:>6} вакансий: разбор страниц {warm_up * 1000:.1f} мс, презентация {timings[count]:.2f} мкс")
+    assert timings[10000] < timings[len(DEFAULT_VACANCIES)] * 2
+
+
+if __name__ == "__main__":
+    main()
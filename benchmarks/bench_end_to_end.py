@@ -0,0 +1,218 @@
+"""Сквозной замер пропускной способности бота на синтетических обновлениях.
+
+Приложение собирается через HRBot.setup с поддельным Bot API без сети. Кандидаты
+одновременно проходят /dialog от приветствия до подтверждения, рекрутеры в это время
+вызывают /status, /rejection, /analytics и листают списки. Для каждого объема базы
+кандидатов печатаются обновления в секунду и p50/p95/p99 задержки обработки, а результат
+сохраняется в JSON для сравнения между коммитами.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_end_to_end
+    python -m benchmarks.bench_end_to_end --sizes 1000 10000 --compare bench_end_to_end-<коммит>.json
+"""
+import os
+
+# Лимиты Telegram к поддельному Bot API не относятся, а журнал каждого обновления искажает замер.
+# Настройки читаются при импорте бота, поэтому задаются до него
+os.environ.setdefault('FLOOD_GLOBAL_RATE', '1000000')
+os.environ.setdefault('FLOOD_CHAT_RATE', '1000000')
+os.environ.setdefault('FLOOD_CHAT_BURST', '1000000')
+os.environ.setdefault('FLOOD_GROUP_RATE', '60000000')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import argparse
+import asyncio
+import json
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from bot.bot import HRBot
+from bot.config import CONCURRENT_UPDATES, STORAGE_BACKEND, STORAGE_DURABILITY, DEFAULT_VACANCIES
+from bot.database.storage import DataStorage
+from bot.handlers.callbacks import (
+    DIALOG_VACANCY, DIALOG_INTRO, DIALOG_PRESENTATION, DIALOG_INVITATION, DIALOG_CONFIRMATION, CANDIDATES_PAGE
+)
+from benchmarks.datasets import make_candidates
+from benchmarks.fake_bot import OfflineRequest, make_message_update, make_callback_update
+
+SIZES = [1000, 10000, 100000]
+CANDIDATES = 200
+RECRUITERS = 10
+RECRUITER_ROUNDS = 5
+
+
+def dialog_steps(chat_id):
+    """Обновления кандидата, который проходит диалог целиком и соглашается на собеседование.
+
+    Половина кандидатов приходит по ссылке на вакансию, половина выбирает вакансию в /dialog.
+    """
+    vacancy_id = DEFAULT_VACANCIES[chat_id % len(DEFAULT_VACANCIES)]['id']
+    if chat_id % 2:
+        start = [('message', "/dialog"), ('callback', DIALOG_VACANCY.encode(vacancy_id))]
+    else:
+        start = [('message', f"/start v{vacancy_id}")]
+    return start + [
+        ('callback', DIALOG_INTRO.encode("yes")),
+        ('message', f"Кандидат {chat_id}"),
+        ('message', "Интересует работа рядом с домом, полный день"),
+        ('callback', DIALOG_PRESENTATION.encode("yes")),
+        ('callback', DIALOG_INVITATION.encode("yes")),
+        ('callback', DIALOG_CONFIRMATION.encode("yes")),
+    ]
+
+
+def recruiter_steps(round_number):
+    """Обновления рекрутера: списки кандидатов с фильтрами, листание и аналитика."""
+    return [
+        ('message', "/status"),
+        ('callback', CANDIDATES_PAGE.encode("status", 10, None, None)),
+        ('message', f"/status status={round_number % 4 + 1}"),
+        ('message', "/rejection"),
+        ('callback', CANDIDATES_PAGE.encode("reason", 20, None, None)),
+        ('message', "/analytics" if round_number == 0 else "/analytics new"),
+    ]
+
+
+class Driver:
+    """Подает обновления в приложение так же, как Application при получении их из очереди."""
+
+    def __init__(self, application):
+        self.application = application
+        self.update_id = 0
+        self.latencies = {}
+
+    async def send(self, scenario, chat_id, kind, payload):
+        """Обрабатывает одно обновление и запоминает задержку его обработки."""
+        self.update_id += 1
+        bot = self.application.bot
+        if kind == 'message':
+            update = make_message_update(self.update_id, chat_id, payload, bot)
+        else:
+            update = make_callback_update(self.update_id, chat_id, payload, bot)
+        started = time.perf_counter()
+        await self.application.update_processor.process_update(update, self.application.process_update(update))
+        self.latencies.setdefault(scenario, []).append(time.perf_counter() - started)
+
+    async def walk(self, scenario, chat_id, steps):
+        """Отправляет обновления одного чата по очереди, как живой собеседник."""
+        for kind, payload in steps:
+            await self.send(scenario, chat_id, kind, payload)
+
+
+def percentiles(values):
+    """p50/p95/p99 задержки в миллисекундах."""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {
+        f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+        for p in (50, 95, 99)
+    }
+
+
+async def run_size(application, size):
+    """Загружает size кандидатов и прогоняет диалоги и запросы рекрутеров одновременно."""
+    DataStorage.save_candidates(make_candidates(size))
+    driver = Driver(application)
+    base = size * 10
+
+    walkers = [
+        driver.walk('dialog', base + chat_id, dialog_steps(base + chat_id))
+        for chat_id in range(1, CANDIDATES + 1)
+    ]
+    walkers += [
+        driver.walk('recruiter', recruiter, [step for r in range(RECRUITER_ROUNDS) for step in recruiter_steps(r)])
+        for recruiter in range(1, RECRUITERS + 1)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*walkers)
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(values) for values in driver.latencies.values())
+    result = {
+        'stored_candidates': size,
+        'updates': total,
+        'seconds': round(elapsed, 3),
+        'updates_per_second': round(total / elapsed, 1),
+        'latency_ms': percentiles([value for values in driver.latencies.values() for value in values]),
+    }
+    for scenario, values in driver.latencies.items():
+        result[f"{scenario}_latency_ms"] = percentiles(values)
+    return result
+
+
+def git_commit():
+    """Короткий хеш текущего коммита (None, если git недоступен)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous):
+    """Печатает изменение пропускной способности и p95 относительно прошлого прогона."""
+    before = {run['stored_candidates']: run for run in previous['runs']}
+    print(f"Сравнение с {previous.get('commit')}:")
+    for run in results['runs']:
+        old = before.get(run['stored_candidates'])
+        if old is None:
+            continue
+        throughput = run['updates_per_second'] / old['updates_per_second']
+        p95 = run['latency_ms']['p95'] / old['latency_ms']['p95']
+        print(f"  {run['stored_candidates']:>7} кандидатов: обновлений в секунду x{throughput:.2f}, p95 x{p95:.2f}")
+
+
+async def main(sizes):
+    """Собирает приложение и прогоняет замеры для всех объемов базы."""
+    request = OfflineRequest()
+    hr_bot = HRBot("1:offline", request=request)
+    hr_bot.setup()
+    application = hr_bot.application
+    await application.initialize()
+    await hr_bot.on_startup(application)
+
+    runs = []
+    for size in sizes:
+        run = await run_size(application, size)
+        runs.append(run)
+        print(f"{size:>7} кандидатов: {run['updates']} обновлений за {run['seconds']} с, "
+              f"{run['updates_per_second']} в секунду, задержка {run['latency_ms']}, "
+              f"диалог {run['dialog_latency_ms']}, рекрутеры {run['recruiter_latency_ms']}")
+
+    await application.shutdown()
+    await hr_bot.on_shutdown(application)
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'storage_backend': STORAGE_BACKEND,
+        'storage_durability': STORAGE_DURABILITY,
+        'concurrent_updates': CONCURRENT_UPDATES,
+        'candidates_in_dialog': CANDIDATES,
+        'recruiters': RECRUITERS,
+        'bot_api_calls': request.calls,
+        'runs': runs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="объемы базы кандидатов")
+    parser.add_argument('--output', help="файл для результатов (по умолчанию bench_end_to_end-<коммит>.json)")
+    parser.add_argument('--compare', help="результаты прошлого прогона для сравнения")
+    args = parser.parse_args()
+    commit = git_commit()
+    output = os.path.abspath(args.output or f"bench_end_to_end-{commit or 'local'}.json")
+    previous = os.path.abspath(args.compare) if args.compare else None
+
+    # Хранилище работает с файлами в текущем каталоге, поэтому запускаемся во временном
+    os.chdir(tempfile.mkdtemp())
+    results = dict(commit=commit, **asyncio.run(main(args.sizes)))
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+    if previous:
+        with open(previous, encoding='utf-8') as file:
+            compare(results, json.load(file))
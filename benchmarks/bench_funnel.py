@@ -0,0 +1,176 @@
+"""Проверка воронки диалогов и времени на этапах, замер отчета по суточным итогам.
+
+Кандидаты проходят /dialog через HRBot.setup на поддельном Bot API и останавливаются на разных
+этапах; воронка должна насчитать ровно столько кандидатов на каждом этапе и переходов между ними,
+а в записи кандидата должно остаться время этапов. Затем база итогов заполняется тремя годами
+истории по 20 вакансиям и замеряется отчет за 90 дней: он читает 90 строк на вакансию независимо
+от длины истории. Наконец перцентили наброска сравниваются с точными.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_funnel
+"""
+import os
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from bot.bot import HRBot
+from bot.config import INTRO, RESEARCH, DEFAULT_VACANCIES
+from bot.database.funnel import FunnelStore
+from bot.database.storage import DataStorage
+from bot.database.vacancies import VacancyCatalog
+from bot.utils.analytics import AnalyticsHelper
+from bot.utils.funnel import DialogFunnel, QuantileSketch, funnel
+from benchmarks.bench_end_to_end import Driver, dialog_steps
+from benchmarks.fake_bot import OfflineRequest
+
+CANDIDATES = 140
+HISTORY_DAYS = 3 * 365
+HISTORY_VACANCIES = 20
+# ID вакансий истории не пересекаются с вакансиями из настроек и вакансией проверки повторного показа
+HISTORY_FIRST_ID = 100
+TEST_VACANCY_ID = 99
+ITERATIONS = 200
+SAMPLES = 100000
+
+
+def stop_after(chat_id):
+    """Сколько шагов после начала диалога делает кандидат (0-6), чтобы остановиться на разных этапах."""
+    return chat_id % 7
+
+
+def expected_stages(steps):
+    """Сколько этапов воронки проходит кандидат, сделавший steps шагов после начала диалога."""
+    # Имя -> знакомство, ответ о предпочтениях -> презентация, "да" -> приглашение, "да" -> подтверждение
+    return 1 + sum(steps >= threshold for threshold in (2, 3, 4, 5))
+
+
+async def run_dialogs():
+    """Прогоняет диалоги через приложение и возвращает ожидаемые счетчики по этапам и число замеров времени."""
+    bot = HRBot("1:offline", request=OfflineRequest())
+    bot.setup()
+    application = bot.application
+    await application.initialize()
+    await application.start()
+    driver = Driver(application)
+
+    expected = [0] * len(DialogFunnel.STAGES)
+    timed = 0
+    walkers = []
+    for chat_id in range(1, CANDIDATES + 1):
+        steps = dialog_steps(chat_id)
+        start = len(steps) - 6
+        walkers.append(driver.walk('dialog', chat_id, steps[:start + stop_after(chat_id)]))
+        stages = expected_stages(stop_after(chat_id))
+        for stage in range(stages):
+            expected[stage] += 1
+        # Переходы между этапами и ответ на подтверждение, завершающий диалог
+        timed += stages - 1 + (stop_after(chat_id) == 6)
+    await asyncio.gather(*walkers)
+
+    await application.stop()
+    await application.shutdown()
+    return expected, timed
+
+
+def fill_history(store, today):
+    """Заполняет итоги за HISTORY_DAYS дней по HISTORY_VACANCIES вакансиям."""
+    increments = {}
+    for offset in range(HISTORY_DAYS):
+        day = (today - timedelta(days=offset)).isoformat()
+        for vacancy in range(HISTORY_VACANCIES):
+            increments[(day, HISTORY_FIRST_ID + vacancy)] = [50, 40, 30, 10, 5]
+    store.add(increments)
+    return len(increments)
+
+
+def measure(func, *args):
+    """Среднее время вызова в миллисекундах."""
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        result = func(*args)
+    return result, (time.perf_counter() - started) / ITERATIONS * 1000
+
+
+def main():
+    """Прогоняет проверки и замеры."""
+    expected, timed = asyncio.run(run_dialogs())
+    report = funnel.report(days=1)
+    print(f"Воронка {CANDIDATES} диалогов: {report['total']} (ожидалось {expected})")
+    assert report['total'] == expected
+    assert sum(counts[0] for counts in report['by_vacancy'].values()) == CANDIDATES
+    assert set(report['by_vacancy']) == {VacancyCatalog.vacancy_id(vacancy) for vacancy in DEFAULT_VACANCIES}
+    print(AnalyticsHelper.generate_funnel_text(days=1))
+
+    timing = funnel.timing_report()
+    assert sum(sketch.count for sketch in timing['total'].values()) == timed
+    print(AnalyticsHelper.generate_timing_text())
+    # Завершенные диалоги сохраняют время всех пяти этапов и ответа на последний
+    finished = [candidate for candidate in DataStorage.get_candidates() if 'stage_times' in candidate]
+    assert len(finished) == CANDIDATES // 7
+    for candidate in finished:
+        stages = candidate['stage_times']['stages']
+        assert len(stages) == 5 and stages == sorted(stages) and candidate['stage_times']['end'] >= stages[-1]
+    print(f"Время этапов в записи кандидата: {finished[0]['stage_times']}")
+
+    # Повторный показ этапа (кнопка "Назад") не учитывается
+    history = DialogFunnel(FunnelStore('history.db'), max_delay=0)
+    context = SimpleNamespace(user_data={
+        'dialog_start_time': date.today().isoformat(), 'dialog_vacancy': "Тест", 'vacancy_id': TEST_VACANCY_ID
+    })
+    assert history.reach(context, INTRO) and history.reach(context, RESEARCH)
+    assert not history.reach(context, INTRO) and not history.reach(context, RESEARCH)
+
+    today = date.today()
+    rows = fill_history(history.store, today)
+    vacancy_report, per_vacancy = measure(history.report, 90, 'day', HISTORY_FIRST_ID + 3)
+    all_report, all_vacancies = measure(history.report, 90, 'week')
+    _, full_history = measure(history.report, HISTORY_DAYS, 'month')
+    print(f"Итоги: {rows} строк. Отчет за 90 дней по вакансии: {vacancy_report['rows']} строк, {per_vacancy:.2f} мс; "
+          f"по всем вакансиям: {all_report['rows']} строк, {all_vacancies:.2f} мс; "
+          f"за всю историю: {full_history:.2f} мс")
+    assert vacancy_report['rows'] == 90
+    # Плюс строка вакансии "Тест" из проверки повторного показа
+    assert all_report['rows'] == 90 * HISTORY_VACANCIES + 1
+    assert vacancy_report['total'] == [50 * 90, 40 * 90, 30 * 90, 10 * 90, 5 * 90]
+    # Группировка по неделям и месяцам не меняет итог
+    assert all_report['total'] == history.report(90, 'month')['total']
+    assert sum(counts[0] for counts in all_report['by_period'].values()) == 50 * 90 * HISTORY_VACANCIES + 1
+
+    # Отметка этапа в обработчике - только прибавка счетчика в памяти
+    delayed = DialogFunnel(FunnelStore('delayed.db'))
+    contexts = [SimpleNamespace(user_data={'dialog_vacancy': "Тест", 'vacancy_id': TEST_VACANCY_ID}) for _ in range(100000)]
+    started = time.perf_counter()
+    for context in contexts:
+        delayed.reach(context, INTRO)
+    per_reach = (time.perf_counter() - started) / len(contexts) * 1e6
+    print(f"Отметка этапа: {per_reach:.2f} мкс, записей итогов: {delayed.stats()['flushes']}")
+    assert per_reach < 20
+    delayed.flush()
+    assert delayed.report(1)['total'][0] == len(contexts)
+
+    # Перцентили наброска против точных на времени ответа от секунд до суток
+    values = [random.lognormvariate(4, 2) for _ in range(SAMPLES)]
+    sketch = QuantileSketch(DialogFunnel.TIMING_ACCURACY)
+    started = time.perf_counter()
+    for value in values:
+        sketch.add(value)
+    per_add = (time.perf_counter() - started) / SAMPLES * 1e6
+    exact = statistics.quantiles(values, n=100, method='inclusive')
+    errors = {p: abs(sketch.quantile(p / 100) / exact[p - 1] - 1) for p in (50, 90, 99)}
+    print(f"Набросок: {len(sketch.counts)} корзин на {SAMPLES} значений, добавление {per_add:.2f} мкс, "
+          f"погрешность p50/p90/p99: " + ", ".join(f"{error:.2%}" for error in errors.values()))
+    assert all(error <= DialogFunnel.TIMING_ACCURACY * 1.5 for error in errors.values())
+
+
+if __name__ == "__main__":
+    # Базы бота создаются в текущем каталоге, поэтому запускаемся во временном
+    os.chdir(tempfile.mkdtemp())
+    main()
@@ -0,0 +1,87 @@
+"""Микробенчмарк: стоимость замеров обработчиков и хранилища.
+
+Сравнивает вызов обработчика и метода DataStorage с выключенными и включенными метриками
+и проверяет, что сервер метрик отдает гистограммы в формате Prometheus.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_metrics
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from bot.database.storage import DataStorage
+from bot.utils.metrics import Metrics, metrics
+from benchmarks.fake_bot import make_callback_update
+
+ITERATIONS = 50000
+PORT = 18765
+
+
+async def handler(update, context):
+    """Обработчик без работы: замеряется только обертка."""
+    return None
+
+
+async def time_handler(callback, update):
+    """Время одного вызова обработчика в микросекундах."""
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await callback(update, None)
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+def time_storage():
+    """Время одного чтения кандидата из хранилища в микросекундах."""
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        DataStorage.count_candidates()
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+async def fetch(path):
+    """Запрашивает страницу сервера метрик и возвращает строку статуса и тело."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = (await reader.read()).decode()
+    writer.close()
+    head, _, body = response.partition("\r\n\r\n")
+    return head.split("\r\n", 1)[0], body
+
+
+async def main():
+    """Прогоняет замеры и проверяет выдачу сервера."""
+    update = make_callback_update(1, 42, "pg:status:0::", None)
+    collector = Metrics(enabled=True)
+
+    plain = await time_handler(handler, update)
+    wrapped = await time_handler(collector.timed(handler), update)
+    print(f"Обработчик: без замеров {plain:.2f} мкс, с замерами {wrapped:.2f} мкс")
+
+    metrics.enabled = False
+    storage_off = time_storage()
+    metrics.enabled = True
+    storage_on = time_storage()
+    print(f"DataStorage.count_candidates: метрики выключены {storage_off:.2f} мкс, включены {storage_on:.2f} мкс")
+    assert wrapped - plain < 10 and storage_on - storage_off < 10, "замеры не должны заметно замедлять вызовы"
+
+    collector.register_collector('cache', DataStorage.get_cache_stats)
+    await collector.start_server('127.0.0.1', PORT)
+    status, body = await fetch('/metrics')
+    missing_status, _ = await fetch('/other')
+    await collector.stop_server()
+    print(f"GET /metrics: {status}, {len(body.splitlines())} строк; GET /other: {missing_status}")
+    assert status.endswith("200 OK") and missing_status.endswith("404 Not Found")
+    assert f'hr_bot_handler_seconds_count{{handler="handler",prefix="pg"}} {ITERATIONS}' in body
+    assert 'hr_bot_cache_hits' in body
+    assert f'hr_bot_storage_seconds_count{{method="count_candidates",kind="read"}} {ITERATIONS}' in metrics.render()
+
+    DataStorage.flush()
+
+
+if __name__ == "__main__":
+    # Хранилище работает с файлами в текущем каталоге, поэтому запускаемся во временном
+    os.chdir(tempfile.mkdtemp())
+    asyncio.run(main())
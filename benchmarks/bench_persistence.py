@@ -0,0 +1,115 @@
+"""Микробенчмарк: накладные расходы сохранения состояния бота на одно обновление.
+
+Повторяет работу Application: после обновлений данные изменившихся пользователей и
+новые этапы диалогов передаются в хранилище раз в интервал сохранения. Сравнивает
+SQLitePersistence с PicklePersistence из python-telegram-bot и проверяет, что после
+перезапуска каждый чат возвращается ровно на свой этап диалога.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_persistence
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from telegram.ext import PicklePersistence, PersistenceInput
+
+from bot.config import INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION
+from bot.database.persistence import SQLitePersistence
+
+CHATS = 300
+UPDATES = 2000
+# Сколько обновлений приходит за один интервал сохранения
+UPDATES_PER_FLUSH = 100
+STATES = [INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION]
+NAME = "hr_dialog"
+
+
+def make_workload():
+    """Обновления от случайных чатов: каждое меняет этап диалога и данные пользователя."""
+    rng = random.Random(1)
+    workload = []
+    for _ in range(UPDATES):
+        chat_id = rng.randint(1, CHATS)
+        state = rng.choice(STATES + [None])
+        workload.append((chat_id, state, {
+            'dialog_start_time': datetime(2026, 1, 1).isoformat(),
+            'vacancy_id': 1,
+            'candidate_name': f"Кандидат {chat_id}",
+            'preferences': "Удаленная работа, гибкий график " * 3,
+            'step': rng.randint(0, 100),
+        }))
+    return workload
+
+
+async def replay(persistence, workload):
+    """Прогоняет обновления и возвращает ожидаемые состояния и время на одно обновление."""
+    conversations = {}
+    user_data = {}
+    started = time.perf_counter()
+    for offset in range(0, len(workload), UPDATES_PER_FLUSH):
+        batch = workload[offset:offset + UPDATES_PER_FLUSH]
+        changed_users = set()
+        changed_conversations = set()
+        for chat_id, state, data in batch:
+            key = (chat_id, chat_id)
+            if state is None:
+                conversations.pop(key, None)
+            else:
+                conversations[key] = state
+            user_data[chat_id] = dict(data)
+            changed_users.add(chat_id)
+            changed_conversations.add(key)
+
+        # Как Application.update_persistence: только изменившиеся записи, затем ожидание записи
+        await asyncio.gather(
+            *[persistence.update_user_data(user_id, user_data[user_id]) for user_id in changed_users],
+            *[persistence.update_conversation(NAME, key, conversations.get(key)) for key in changed_conversations]
+        )
+        if isinstance(persistence, SQLitePersistence):
+            await persistence._flush_task
+    await persistence.flush()
+    elapsed = time.perf_counter() - started
+    return conversations, user_data, elapsed / len(workload) * 1e6
+
+
+async def restored(persistence):
+    """Читает состояние так, как его читает Application при запуске."""
+    return await persistence.get_conversations(NAME), await persistence.get_user_data()
+
+
+async def main():
+    """Прогоняет нагрузку на обоих хранилищах и сравнивает результат."""
+    workload = make_workload()
+    directory = tempfile.mkdtemp()
+    print(f"{UPDATES} обновлений от {CHATS} чатов, сохранение каждые {UPDATES_PER_FLUSH} обновлений")
+
+    pickle = PicklePersistence(
+        os.path.join(directory, "state.pickle"),
+        store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+        on_flush=False
+    )
+    await pickle.get_user_data()
+    await pickle.get_conversations(NAME)
+    _, _, pickle_cost = await replay(pickle, workload)
+    print(f"  PicklePersistence:  {pickle_cost:8.1f} мкс на обновление")
+
+    sqlite = SQLitePersistence(os.path.join(directory, "state.db"))
+    await sqlite.get_user_data()
+    await sqlite.get_conversations(NAME)
+    conversations, user_data, sqlite_cost = await replay(sqlite, workload)
+    print(f"  SQLitePersistence:  {sqlite_cost:8.1f} мкс на обновление, {sqlite.stats()}")
+
+    # Перезапуск: новый экземпляр читает файл, созданный предыдущим
+    loaded_conversations, loaded_user_data = await restored(SQLitePersistence(os.path.join(directory, "state.db")))
+    print(f"  после перезапуска: {len(loaded_conversations)} незавершенных диалогов, "
+          f"{len(loaded_user_data)} пользователей")
+    assert loaded_conversations == conversations, "этапы диалогов не восстановились"
+    assert loaded_user_data == user_data, "данные пользователей не восстановились"
+    assert sqlite_cost < pickle_cost
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""Микробенчмарк хранилища и аналитики на наборах кандидатов разного размера.
+
+Для каждого способа хранения (STORAGE_BACKEND) и каждого объема базы замеряет время и пиковую
+память (tracemalloc) операций DataStorage и AnalyticsHelper: чтение списка с диска и из кэша,
+добавление и обновление кандидата, расчет статистики и выгрузку CSV. Способ хранения читается
+из настроек при импорте, поэтому каждый прогоняется в отдельном процессе.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_storage
+    python -m benchmarks.bench_storage --sizes 10000 100000 --backends json journal --output storage.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SIZES = [10000, 100000, 1000000]
+BACKENDS = ['json', 'journal', 'sqlite']
+REPEAT = 3
+OPERATIONS = [
+    'get_candidates (диск)', 'get_candidates (кэш)', 'add_candidate', 'update_candidate',
+    'calculate_statistics', 'build_export_document'
+]
+
+
+def measure(func, repeat):
+    """Медианное время вызова в миллисекундах и пиковая память отдельного вызова в КБ."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'ms': round(statistics.median(times), 3), 'peak_kb': round(peak / 1024, 1)}
+
+
+def run_worker(sizes, repeat):
+    """Замеры для способа хранения из STORAGE_BACKEND; вызывается в отдельном процессе."""
+    from bot.database.storage import DataStorage
+    from bot.utils.analytics import AnalyticsHelper
+    from benchmarks.datasets import make_candidates
+
+    results = {}
+    for size in sizes:
+        candidates = make_candidates(size)
+        started = time.perf_counter()
+        DataStorage.save_candidates(candidates)
+        DataStorage.flush()
+        loaded = round((time.perf_counter() - started) * 1000, 3)
+        del candidates
+
+        def cold_read():
+            DataStorage._cache.invalidate()
+            DataStorage.get_candidates()
+
+        counter = iter(range(10 ** 9))
+
+        def add():
+            DataStorage.add_candidate({
+                'name': f"Новый кандидат {next(counter)}", 'vacancy': "Оператор линии производства",
+                'status': "Обдумывает", 'date': "2026-01-01T12:00:00"
+            })
+
+        def update():
+            DataStorage.update_candidate(size // 2, {
+                'name': "Иван Петров", 'vacancy': "Оператор линии производства",
+                'status': "HR интервью", 'date': "2026-01-01T12:00:00"
+            })
+
+        operations = {
+            'get_candidates (диск)': cold_read,
+            'get_candidates (кэш)': DataStorage.get_candidates,
+            'add_candidate': add,
+            'update_candidate': update,
+            'calculate_statistics': AnalyticsHelper.calculate_statistics,
+            'build_export_document': lambda: AnalyticsHelper.build_export_document()['file'].close(),
+        }
+        results[size] = {'save_candidates_ms': loaded}
+        for name in OPERATIONS:
+            results[size][name] = measure(operations[name], repeat)
+        DataStorage.flush()
+    return results
+
+
+def run_backend(backend, sizes, repeat):
+    """Запускает замеры способа хранения в отдельном процессе во временном каталоге."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, STORAGE_BACKEND=backend, LOG_LEVEL='WARNING',
+               PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_storage', '--worker', '--repeat', str(repeat),
+         '--sizes', *map(str, sizes)],
+        cwd=tempfile.mkdtemp(), env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Прогоняет замеры для всех способов хранения и печатает таблицу."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="объемы базы кандидатов")
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS, help="способы хранения")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="повторов каждой операции")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.sizes, args.repeat)))
+        return
+
+    results = {}
+    for backend in args.backends:
+        results[backend] = run_backend(backend, args.sizes, args.repeat)
+        for size, operations in results[backend].items():
+            print(f"{backend:>8}, {int(size):>8} кандидатов (загрузка {operations['save_candidates_ms']:.0f} мс):")
+            for name in OPERATIONS:
+                print(f"    {name:<26} {operations[name]['ms']:>11.3f} мс {operations[name]['peak_kb']:>12.1f} КБ")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Микробенчмарк каталога вакансий и проверка перечитывания vacancies.json без перезапуска.
+
+Сравнивает прежнюю работу /vacancies (чтение вакансий и сборка текста на каждый вызов) с готовым
+текстом из каталога, затем меняет вакансии в обход бота и проверяет, что каталог подхватил правку,
+вакансии после перестановки доступны по прежним ID, а пустой источник не перезаписывается примерами. Способ хранения задается STORAGE_BACKEND.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_vacancies
+    STORAGE_BACKEND=sqlite python -m benchmarks.bench_vacancies
+"""
+import os
+import tempfile
+import time
+import timeit
+
+from bot.config import VACANCIES_FILE, DEFAULT_VACANCIES, DATABASE_FILE, STORAGE_BACKEND
+from bot.database.sqlite_storage import SQLiteStorage
+from bot.database.storage import DataStorage
+from bot.database.vacancies import VacancyCatalog
+
+ITERATIONS = 20000
+VACANCIES = [
+    dict(vacancy, id=i * len(DEFAULT_VACANCIES) + vacancy['id'], title=f"{vacancy['title']} {i}")
+    for i in range(10) for vacancy in DEFAULT_VACANCIES
+]
+
+
+def listing_before():
+    """Прежний /vacancies: вакансии читаются из хранилища, текст собирается заново."""
+    return VacancyCatalog.render_listing(DataStorage._load_vacancies())
+
+
+def write_vacancies(vacancies):
+    """Изменяет вакансии в обход бота, как правка вручную (в базе - через отдельное соединение)."""
+    if STORAGE_BACKEND == 'sqlite':
+        editor = SQLiteStorage(DATABASE_FILE)
+        editor.save_vacancies(vacancies)
+        editor.close()
+        return
+    DataStorage.save_data(VACANCIES_FILE, vacancies)
+    stat = os.stat(VACANCIES_FILE)
+    os.utime(VACANCIES_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def main():
+    """Прогоняет замеры и проверки."""
+    write_vacancies(VACANCIES)
+    before = timeit.timeit(listing_before, number=ITERATIONS) / ITERATIONS * 1e6
+    after = timeit.timeit(DataStorage.get_vacancies_text, number=ITERATIONS) / ITERATIONS * 1e6
+    print(f"/vacancies ({len(VACANCIES)} вакансий): каждый раз с диска {before:.1f} мкс, из каталога {after:.2f} мкс")
+    assert DataStorage.get_vacancies_text() == listing_before()
+    assert after * 10 < before
+
+    # Правка вакансий подхватывается после интервала проверки
+    write_vacancies(VACANCIES[:2])
+    time.sleep(DataStorage._vacancies.check_interval)
+    titles = [vacancy['title'] for vacancy in DataStorage.get_vacancies()]
+    print(f"После правки: {titles}, {DataStorage.get_vacancies_stats()}")
+    assert titles == [vacancy['title'] for vacancy in VACANCIES[:2]]
+    assert DataStorage.find_vacancy(VACANCIES[1]['title']) == VACANCIES[1]['id']
+
+    # ID вакансии не зависит от ее места в списке: после вставки и перестановки он указывает на ту же вакансию
+    write_vacancies([VACANCIES[5], VACANCIES[1], VACANCIES[0]])
+    time.sleep(DataStorage._vacancies.check_interval)
+    assert all(DataStorage.get_vacancy(vacancy['id']) == vacancy for vacancy in (VACANCIES[0], VACANCIES[1], VACANCIES[5]))
+    assert DataStorage.get_vacancy(VACANCIES[2]['id']) is None
+    print("После перестановки вакансии доступны по прежним ID")
+
+    # Пустой источник: в памяти примеры, источник не перезаписывается
+    write_vacancies([])
+    time.sleep(DataStorage._vacancies.check_interval)
+    assert DataStorage.get_vacancies() == DEFAULT_VACANCIES
+    assert DataStorage._load_vacancies() == []
+    print("Пустой список вакансий: используются примеры, источник не изменен")
+
+
+if __name__ == "__main__":
+    # Хранилище работает с файлами в текущем каталоге, поэтому запускаемся во временном
+    os.chdir(tempfile.mkdtemp())
+    main()
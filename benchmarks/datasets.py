@@ -0,0 +1,43 @@
+"""Синтетические наборы кандидатов для замеров.
+
+Имена и фамилии на кириллице, все статусы из настроек, причины отказа обоих типов
+и даты за последний год - как в рабочих данных бота.
+"""
+import random
+from datetime import datetime, timedelta
+
+from bot.config import (
+    CANDIDATE_STATUSES, DIALOG_STATUSES, COMPANY_REJECTION_REASONS, CANDIDATE_REJECTION_REASONS, DEFAULT_VACANCIES
+)
+
+FIRST_NAMES = ["Иван", "Мария", "Алексей", "Екатерина", "Дмитрий", "Ольга", "Сергей", "Анна", "Никита", "Юлия"]
+LAST_NAMES = ["Петров", "Смирнова", "Кузнецов", "Попова", "Соколов", "Лебедева", "Новиков", "Морозова"]
+STATUSES = CANDIDATE_STATUSES + DIALOG_STATUSES
+
+
+def make_candidate(rng, number, now):
+    """Один кандидат со случайными статусом, вакансией, датой и, иногда, причиной отказа."""
+    candidate = {
+        'id': f"{number:08x}",
+        'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'vacancy': rng.choice(DEFAULT_VACANCIES)['title'],
+        'status': rng.choice(STATUSES),
+        'date': (now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))).isoformat(),
+        'interest': rng.choice(["Да, заинтересован", "Нет, не заинтересован", "Неизвестно"]),
+        'invitation': rng.choice(["Да", "Нет, предложена альтернатива", "Неизвестно"]),
+        'confirmation': rng.choice(["Да, подтверждено", "Нет, отменено", "Неизвестно"]),
+        'preferred_time': "",
+    }
+    if rng.random() < 0.3:
+        if rng.random() < 0.5:
+            candidate['rejection_reason'] = {'type': 'Компания', 'reason': rng.choice(COMPANY_REJECTION_REASONS)}
+        else:
+            candidate['rejection_reason'] = {'type': 'Кандидат', 'reason': rng.choice(CANDIDATE_REJECTION_REASONS)}
+    return candidate
+
+
+def make_candidates(count, seed=1):
+    """Список из count кандидатов; одинаковый seed дает одинаковые данные."""
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+    return [make_candidate(rng, number, now) for number in range(count)]
@@ -0,0 +1,84 @@
+"""Поддельный транспорт Bot API для замеров без сети.
+
+OfflineRequest подключается к Application через builder().request(...) и отвечает на
+запросы бота так, как ответил бы Telegram, не отправляя их. Вспомогательные функции
+собирают входящие обновления от кандидатов.
+"""
+import json
+from datetime import datetime
+from telegram import CallbackQuery, Chat, Message, MessageEntity, Update, User
+from telegram.request import BaseRequest
+
+BOT_ID = 1
+
+
+class OfflineRequest(BaseRequest):
+    """Отвечает на запросы Bot API локально и считает их по методам."""
+
+    def __init__(self):
+        self.calls = {}
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        """Ресурсы не требуются."""
+
+    async def shutdown(self):
+        """Ресурсы не требуются."""
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        """Возвращает ответ Telegram на метод, указанный в конце url."""
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        parameters = request_data.parameters if request_data is not None else {}
+        return 200, json.dumps({'ok': True, 'result': self._result(endpoint, parameters)}).encode()
+
+    def _result(self, endpoint, parameters):
+        """Собирает результат метода в формате Bot API."""
+        if endpoint == 'getMe':
+            return {'id': BOT_ID, 'is_bot': True, 'first_name': "HR бот", 'username': "hr_test_bot"}
+        if endpoint.startswith(('send', 'edit')):
+            self._message_id += 1
+            chat_id = parameters.get('chat_id', 0)
+            return {
+                'message_id': parameters.get('message_id', self._message_id),
+                'date': int(datetime.now().timestamp()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': "HR бот"},
+                'text': parameters.get('text', ''),
+                'photo': [{'file_id': 'photo', 'file_unique_id': 'photo', 'width': 1, 'height': 1}]
+                if endpoint == 'sendPhoto' else None,
+            }
+        return True
+
+
+def make_message_update(update_id, chat_id, text, bot):
+    """Обновление с текстовым сообщением (или командой) от кандидата."""
+    user = User(id=chat_id, first_name="Кандидат", is_bot=False)
+    entities = [MessageEntity(MessageEntity.BOT_COMMAND, 0, len(text.split()[0]))] if text.startswith('/') else None
+    message = Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        from_user=user, text=text, entities=entities
+    )
+    update = Update(update_id=update_id, message=message)
+    update.set_bot(bot)
+    message.set_bot(bot)
+    return update
+
+
+def make_callback_update(update_id, chat_id, data, bot):
+    """Обновление с нажатием инлайн-кнопки под сообщением бота."""
+    user = User(id=chat_id, first_name="Кандидат", is_bot=False)
+    message = Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        from_user=User(id=BOT_ID, first_name="HR бот", is_bot=True), text="..."
+    )
+    query = CallbackQuery(id=str(update_id), from_user=user, chat_instance=str(chat_id), message=message, data=data)
+    update = Update(update_id=update_id, callback_query=query)
+    for obj in (update, query, message):
+        obj.set_bot(bot)
+    return update
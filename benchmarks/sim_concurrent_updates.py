@@ -0,0 +1,130 @@
+"""Имитация одновременной работы многих чатов с ChatOrderedUpdateProcessor.
+
+Проверяет, что обновления одного чата обрабатываются строго по порядку, обработчики разных чатов
+идут параллельно не больше заданного лимита, медленный обработчик не задерживает другие чаты,
+а одновременные правки разных полей одного кандидата не затирают друг друга.
+
+Запуск из корня проекта:
+    python -m benchmarks.sim_concurrent_updates
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from telegram import Chat, Message, Update, User
+
+from bot.utils.update_processor import ChatOrderedUpdateProcessor
+
+CHATS = 40
+UPDATES_PER_CHAT = 10
+LIMIT = 8
+
+
+def make_update(update_id, chat_id, text):
+    """Собирает обновление с текстовым сообщением из указанного чата."""
+    user = User(id=chat_id, first_name="Кандидат", is_bot=False)
+    message = Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        from_user=user, text=text
+    )
+    return Update(update_id=update_id, message=message)
+
+
+async def ordering_scenario(processor):
+    """Чаты присылают сообщения вперемешку; один чат обрабатывается заметно дольше остальных."""
+    handled = {}
+    running = 0
+    peak = 0
+
+    async def handler(update):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        chat_id = update.effective_chat.id
+        # Чат 1 - медленная выгрузка аналитики, остальные - обычные ответы диалога
+        await asyncio.sleep(0.2 if chat_id == 1 else random.uniform(0.001, 0.01))
+        handled.setdefault(chat_id, []).append(int(update.message.text))
+        running -= 1
+
+    # Обновления разных чатов перемешаны, внутри чата идут по порядку
+    updates = [(chat_id, seq) for seq in range(UPDATES_PER_CHAT) for chat_id in range(1, CHATS + 1)]
+    random.shuffle(updates)
+    counters = {}
+    ordered = []
+    for chat_id, _ in updates:
+        seq = counters.get(chat_id, 0)
+        counters[chat_id] = seq + 1
+        ordered.append(make_update(len(ordered) + 1, chat_id, str(seq)))
+
+    started = time.monotonic()
+    # Как и Application, создаем задачу на каждое обновление в порядке поступления
+    await asyncio.gather(*[
+        asyncio.create_task(processor.process_update(update, handler(update)))
+        for update in ordered
+    ])
+    elapsed = time.monotonic() - started
+
+    return {
+        'in_order': all(seqs == list(range(UPDATES_PER_CHAT)) for seqs in handled.values()),
+        'chats': len(handled),
+        'peak_concurrency': peak,
+        'elapsed': round(elapsed, 2),
+        # Медленный чат сам по себе занимает UPDATES_PER_CHAT * 0.2 с, остальные укладываются в это время
+        'slow_chat_bound': UPDATES_PER_CHAT * 0.2,
+    }
+
+
+def storage_scenario():
+    """Два рекрутера одновременно меняют статус и причину отказа одного кандидата."""
+    from concurrent.futures import ThreadPoolExecutor
+    from bot.database.storage import DataStorage
+
+    DataStorage.clear_candidates()
+    for i in range(20):
+        DataStorage.add_candidate({'name': f"Кандидат {i}", 'vacancy': "Оператор линии",
+                                   'status': "Новый", 'date': datetime.now().isoformat()})
+    candidate_ids = [candidate['id'] for candidate in DataStorage.get_candidates()]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = []
+        for candidate_id in candidate_ids:
+            futures.append(pool.submit(DataStorage.update_candidate_fields, candidate_id, {'status': "HR интервью"}))
+            futures.append(pool.submit(DataStorage.update_candidate_fields, candidate_id,
+                                       {'rejection_reason': {'type': 'Компания', 'reason': "Тест"}}))
+        for future in futures:
+            future.result()
+
+    candidates = DataStorage.get_candidates()
+    DataStorage.flush()
+    return {
+        'candidates': len(candidates),
+        'both_fields_kept': all(
+            candidate['status'] == "HR интервью" and candidate.get('rejection_reason')
+            for candidate in candidates
+        ),
+    }
+
+
+async def main():
+    """Прогоняет сценарии и проверяет результат."""
+    processor = ChatOrderedUpdateProcessor(LIMIT)
+    await processor.initialize()
+    result = await ordering_scenario(processor)
+    await processor.shutdown()
+    print(f"Обработка {CHATS} чатов по {UPDATES_PER_CHAT} обновлений, лимит {LIMIT}: {result}")
+    assert result['in_order'], "порядок обновлений внутри чата нарушен"
+    assert result['chats'] == CHATS
+    assert 1 < result['peak_concurrency'] <= LIMIT
+    assert result['elapsed'] < result['slow_chat_bound'] * 1.5, "медленный чат задерживает остальные"
+
+    result = storage_scenario()
+    print(f"Одновременные правки кандидатов: {result}")
+    assert result['both_fields_kept'], "одновременные правки затерли друг друга"
+
+
+if __name__ == "__main__":
+    # Хранилище работает с файлами в текущем каталоге, поэтому запускаемся во временном
+    os.chdir(tempfile.mkdtemp())
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""Имитация брошенных диалогов: кандидаты начинают /dialog и перестают отвечать.
+
+Проверяет, что число диалогов в памяти не превышает лимит, вытесненные и просроченные
+диалоги с ответом кандидата сохраняются как "Обдумывает", приветствия без ответа не сохраняются,
+а этап и user_data всех вытесненных диалогов удаляются из памяти.
+
+Запуск из корня проекта:
+    python -m benchmarks.sim_dialog_eviction
+"""
+import asyncio
+import os
+import tempfile
+import time
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ConversationHandler, MessageHandler, filters
+
+from bot.config import INTRO, RESEARCH, PRESENTATION
+from bot.database.storage import DataStorage
+from bot.database.async_storage import AsyncDataStorage
+from bot.handlers.callbacks import DIALOG_INTRO
+from bot.handlers.dialog_handlers import DialogHandlers
+from bot.utils.dialog_tracker import dialog_tracker
+from benchmarks.fake_bot import OfflineRequest, make_message_update, make_callback_update
+
+CANDIDATES = 600
+MAX_DIALOGS = 200
+TIMEOUT = 0.5
+
+
+def build_application():
+    """Приложение с начальными этапами диалога и поддельным Bot API."""
+    application = Application.builder().token("1:offline").request(OfflineRequest()).build()
+    conversation = ConversationHandler(
+        entry_points=[CommandHandler("dialog", DialogHandlers.start_dialog)],
+        states={
+            INTRO: [CallbackQueryHandler(DialogHandlers.handle_intro_response, pattern=DIALOG_INTRO.pattern)],
+            RESEARCH: [MessageHandler(filters.TEXT & ~filters.COMMAND, DialogHandlers.handle_research)],
+            PRESENTATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, DialogHandlers.handle_presentation)],
+        },
+        fallbacks=[],
+        name="hr_dialog"
+    )
+    application.add_handler(conversation)
+    dialog_tracker.timeout = TIMEOUT
+    dialog_tracker.max_dialogs = MAX_DIALOGS
+    dialog_tracker.attach(application, conversation, DialogHandlers.save_candidate_data, DialogHandlers.clear_dialog_data)
+    return application, conversation
+
+
+async def main():
+    """Прогоняет сценарий и проверяет результат."""
+    DataStorage.clear_candidates()
+    application, conversation = build_application()
+    await application.initialize()
+    bot = application.bot
+
+    update_id = 0
+    peak = 0
+    started = time.monotonic()
+    for chat_id in range(1, CANDIDATES + 1):
+        # Кандидат начинает диалог, половина доходит до ввода имени и замолкает
+        steps = [make_message_update(update_id + 1, chat_id, "/dialog 1", bot)]
+        if chat_id % 2:
+            steps.append(make_callback_update(update_id + 2, chat_id, DIALOG_INTRO.encode("yes"), bot))
+            steps.append(make_message_update(update_id + 3, chat_id, f"Кандидат {chat_id}", bot))
+        for update in steps:
+            update_id += 1
+            await application.process_update(update)
+        # Вытеснение сверх лимита идет отдельной задачей в очереди чата
+        await dialog_tracker.settle()
+        peak = max(peak, len(conversation._conversations))
+    elapsed = time.monotonic() - started
+
+    overflow = dialog_tracker.stats()
+    print(f"{CANDIDATES} брошенных диалогов, лимит {MAX_DIALOGS}: {overflow}, "
+          f"пик этапов в памяти {peak}, user_data {len(application.user_data)}, {elapsed:.2f} с")
+    assert peak <= MAX_DIALOGS
+    assert overflow['active'] == MAX_DIALOGS
+    assert overflow['evicted_overflow'] == CANDIDATES - MAX_DIALOGS
+    assert len(application.user_data) == MAX_DIALOGS
+
+    # Оставшиеся диалоги вытесняются по таймауту
+    await asyncio.sleep(TIMEOUT)
+    await dialog_tracker.sweep()
+    idle = dialog_tracker.stats()
+    candidates = await AsyncDataStorage.get_candidates()
+    print(f"После таймаута: {idle}, этапов {len(conversation._conversations)}, "
+          f"user_data {len(application.user_data)}, сохранено кандидатов {len(candidates)}")
+    assert idle['active'] == 0 and idle['evicted_idle'] == MAX_DIALOGS
+    assert not conversation._conversations and not application.user_data
+    # Сохраняются только кандидаты, ответившие на приветствие
+    assert idle['discarded'] == CANDIDATES // 2
+    assert len(candidates) == CANDIDATES // 2
+    assert all(candidate['status'] == "Обдумывает" for candidate in candidates)
+    assert all(candidate['name'] != 'Неизвестный' for candidate in candidates), \
+        "частично заполненные диалоги должны сохранять имя"
+
+    await application.shutdown()
+    AsyncDataStorage.shutdown()
+    DataStorage.flush()
+
+
+if __name__ == "__main__":
+    # Хранилище работает с файлами в текущем каталоге, поэтому запускаемся во временном
+    os.chdir(tempfile.mkdtemp())
+    asyncio.run(main())
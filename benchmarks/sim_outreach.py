@@ -0,0 +1,146 @@
+"""Имитация рассылки приветствия 10 000 кандидатам на поддельном Bot API.
+
+Проверяет, что рассылка идет со скоростью общего лимита очереди, не задерживает ответы
+кандидатам в диалоге, после перезапуска продолжается с неотправленных получателей без
+повторов, а заблокировавшие бота кандидаты учитываются как ошибки. Время сжато: общий
+лимит поднят до GLOBAL_RATE сообщений в секунду.
+
+Запуск из корня проекта:
+    python -m benchmarks.sim_outreach
+"""
+import os
+
+# Настройки читаются при импорте бота, поэтому задаются до него
+GLOBAL_RATE = 1000
+os.environ.setdefault('FLOOD_GLOBAL_RATE', str(GLOBAL_RATE))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+from bot.bot import HRBot
+from bot.database.outreach import OutreachStore
+from bot.handlers.dialog_handlers import DialogHandlers
+from bot.utils.outreach import OutreachManager, outreach
+from benchmarks.fake_bot import OfflineRequest, make_message_update
+
+RECIPIENTS = 10000
+# Каждый BLOCKED_EVERY-й получатель рассылки заблокировал бота
+BLOCKED_EVERY = 50
+# После стольких отправок бот "перезапускается"
+RESTART_AFTER = 3000
+INTERACTIVE = 200
+# Задержка ответа Bot API, секунд
+LATENCY = 0.005
+
+
+class OutreachRequest(OfflineRequest):
+    """Поддельный Bot API с задержкой ответа и пользователями, заблокировавшими бота."""
+
+    def __init__(self):
+        super().__init__()
+        self.delivered = Counter()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        """Отвечает 403 заблокировавшим бота, остальным - как OfflineRequest."""
+        await asyncio.sleep(LATENCY)
+        parameters = request_data.parameters if request_data is not None else {}
+        if url.endswith('/sendMessage'):
+            chat_id = int(parameters['chat_id'])
+            if chat_id <= RECIPIENTS and chat_id % BLOCKED_EVERY == 0:
+                return 403, json.dumps({
+                    'ok': False, 'error_code': 403, 'description': "Forbidden: bot was blocked by the user"
+                }).encode()
+            self.delivered[chat_id] += 1
+        return await super().do_request(url, method, request_data, read_timeout, write_timeout,
+                                        connect_timeout, pool_timeout)
+
+
+async def interactive(application, first_chat_id, count):
+    """Кандидаты сами начинают /dialog; возвращает задержки обработки в миллисекундах."""
+    latencies = []
+    for i in range(count):
+        update = make_message_update(10 ** 6 + first_chat_id + i, first_chat_id + i, "/dialog 1", application.bot)
+        started = time.perf_counter()
+        await application.process_update(update)
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+def percentile(values, share):
+    """Перцентиль списка значений."""
+    return round(statistics.quantiles(values, n=100)[share - 1], 2)
+
+
+async def wait_sent(manager, campaign_id, count=None):
+    """Ждет, пока кампания обработает count получателей или завершится."""
+    while True:
+        progress = manager.progress(campaign_id)
+        if progress['status'] == OutreachStore.DONE or \
+                count is not None and progress['total'] - progress['pending'] >= count:
+            return progress
+        await asyncio.sleep(0.05)
+
+
+async def main():
+    """Прогоняет сценарий и проверяет результат."""
+    request = OutreachRequest()
+    bot = HRBot("1:offline", request=request)
+    bot.setup()
+    application = bot.application
+    await application.initialize()
+    await application.start()
+    await bot.on_startup(application)
+
+    baseline = await interactive(application, 2 * 10 ** 6, INTERACTIVE)
+
+    recipients = list(range(1, RECIPIENTS + 1))
+    started = time.perf_counter()
+    campaign_id = await outreach.create_campaign(recipients, 1)
+    during = asyncio.create_task(interactive(application, 3 * 10 ** 6, INTERACTIVE))
+    before_restart = await wait_sent(outreach, campaign_id, RESTART_AFTER)
+
+    # Перезапуск: начатые отправки завершаются, следующий экземпляр продолжает с неотправленных
+    await outreach.stop()
+    stopped = outreach.progress(campaign_id)
+    resumed = OutreachManager(OutreachStore(outreach.store.filename))
+    resumed.attach(application, DialogHandlers.begin_vacancy_dialog)
+    await resumed.start()
+    assert resumed.progress(campaign_id)['pending'] == stopped['pending']
+    progress = await wait_sent(resumed, campaign_id)
+    elapsed = time.perf_counter() - started
+    latencies = await during
+    await resumed.stop()
+
+    blocked = RECIPIENTS // BLOCKED_EVERY
+    print(f"Рассылка {RECIPIENTS} получателей за {elapsed:.1f} с ({RECIPIENTS / elapsed:.0f} в секунду "
+          f"при лимите {GLOBAL_RATE}), перезапуск после {before_restart['sent'] + before_restart['failed']}: {progress}")
+    print(f"Ответ на /dialog, мс: без рассылки p50 {percentile(baseline, 50)} p95 {percentile(baseline, 95)}, "
+          f"во время рассылки p50 {percentile(latencies, 50)} p95 {percentile(latencies, 95)}")
+
+    assert progress['status'] == OutreachStore.DONE
+    assert progress['sent'] == RECIPIENTS - blocked and progress['failed'] == blocked
+    assert progress['errors'] == {'Forbidden': blocked}
+    # Каждый получатель получил приветствие ровно один раз, несмотря на перезапуск
+    outreach_delivered = {chat_id: count for chat_id, count in request.delivered.items() if chat_id <= RECIPIENTS}
+    assert len(outreach_delivered) == RECIPIENTS - blocked and set(outreach_delivered.values()) == {1}
+    # Получатели ждут ответа на приветствие на первом этапе диалога
+    conversation = bot.application.handlers[0][-2]
+    assert all(conversation._conversations.get((chat_id, chat_id)) == 0 for chat_id in outreach_delivered)
+    assert RECIPIENTS / elapsed > GLOBAL_RATE * 0.5
+    assert percentile(latencies, 95) < percentile(baseline, 95) + 50
+
+    await application.stop()
+    await application.shutdown()
+
+
+if __name__ == "__main__":
+    # Базы бота создаются в текущем каталоге, поэтому запускаемся во временном
+    os.chdir(tempfile.mkdtemp())
+    asyncio.run(main())
@@ -1,3 +1,5 @@
+import asyncio
+import signal
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -8,62 +10,117 @@ from telegram.ext import (
 )
 
 from bot.config import (
-    INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION,
-    TOKEN, logger
+    INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION, VACANCY_CHOICE,
+    TOKEN, CONCURRENT_UPDATES, BOT_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_URL, logger
 )
 from bot.handlers.command_handlers import CommandHandlers
 from bot.handlers.dialog_handlers import DialogHandlers
+from bot.handlers.callbacks import (
+    MAIN_MENU, DIALOG_VACANCY, DIALOG_INTRO, DIALOG_PRESENTATION, DIALOG_INVITATION, DIALOG_CONFIRMATION, DIALOG_BACK
+)
 from bot.database.storage import DataStorage
+from bot.scripts.templates import DialogTemplates
+from bot.scripts.keyboards import VacancyKeyboards
+from bot.utils.rate_limiter import FloodControlLimiter
+from bot.utils.update_processor import ChatOrderedUpdateProcessor
+from bot.utils.dialog_tracker import dialog_tracker
+from bot.utils.metrics import metrics
+from bot.utils.outreach import outreach
+from bot.utils.funnel import funnel
+from bot.webhook import WebhookServer
+from bot.database.async_storage import AsyncDataStorage
+from bot.database.persistence import SQLitePersistence
+
+# Типы обновлений, которые бот получает от Telegram
+ALLOWED_UPDATES = ["message", "callback_query"]
 
 class HRBot:
     """Основной класс HR-бота."""
     
-    def __init__(self, token):
-        """Инициализация бота с указанным токеном."""
+    def __init__(self, token, request=None):
+        """Инициализация бота с указанным токеном.
+        
+        request - транспорт запросов к Bot API (по умолчанию HTTP-запросы к Telegram).
+        """
         self.token = token
+        self.request = request
         self.application = None
     
     def setup(self):
         """Настройка бота: регистрация обработчиков команд и сообщений."""
+        rate_limiter = FloodControlLimiter()
+        update_processor = ChatOrderedUpdateProcessor(CONCURRENT_UPDATES)
+        persistence = SQLitePersistence()
+        
         # Инициализируем приложение
-        self.application = Application.builder().token(self.token).build()
+        builder = Application.builder().token(self.token)
+        if self.request is not None:
+            builder = builder.request(self.request)
+        self.application = (
+            builder
+            .rate_limiter(rate_limiter)
+            .concurrent_updates(update_processor)
+            .persistence(persistence)
+            .post_init(self.on_startup)
+            .post_stop(self.on_stop)
+            .post_shutdown(self.on_shutdown)
+            .build()
+        )
+        
+        # Разбираем страницы диалога и собираем клавиатуру выбора для всех вакансий заранее,
+        # до первых обновлений, и заново - когда список вакансий меняется на диске
+        DataStorage.add_vacancies_listener(DialogTemplates.warm_up)
+        DataStorage.add_vacancies_listener(VacancyKeyboards.warm_up)
         
         # Регистрируем обработчики команд
-        self.application.add_handler(CommandHandler("start", CommandHandlers.start))
+        # Ссылка t.me/<бот>?start=v<номер> начинает диалог по вакансии, ее обрабатывает диалог ниже
+        deep_link = filters.Regex(DialogHandlers.DEEP_LINK_PATTERN)
+        self.application.add_handler(CommandHandler("start", CommandHandlers.start, filters=~deep_link))
         self.application.add_handler(CommandHandler("vacancies", CommandHandlers.show_vacancies))
         self.application.add_handler(CommandHandler("status", CommandHandlers.set_status))
         self.application.add_handler(CommandHandler("rejection", CommandHandlers.set_rejection_reason))
         self.application.add_handler(CommandHandler("analytics", CommandHandlers.show_analytics))
+        self.application.add_handler(CommandHandler("outreach", CommandHandlers.outreach))
+        # Длинный список получателей рассылки присылается файлом с командой в подписи
+        self.application.add_handler(MessageHandler(
+            filters.Document.ALL & filters.CaptionRegex(r'^/outreach(@\w+)?\s'), CommandHandlers.outreach_file
+        ))
         
-        # Добавляем обработчик для кнопки "Вернуться в начало" (обрабатывает callback_data="/start")
+        # Добавляем обработчик для кнопки "Вернуться в начало"
         self.application.add_handler(CallbackQueryHandler(
             lambda update, context: CommandHandlers.start(update, context), 
-            pattern="^/start$"
+            pattern=MAIN_MENU.pattern
         ))
         
         # Регистрируем обработчик диалога
         conv_handler = ConversationHandler(
-            entry_points=[CommandHandler("dialog", DialogHandlers.start_dialog)],
+            entry_points=[
+                CommandHandler("dialog", DialogHandlers.start_dialog),
+                CommandHandler("start", DialogHandlers.start_dialog, filters=deep_link)
+            ],
             states={
+                VACANCY_CHOICE: [
+                    CallbackQueryHandler(DialogHandlers.handle_vacancy_choice, pattern=DIALOG_VACANCY.pattern)
+                ],
                 INTRO: [
-                    CallbackQueryHandler(DialogHandlers.handle_intro_response, pattern="^intro_")
+                    CallbackQueryHandler(DialogHandlers.handle_intro_response, pattern=DIALOG_INTRO.pattern)
                 ],
                 RESEARCH: [
                     MessageHandler(filters.TEXT & ~filters.COMMAND, DialogHandlers.handle_research),
-                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern="^back_")
+                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern=DIALOG_BACK.pattern)
                 ],
                 PRESENTATION: [
                     MessageHandler(filters.TEXT & ~filters.COMMAND, DialogHandlers.handle_presentation),
-                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern="^back_")
+                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern=DIALOG_BACK.pattern)
                 ],
                 INVITATION: [
-                    CallbackQueryHandler(DialogHandlers.handle_presentation_response, pattern="^presentation_"),
-                    CallbackQueryHandler(DialogHandlers.handle_invitation_response, pattern="^invitation_"),
-                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern="^back_")
+                    CallbackQueryHandler(DialogHandlers.handle_presentation_response, pattern=DIALOG_PRESENTATION.pattern),
+                    CallbackQueryHandler(DialogHandlers.handle_invitation_response, pattern=DIALOG_INVITATION.pattern),
+                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern=DIALOG_BACK.pattern)
                 ],
                 CONFIRMATION: [
-                    CallbackQueryHandler(DialogHandlers.handle_confirmation, pattern="^confirmation_"),
-                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern="^back_"),
+                    CallbackQueryHandler(DialogHandlers.handle_confirmation, pattern=DIALOG_CONFIRMATION.pattern),
+                    CallbackQueryHandler(DialogHandlers.handle_back_button, pattern=DIALOG_BACK.pattern),
                     MessageHandler(filters.TEXT & ~filters.COMMAND, DialogHandlers.handle_confirmation)
                 ],
             },
@@ -73,25 +130,71 @@ class HRBot:
                 CommandHandler("status", CommandHandlers.set_status),
                 CommandHandler("rejection", CommandHandlers.set_rejection_reason),
                 CommandHandler("analytics", CommandHandlers.show_analytics),
+                CommandHandler("outreach", CommandHandlers.outreach),
             ],
             per_chat=True,     # Учитываем разные чаты
             name="hr_dialog",  # Уникальное имя для обработчика диалога
-            allow_reentry=True  # Разрешаем повторное использование обработчика
+            allow_reentry=True,  # Разрешаем повторное использование обработчика
+            persistent=True    # Восстанавливаем этап диалога после перезапуска
         )
         # Добавляем диалог первым, чтобы он имел приоритет над общим обработчиком кнопок
         self.application.add_handler(conv_handler)
+        # Брошенные диалоги сохраняются как незавершенные и вытесняются из памяти
+        dialog_tracker.attach(
+            self.application, conv_handler, DialogHandlers.save_candidate_data, DialogHandlers.clear_dialog_data
+        )
+        # Рассылка начинает диалог так же, как выбор вакансии кандидатом
+        outreach.attach(self.application, DialogHandlers.begin_vacancy_dialog)
         
         # Регистрируем обработчик колбэков от инлайн-кнопок
         self.application.add_handler(CallbackQueryHandler(CommandHandlers.button_callback))
+        
+        # Замеры обработчиков подключаются последними, когда все обработчики уже зарегистрированы
+        metrics.instrument(self.application)
+        metrics.register_collector('flood', rate_limiter.stats)
+        metrics.register_collector('updates', update_processor.stats)
+        metrics.register_collector('persistence', persistence.stats)
+        metrics.register_collector('dialogs', dialog_tracker.stats)
+        metrics.register_collector('callbacks', CommandHandlers.router.stats)
+        metrics.register_collector('cache', DataStorage.get_cache_stats)
+        metrics.register_collector('writes', DataStorage.get_write_stats)
+        metrics.register_collector('vacancies', DataStorage.get_vacancies_stats)
+        metrics.register_collector('outreach', outreach.stats)
+        metrics.register_collector('funnel', funnel.stats)
+    
+    @staticmethod
+    async def on_startup(application):
+        """Запускает фоновые задачи после загрузки сохраненного состояния."""
+        await dialog_tracker.start()
+        await outreach.start()
+        await metrics.start_server()
+    
+    @staticmethod
+    async def on_stop(application):
+        """Дожидается начатых отправок рассылки, пока бот еще может отправлять сообщения."""
+        await outreach.stop()
+    
+    @staticmethod
+    async def on_shutdown(application):
+        """Завершает фоновые операции хранилища при остановке бота."""
+        await dialog_tracker.stop()
+        await metrics.stop_server()
+        AsyncDataStorage.shutdown()
+        DataStorage.flush()
+        funnel.flush()
     
     def run(self):
         """Запуск бота."""
         if not self.application:
             self.setup()
         
+        if BOT_MODE == 'webhook':
+            asyncio.run(self.run_webhook())
+            return
+        
         try:
             # Добавляем drop_pending_updates=True чтобы сбросить ожидающие обновления
-            self.application.run_polling(drop_pending_updates=True, allowed_updates=["message", "callback_query"])
+            self.application.run_polling(drop_pending_updates=True, allowed_updates=ALLOWED_UPDATES)
         except Exception as e:
             logger.error(f"Ошибка при запуске бота: {e}")
             # Если бот уже запущен, пробуем перезапустить
@@ -100,7 +203,36 @@ class HRBot:
                 # Ждем 5 секунд чтобы предыдущий экземпляр освободил ресурсы
                 import time
                 time.sleep(5)
-                self.application.run_polling(drop_pending_updates=True, allowed_updates=["message", "callback_query"])
+                self.application.run_polling(drop_pending_updates=True, allowed_updates=ALLOWED_UPDATES)
+    
+    async def run_webhook(self):
+        """Запуск бота в режиме вебхука: обновления принимает встроенный HTTP-сервер."""
+        server = WebhookServer(self.application, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET)
+        metrics.register_collector('webhook', lambda: {'received': server.received, 'rejected': server.rejected})
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        
+        async with self.application:
+            await self.application.start()
+            await self.on_startup(self.application)
+            await server.start()
+            if WEBHOOK_URL:
+                # Несколько экземпляров за балансировщиком регистрируют один и тот же адрес
+                await self.application.bot.set_webhook(
+                    url=WEBHOOK_URL,
+                    secret_token=WEBHOOK_SECRET or None,
+                    allowed_updates=ALLOWED_UPDATES,
+                    drop_pending_updates=True
+                )
+            
+            await stop_event.wait()
+            
+            await server.stop()
+            await self.application.stop()
+            await self.on_stop(self.application)
+        await self.on_shutdown(self.application)
 
 
 def create_bot():
@@ -6,7 +6,7 @@ import dotenv
 dotenv.load_dotenv()
 
 # Константы для состояний диалога
-INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION = range(5)
+INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION, VACANCY_CHOICE = range(6)
 
 # Константы для колбэков кнопок
 STATUS_CALLBACK, REASON_CALLBACK = "status", "reason"
@@ -27,7 +27,75 @@ COMPANY_NAME = os.getenv('COMPANY_NAME', '')
 # Пути к файлам данных
 CANDIDATES_FILE = 'candidates.json'
 VACANCIES_FILE = 'vacancies.json'
-ANALYTICS_FILE = 'analytics.csv'
+CANDIDATES_JOURNAL_FILE = 'candidates.journal'
+DATABASE_FILE = 'hr_bot.db'
+ANALYTICS_EXPORT_STATE_FILE = 'analytics_export.json'
+MEDIA_CACHE_FILE = 'media_cache.json'
+PERSISTENCE_FILE = 'bot_state.db'
+OUTREACH_FILE = 'outreach.db'
+FUNNEL_FILE = 'funnel.db'
+
+# Размер CSV-выгрузки в байтах, который держится в памяти (больше - во временном файле)
+EXPORT_MEMORY_LIMIT = int(os.getenv('EXPORT_MEMORY_LIMIT', str(1024 * 1024)))
+
+# Способ хранения кандидатов: json (полная перезапись файла), journal (журнал изменений) или sqlite
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+
+# Надежность записи кандидатов: sync (запись на диск при каждом изменении)
+# или batched (изменения копятся и записываются одним пакетом не позже WRITE_BEHIND_DELAY секунд)
+STORAGE_DURABILITY = os.getenv('STORAGE_DURABILITY', 'sync')
+WRITE_BEHIND_DELAY = float(os.getenv('WRITE_BEHIND_DELAY', '0.5'))
+
+# Как часто (в секундах) проверяется, не изменился ли список вакансий на диске
+VACANCIES_CHECK_INTERVAL = float(os.getenv('VACANCIES_CHECK_INTERVAL', '1'))
+
+# Количество потоков для дисковых операций хранилища
+STORAGE_IO_WORKERS = int(os.getenv('STORAGE_IO_WORKERS', '4'))
+
+# Количество записей в журнале, после которого он сворачивается в снимок
+JOURNAL_COMPACT_THRESHOLD = int(os.getenv('JOURNAL_COMPACT_THRESHOLD', '1000'))
+
+# Сколько обновлений разных чатов обрабатывается одновременно (обновления одного чата - по очереди)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '8'))
+
+# Как часто (в секундах) состояния диалогов и данные пользователей записываются на диск
+PERSISTENCE_INTERVAL = float(os.getenv('PERSISTENCE_INTERVAL', '5'))
+
+# Как часто (в секундах) счетчики воронки диалогов записываются в суточные итоги на диске
+FUNNEL_FLUSH_INTERVAL = float(os.getenv('FUNNEL_FLUSH_INTERVAL', '5'))
+
+# Через сколько секунд без ответа кандидата диалог считается брошенным и сохраняется как "Обдумывает"
+DIALOG_TIMEOUT = int(os.getenv('DIALOG_TIMEOUT', str(24 * 60 * 60)))
+# Сколько незавершенных диалогов держится в памяти (сверх лимита вытесняются самые давние)
+MAX_ACTIVE_DIALOGS = int(os.getenv('MAX_ACTIVE_DIALOGS', '10000'))
+
+# Сколько приветствий рассылки отправляется одновременно во всех рассылках вместе (остальные ждут своей очереди)
+OUTREACH_CONCURRENCY = int(os.getenv('OUTREACH_CONCURRENCY', '20'))
+# ID пользователей Telegram (рекрутеров и администраторов) через запятую, которым доступна рассылка /outreach
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+
+# Порт HTTP-сервера с метриками в формате Prometheus (0 - метрики выключены)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+
+# Способ получения обновлений: polling (опрос Telegram) или webhook (встроенный HTTP-сервер)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+# Секрет, который Telegram передает в заголовке каждого запроса вебхука
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+# Публичный адрес вебхука; если задан, вебхук регистрируется в Telegram при запуске
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+
+# Ограничения исходящих сообщений Telegram: запросов в секунду всего и в личный чат
+# (с запасом FLOOD_CHAT_BURST сообщений подряд), сообщений в минуту в группу,
+# и число повторов после ответа RetryAfter
+FLOOD_GLOBAL_RATE = float(os.getenv('FLOOD_GLOBAL_RATE', '30'))
+FLOOD_CHAT_RATE = float(os.getenv('FLOOD_CHAT_RATE', '1'))
+FLOOD_CHAT_BURST = int(os.getenv('FLOOD_CHAT_BURST', '3'))
+FLOOD_GROUP_RATE = float(os.getenv('FLOOD_GROUP_RATE', '20')) / 60
+FLOOD_MAX_RETRIES = int(os.getenv('FLOOD_MAX_RETRIES', '3'))
 
 # Статусы кандидатов
 CANDIDATE_STATUSES = [
@@ -37,6 +105,16 @@ CANDIDATE_STATUSES = [
     "HR интервью"
 ]
 
+# Статусы, которые выставляет диалог с кандидатом
+DIALOG_STATUSES = [
+    "Приглашен на собеседование",
+    "Отказался",
+    "Обдумывает"
+]
+
+# Количество кандидатов на одной странице списков /status и /rejection
+CANDIDATES_PAGE_SIZE = int(os.getenv('CANDIDATES_PAGE_SIZE', '10'))
+
 # Причины отказа со стороны компании
 COMPANY_REJECTION_REASONS = [
     "Недостаточная квалификация",
@@ -56,16 +134,41 @@ CANDIDATE_REJECTION_REASONS = [
 # Примеры вакансий для первого запуска
 DEFAULT_VACANCIES = [
     {
+        "id": 1,
         "title": "Оператор линии производства",
         "description": "Контроль за наклеиванием этикетки, закупорки бутылки крышкой, работа на палетообмотчике",
-        "salary": "39000-45000 + премии"
+        "salary": "39000-45000 + премии",
+        # Собственный текст презентации вакансии (необязательно); {name} - имя кандидата
+        "presentation": "Пару слов скажу о нас. Мы производители натуральных безалкогольных напитков.\n\n"
+                        "Работа оператора линии заключается в следующем:\n"
+                        "- Контроль за наклеиванием этикетки, закупорки бутылки крышкой, работа на палетообмотчике.\n\n"
+                        "Что мы предлагаем:\n"
+                        "- акция 4 мес работы и 13я зп в кармане\n"
+                        "- соц.пакет, 28 дней отпуска\n"
+                        "- теплый, чистый цех\n"
+                        "- обучение за счет работодателя\n\n"
+                        "Также у нас есть:\n"
+                        "- внутренняя система бонусов и поощрений\n"
+                        "- быстрый рост от новичка до опытного сотрудника(от 39 000 до 45 000 руб. + премии)\n"
+                        "- предоставляем рабочую форму\n"
+                        "- чистые раздевалки и места для отдыха и приема пищи\n"
+                        "- оплачиваем мед. книжки\n"
+                        "- премия за акцию Приведи друга 20 000 руб.\n\n"
+                        "{name}, хотела бы Вам задать вопрос, Вы готовы к обучению?\n\n"
+                        "- на каждый разряд есть наставник\n"
+                        "- есть простая система и технология обучения\n"
+                        "- график 5/2 с 8:00 до 17:00, в сезон 2/2 день, ночь, с 8:00 до 20:00\n"
+                        "- молодой и дружный коллектив, который во всем поможет.\n\n"
+                        "Вас заинтересовала эта вакансия?"
     },
     {
+        "id": 2,
         "title": "Python-разработчик",
         "description": "Разработка и поддержка серверной части приложений на Python",
         "salary": "120000-180000"
     },
     {
+        "id": 3,
         "title": "Frontend-разработчик",
         "description": "Разработка пользовательских интерфейсов на React.js",
         "salary": "100000-160000"
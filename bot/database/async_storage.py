@@ -0,0 +1,91 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from bot.config import STORAGE_IO_WORKERS
+from bot.database.storage import DataStorage
+
+class AsyncDataStorage:
+    """Асинхронный доступ к DataStorage: дисковые операции выполняются в ограниченном пуле потоков."""
+
+    _executor = ThreadPoolExecutor(max_workers=STORAGE_IO_WORKERS, thread_name_prefix="storage")
+
+    @classmethod
+    async def run(cls, func, *args, **kwargs):
+        """Выполняет блокирующую функцию в пуле потоков хранилища, не останавливая цикл событий."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls._executor, partial(func, *args, **kwargs))
+
+    @classmethod
+    async def get_candidates(cls):
+        """Получает список кандидатов."""
+        return await cls.run(DataStorage.get_candidates)
+
+    @classmethod
+    async def get_candidates_page(cls, cursor=0, limit=10, status=None, vacancy=None):
+        """Получает страницу кандидатов с курсорами соседних страниц."""
+        return await cls.run(DataStorage.get_candidates_page, cursor, limit, status, vacancy)
+
+    @classmethod
+    async def get_candidate(cls, candidate_id):
+        """Получает кандидата по ID или None."""
+        return await cls.run(DataStorage.get_candidate, candidate_id)
+
+    @classmethod
+    async def add_candidate(cls, candidate_data):
+        """Добавляет нового кандидата."""
+        return await cls.run(DataStorage.add_candidate, candidate_data)
+
+    @classmethod
+    async def update_candidate(cls, index, candidate_data):
+        """Обновляет данные кандидата по позиции в списке."""
+        return await cls.run(DataStorage.update_candidate, index, candidate_data)
+
+    @classmethod
+    async def update_candidate_by_id(cls, candidate_id, candidate_data):
+        """Обновляет данные кандидата по ID."""
+        return await cls.run(DataStorage.update_candidate_by_id, candidate_id, candidate_data)
+
+    @classmethod
+    async def update_candidate_fields(cls, candidate_id, fields):
+        """Атомарно меняет отдельные поля кандидата."""
+        return await cls.run(DataStorage.update_candidate_fields, candidate_id, fields)
+
+    @classmethod
+    async def clear_candidates(cls):
+        """Полностью очищает список кандидатов."""
+        return await cls.run(DataStorage.clear_candidates)
+
+    @classmethod
+    async def get_vacancies(cls):
+        """Получает список вакансий."""
+        # Пока список в памяти свежий, он отдается без перехода в пул потоков;
+        # проверка изменений источника (не чаще раза в секунду) идет в пуле
+        if DataStorage.vacancies_fresh():
+            return DataStorage.get_vacancies()
+        return await cls.run(DataStorage.get_vacancies)
+
+    @classmethod
+    async def get_vacancy(cls, vacancy_id):
+        """Получает вакансию по ID или None."""
+        if DataStorage.vacancies_fresh():
+            return DataStorage.get_vacancy(vacancy_id)
+        return await cls.run(DataStorage.get_vacancy, vacancy_id)
+
+    @classmethod
+    async def find_vacancy(cls, title):
+        """Получает ID вакансии по названию или None."""
+        if DataStorage.vacancies_fresh():
+            return DataStorage.find_vacancy(title)
+        return await cls.run(DataStorage.find_vacancy, title)
+
+    @classmethod
+    async def get_vacancies_text(cls):
+        """Получает готовый текст списка вакансий."""
+        if DataStorage.vacancies_fresh():
+            return DataStorage.get_vacancies_text()
+        return await cls.run(DataStorage.get_vacancies_text)
+
+    @classmethod
+    def shutdown(cls):
+        """Дожидается завершения начатых операций и останавливает пул потоков."""
+        cls._executor.shutdown(wait=True)
@@ -0,0 +1,105 @@
+import os
+from bot.database.counters import CandidateCounters
+from bot.database.filter_index import CandidateFilterIndex
+
+class CandidateCache:
+    """Кэш разобранного списка кандидатов в памяти с проверкой изменений файлов на диске."""
+
+    def __init__(self, *paths):
+        """Инициализация кэша для файлов, от которых зависит список кандидатов."""
+        self.paths = paths
+        self.candidates = None
+        self.signature = None
+        # Индекс ID кандидата -> позиция в списке
+        self.positions = {}
+        # Счетчики для аналитики, обновляются вместе со списком
+        self.counters = CandidateCounters()
+        # Позиции кандидатов по статусу и вакансии для страниц с фильтрами
+        self.filters = CandidateFilterIndex()
+        # Закрепленный кэш содержит еще не записанные изменения и не сверяется с диском
+        self.pinned = False
+        self.hits = 0
+        self.misses = 0
+
+    def _signature(self):
+        """Возвращает отпечаток файлов: inode, время изменения и размер."""
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get(self, loader):
+        """Возвращает список из кэша или перечитывает его через loader, если файлы изменились."""
+        if self.candidates is not None and self.pinned:
+            self.hits += 1
+            return self.candidates
+
+        signature = self._signature()
+        if self.candidates is not None and signature == self.signature:
+            self.hits += 1
+            return self.candidates
+
+        self.misses += 1
+        self.candidates = loader()
+        # Отпечаток снимается после чтения: loader может сам переписать файлы (например, назначив ID
+        # кандидатам), и отпечаток до чтения заставил бы перечитать их при следующем обращении
+        self.signature = self._signature()
+        self._reindex()
+        return self.candidates
+
+    def _reindex(self):
+        """Перестраивает индекс ID -> позиция, индекс фильтров и счетчики."""
+        self.positions = {
+            candidate['id']: i for i, candidate in enumerate(self.candidates or []) if candidate.get('id')
+        }
+        self.filters.rebuild(self.candidates or [])
+        self.counters.rebuild(self.candidates or [])
+
+    def position(self, candidate_id):
+        """Возвращает позицию кандидата в списке по его ID или None."""
+        return self.positions.get(candidate_id)
+
+    def append(self, candidate):
+        """Добавляет кандидата в конец закэшированного списка."""
+        self.candidates.append(candidate)
+        if candidate.get('id'):
+            self.positions[candidate['id']] = len(self.candidates) - 1
+        self.filters.add(len(self.candidates) - 1, candidate)
+        self.counters.add(candidate)
+
+    def replace(self, position, candidate):
+        """Заменяет кандидата на указанной позиции."""
+        self.filters.replace(position, self.candidates[position], candidate)
+        self.counters.replace(self.candidates[position], candidate)
+        self.candidates[position] = candidate
+
+    def store(self, candidates):
+        """Запоминает список, только что записанный на диск."""
+        self.candidates = candidates
+        self.signature = self._signature()
+        self._reindex()
+
+    def touch(self):
+        """Обновляет отпечаток после записи изменений, уже внесенных в кэш."""
+        self.signature = self._signature()
+
+    def invalidate(self):
+        """Сбрасывает кэш, следующее чтение пойдет с диска."""
+        self.candidates = None
+        self.signature = None
+        self.positions = {}
+        self.filters.reset()
+        self.counters.reset()
+        self.pinned = False
+
+    def stats(self):
+        """Возвращает счетчики попаданий и промахов кэша."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.candidates) if self.candidates is not None else 0
+        }
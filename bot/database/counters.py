@@ -0,0 +1,77 @@
+from collections import Counter
+
+class CandidateCounters:
+    """Счетчики кандидатов по статусам, причинам отказа, вакансиям и дням, обновляемые за O(1)."""
+
+    def __init__(self):
+        """Инициализация пустых счетчиков."""
+        self.reset()
+
+    def reset(self):
+        """Обнуляет все счетчики."""
+        self.total = 0
+        self.status = Counter()
+        self.rejection = Counter()
+        self.vacancy = Counter()
+        self.daily = Counter()
+
+    @staticmethod
+    def _keys(candidate):
+        """Возвращает ключи, по которым кандидат учитывается в счетчиках."""
+        rejection = candidate.get('rejection_reason') or {}
+        return (
+            candidate.get('status'),
+            rejection.get('type'),
+            candidate.get('vacancy'),
+            (candidate.get('date') or '')[:10] or None
+        )
+
+    @staticmethod
+    def _decrement(counter, key):
+        """Уменьшает счетчик и удаляет нулевые значения."""
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    def add(self, candidate):
+        """Учитывает нового кандидата."""
+        status, rejection_type, vacancy, day = self._keys(candidate)
+        self.total += 1
+        self.status[status] += 1
+        if rejection_type:
+            self.rejection[rejection_type] += 1
+        self.vacancy[vacancy] += 1
+        if day:
+            self.daily[day] += 1
+
+    def remove(self, candidate):
+        """Убирает кандидата из счетчиков."""
+        status, rejection_type, vacancy, day = self._keys(candidate)
+        self.total -= 1
+        self._decrement(self.status, status)
+        if rejection_type:
+            self._decrement(self.rejection, rejection_type)
+        self._decrement(self.vacancy, vacancy)
+        if day:
+            self._decrement(self.daily, day)
+
+    def replace(self, old_candidate, new_candidate):
+        """Переносит кандидата из старых значений в новые."""
+        self.remove(old_candidate)
+        self.add(new_candidate)
+
+    def rebuild(self, candidates):
+        """Пересчитывает счетчики полным проходом по списку."""
+        self.reset()
+        for candidate in candidates:
+            self.add(candidate)
+
+    def snapshot(self):
+        """Возвращает копию текущих значений счетчиков."""
+        return {
+            'total': self.total,
+            'status_count': dict(self.status),
+            'rejection_count': dict(self.rejection),
+            'vacancy_count': dict(self.vacancy),
+            'daily_count': dict(self.daily)
+        }
@@ -0,0 +1,73 @@
+from bisect import bisect_left, insort
+
+class CandidateFilterIndex:
+    """Позиции кандидатов в списке по статусу, вакансии и их сочетанию, обновляемые вместе с кэшем.
+
+    Для каждого значения фильтра хранится отсортированный список позиций, поэтому страница
+    отфильтрованного списка находится двоичным поиском за O(log N + размер страницы).
+    """
+
+    def __init__(self):
+        """Инициализация пустого индекса."""
+        self.reset()
+
+    def reset(self):
+        """Очищает индекс."""
+        self.status = {}
+        self.vacancy = {}
+        self.pair = {}
+
+    @staticmethod
+    def _keys(candidate):
+        """Возвращает статус и вакансию кандидата."""
+        return candidate.get('status'), candidate.get('vacancy')
+
+    def _lists(self, candidate):
+        """Возвращает индексы и ключи, в которых учитывается кандидат."""
+        status, vacancy = self._keys(candidate)
+        return ((self.status, status), (self.vacancy, vacancy), (self.pair, (status, vacancy)))
+
+    def add(self, position, candidate):
+        """Учитывает кандидата на позиции position."""
+        for index, key in self._lists(candidate):
+            positions = index.setdefault(key, [])
+            # Новые кандидаты добавляются в конец списка, поэтому обычно это простое добавление
+            if not positions or positions[-1] < position:
+                positions.append(position)
+            else:
+                insort(positions, position)
+
+    def remove(self, position, candidate):
+        """Убирает кандидата с позиции position."""
+        for index, key in self._lists(candidate):
+            positions = index.get(key)
+            if not positions:
+                continue
+            i = bisect_left(positions, position)
+            if i < len(positions) and positions[i] == position:
+                del positions[i]
+                if not positions:
+                    del index[key]
+
+    def replace(self, position, old_candidate, new_candidate):
+        """Переносит кандидата на позиции position из старых значений фильтров в новые."""
+        if self._keys(old_candidate) != self._keys(new_candidate):
+            self.remove(position, old_candidate)
+            self.add(position, new_candidate)
+
+    def rebuild(self, candidates):
+        """Перестраивает индекс полным проходом по списку."""
+        self.reset()
+        for position, candidate in enumerate(candidates):
+            self.add(position, candidate)
+
+    def positions(self, status=None, vacancy=None):
+        """Возвращает отсортированные позиции кандидатов с указанными статусом и вакансией.
+
+        Хотя бы один фильтр должен быть задан; возвращаемый список нельзя изменять.
+        """
+        if status is not None and vacancy is not None:
+            return self.pair.get((status, vacancy), [])
+        if status is not None:
+            return self.status.get(status, [])
+        return self.vacancy.get(vacancy, [])
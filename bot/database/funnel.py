@@ -0,0 +1,159 @@
+import sqlite3
+import threading
+from bot.config import FUNNEL_FILE, logger
+from bot.database.vacancies import VacancyCatalog
+
+class FunnelStore:
+    """Суточные итоги воронки диалогов и корзины времени на этапах в базе SQLite.
+
+    Одна строка на день и вакансию со счетчиками кандидатов, дошедших до каждого этапа. Строки
+    пополняются пакетами прибавок, поэтому воронка за 90 дней по вакансии читает 90 строк,
+    а не всю историю диалогов. Время на этапе хранится счетчиками корзин наброска перцентилей
+    по вакансии и этапу. Вакансия записывается своим ID: после переименования вакансии ее
+    история остается в одних строках, а название подставляется только при показе отчета.
+    """
+
+    # Столбцы счетчиков в порядке этапов INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION
+    COLUMNS = ('intro', 'research', 'presentation', 'invitation', 'confirmation')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS funnel_daily (
+            day TEXT NOT NULL,
+            vacancy_id INTEGER NOT NULL,
+            intro INTEGER NOT NULL DEFAULT 0,
+            research INTEGER NOT NULL DEFAULT 0,
+            presentation INTEGER NOT NULL DEFAULT 0,
+            invitation INTEGER NOT NULL DEFAULT 0,
+            confirmation INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, vacancy_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_funnel_vacancy_id ON funnel_daily(vacancy_id, day);
+        CREATE TABLE IF NOT EXISTS stage_timing (
+            vacancy_id INTEGER NOT NULL,
+            stage INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (vacancy_id, stage, bucket)
+        );
+    """
+
+    def __init__(self, filename=FUNNEL_FILE, resolve_title=None):
+        """
+        Инициализация хранилища, соединение открывается при первом обращении.
+
+        resolve_title - функция, возвращающая ID вакансии по названию (или None): нужна только
+        для переноса базы, в которой вакансии записаны названиями.
+        """
+        self.filename = filename
+        self.resolve_title = resolve_title
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """Возвращает соединение с базой, создавая схему при первом подключении."""
+        if self._connection is None:
+            connection = sqlite3.connect(self.filename, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._migrate_titles(connection)
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _vacancy_id(self, title):
+        """ID вакансии по названию: из каталога или, если ее там нет, вычисленный из названия."""
+        vacancy_id = self.resolve_title(title) if self.resolve_title else None
+        return vacancy_id if vacancy_id is not None else VacancyCatalog.vacancy_id({'title': title})
+
+    @staticmethod
+    def _keyed_by_title(connection, table):
+        """Проверяет, что таблица есть и вакансии в ней записаны названиями."""
+        return 'vacancy' in [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+    def _migrate_titles(self, connection):
+        """Переводит итоги воронки и корзины времени, записанные по названиям вакансий, на ID вакансий."""
+        daily, timings = {}, {}
+        migrate_daily = self._keyed_by_title(connection, 'funnel_daily')
+        migrate_timings = self._keyed_by_title(connection, 'stage_timing')
+        if not migrate_daily and not migrate_timings:
+            return
+
+        # Переименованная вакансия могла оставить строки под разными названиями, они складываются
+        if migrate_daily:
+            columns = ", ".join(self.COLUMNS)
+            for day, title, *counts in connection.execute(f"SELECT day, vacancy, {columns} FROM funnel_daily"):
+                target = daily.setdefault((day, self._vacancy_id(title)), [0] * len(self.COLUMNS))
+                for i, count in enumerate(counts):
+                    target[i] += count
+        if migrate_timings:
+            for title, stage, bucket, count in connection.execute("SELECT vacancy, stage, bucket, count FROM stage_timing"):
+                key = (self._vacancy_id(title), stage, bucket)
+                timings[key] = timings.get(key, 0) + count
+
+        # Таблицы пересоздаются и заполняются одной транзакцией: сбой посередине не теряет итоги
+        drops = "".join(f"DROP TABLE {table};" for table, migrate in (
+            ('funnel_daily', migrate_daily), ('stage_timing', migrate_timings)) if migrate)
+        try:
+            connection.executescript(f"BEGIN; {drops} {self.SCHEMA}")
+            self._insert(connection, daily, timings)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        logger.info(f"Итоги воронки {self.filename} переведены на ID вакансий: {len(daily)} строк итогов, "
+                    f"{len(timings)} корзин времени")
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def add(self, increments, timings=None):
+        """
+        Прибавляет счетчики одной транзакцией.
+
+        increments - {(день, ID вакансии): [счетчик по каждому этапу]};
+        timings - {(ID вакансии, этап, корзина): количество} для времени на этапах.
+        """
+        with self._lock, self.connection:
+            self._insert(self.connection, increments, timings)
+
+    def _insert(self, connection, increments, timings=None):
+        """Прибавляет счетчики к строкам итогов; вызывается внутри транзакции."""
+        columns = ", ".join(self.COLUMNS)
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in self.COLUMNS)
+        connection.executemany(
+            f"INSERT INTO funnel_daily (day, vacancy_id, {columns}) VALUES (?, ?, {placeholders}) "
+            f"ON CONFLICT (day, vacancy_id) DO UPDATE SET {updates}",
+            [(day, vacancy_id, *counts) for (day, vacancy_id), counts in increments.items()]
+        )
+        if timings:
+            connection.executemany(
+                "INSERT INTO stage_timing (vacancy_id, stage, bucket, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (vacancy_id, stage, bucket) DO UPDATE SET count = count + excluded.count",
+                [(vacancy_id, stage, bucket, count) for (vacancy_id, stage, bucket), count in timings.items()]
+            )
+
+    def query(self, since, vacancy_id=None):
+        """Возвращает строки итогов начиная с дня since: (день, ID вакансии, [счетчики по этапам])."""
+        columns = ", ".join(self.COLUMNS)
+        if vacancy_id is None:
+            sql, args = f"SELECT day, vacancy_id, {columns} FROM funnel_daily WHERE day >= ? ORDER BY day", (since,)
+        else:
+            sql = f"SELECT day, vacancy_id, {columns} FROM funnel_daily WHERE vacancy_id = ? AND day >= ? ORDER BY day"
+            args = (vacancy_id, since)
+        with self._lock:
+            rows = self.connection.execute(sql, args).fetchall()
+        return [(row[0], row[1], list(row[2:])) for row in rows]
+
+    def query_timings(self, vacancy_id=None):
+        """Возвращает корзины времени на этапах: (ID вакансии, этап, корзина, количество)."""
+        sql, args = "SELECT vacancy_id, stage, bucket, count FROM stage_timing", ()
+        if vacancy_id is not None:
+            sql, args = sql + " WHERE vacancy_id = ?", (vacancy_id,)
+        with self._lock:
+            return self.connection.execute(sql, args).fetchall()
@@ -0,0 +1,171 @@
+import json
+import os
+from bot.config import logger
+
+class CandidateJournal:
+    """Журнал изменений списка кандидатов: снимок в JSON и построчный лог операций."""
+
+    def __init__(self, snapshot_file, journal_file, compact_threshold):
+        """Инициализация журнала для указанных файлов снимка и лога."""
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_threshold = compact_threshold
+        # Количество записей в логе и кандидатов (None - еще не известно)
+        self.entries = None
+        self.count = None
+
+    @property
+    def tmp_snapshot_file(self):
+        """Путь к временному файлу снимка, который пишется при сворачивании."""
+        return f"{self.snapshot_file}.tmp"
+
+    def _read_snapshot(self):
+        """Читает снимок списка кандидатов."""
+        if not os.path.exists(self.snapshot_file):
+            return []
+        with open(self.snapshot_file, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _read_entries(self):
+        """Читает записи журнала, пропуская поврежденные строки и обрезая недописанную последнюю."""
+        if not os.path.exists(self.journal_file):
+            return []
+        entries = []
+        raw = b"\n"
+        parsed = True
+        with open(self.journal_file, 'rb') as file:
+            for line_number, raw in enumerate(file, 1):
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                    parsed = True
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    parsed = False
+                    logger.warning(f"Повреждена запись {line_number} в журнале {self.journal_file}, она пропущена")
+
+        # Последняя строка без перевода строки склеилась бы со следующей дописанной записью:
+        # целую запись завершаем, оборванную при сбое отрезаем
+        if not raw.endswith(b"\n"):
+            with open(self.journal_file, 'r+b') as file:
+                if parsed:
+                    file.seek(0, os.SEEK_END)
+                    file.write(b"\n")
+                else:
+                    file.truncate(os.path.getsize(self.journal_file) - len(raw))
+        return entries
+
+    def _recover(self, entries):
+        """Завершает прерванное сворачивание и возвращает записи, которых нет в снимке."""
+        checkpoint = None
+        for i, entry in enumerate(entries):
+            if entry.get('op') == 'checkpoint':
+                checkpoint = i
+
+        if checkpoint is None:
+            # Снимок не успел записаться полностью, временный файл не нужен
+            if os.path.exists(self.tmp_snapshot_file):
+                os.remove(self.tmp_snapshot_file)
+            return entries
+
+        # Временный снимок полный: если переименование не успело пройти, завершаем его
+        if os.path.exists(self.tmp_snapshot_file):
+            os.replace(self.tmp_snapshot_file, self.snapshot_file)
+
+        # Оставляем в журнале только записи после отметки, чтобы она не мешала следующему сворачиванию
+        remaining = entries[checkpoint + 1:]
+        tmp_journal_file = f"{self.journal_file}.tmp"
+        with open(tmp_journal_file, 'w', encoding='utf-8') as file:
+            for entry in remaining:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_journal_file, self.journal_file)
+        logger.warning(f"Завершено прерванное сворачивание журнала {self.journal_file}")
+        return remaining
+
+    @staticmethod
+    def _apply(candidates, positions, entry):
+        """Применяет одну запись журнала к списку кандидатов и индексу ID -> позиция."""
+        op = entry.get('op')
+        if op == 'add':
+            candidates.append(entry['data'])
+            if entry['data'].get('id'):
+                positions[entry['data']['id']] = len(candidates) - 1
+        elif op == 'update':
+            # Новые записи ссылаются на кандидата по ID, старые - по позиции в списке
+            index = positions.get(entry['id'], -1) if 'id' in entry else entry['index']
+            if 0 <= index < len(candidates):
+                candidates[index] = entry['data']
+        elif op == 'clear':
+            candidates.clear()
+            positions.clear()
+        else:
+            logger.warning(f"Неизвестная операция в журнале: {op}")
+
+    def load(self):
+        """Восстанавливает текущий список кандидатов: снимок плюс повтор журнала."""
+        entries = self._recover(self._read_entries())
+        candidates = self._read_snapshot()
+        positions = {c['id']: i for i, c in enumerate(candidates) if c.get('id')}
+        for entry in entries:
+            self._apply(candidates, positions, entry)
+
+        self.entries = len(entries)
+        self.count = len(candidates)
+        return candidates
+
+    def size(self):
+        """Возвращает текущее количество кандидатов."""
+        if self.count is None:
+            self.load()
+        return self.count
+
+    def append(self, op, **payload):
+        """Дописывает операцию в конец журнала за O(1)."""
+        if self.count is None:
+            self.load()
+
+        entry = {'op': op, **payload}
+        with open(self.journal_file, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        self.entries += 1
+        if op == 'add':
+            self.count += 1
+        elif op == 'clear':
+            self.count = 0
+
+        # Слишком длинный журнал сворачиваем в снимок
+        if self.entries >= self.compact_threshold:
+            self.compact(self.load())
+        return True
+
+    def sync(self):
+        """Сбрасывает дописанные записи журнала на диск (fsync)."""
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'a', encoding='utf-8') as file:
+                os.fsync(file.fileno())
+        return True
+
+    def compact(self, candidates):
+        """Сворачивает журнал: записывает полный снимок и очищает лог."""
+        # 1. Пишем новый снимок во временный файл
+        with open(self.tmp_snapshot_file, 'w', encoding='utf-8') as file:
+            json.dump(candidates, file, ensure_ascii=False, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # 2. Отмечаем в журнале, что снимок полный и включает все записи выше
+        with open(self.journal_file, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'op': 'checkpoint'}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+        # 3. Подменяем снимок и очищаем журнал
+        os.replace(self.tmp_snapshot_file, self.snapshot_file)
+        open(self.journal_file, 'w', encoding='utf-8').close()
+
+        self.entries = 0
+        self.count = len(candidates)
+        logger.info(f"Журнал {self.journal_file} свернут в снимок ({self.count} кандидатов)")
+        return True
@@ -0,0 +1,46 @@
+"""Одноразовый перенос кандидатов и вакансий из JSON-файлов в базу SQLite.
+
+Запуск: python -m bot.database.migrate
+"""
+import os
+from bot.config import (
+    logger, CANDIDATES_FILE, CANDIDATES_JOURNAL_FILE, VACANCIES_FILE, DATABASE_FILE, DEFAULT_VACANCIES,
+    JOURNAL_COMPACT_THRESHOLD
+)
+from bot.database.storage import DataStorage
+from bot.database.journal import CandidateJournal
+from bot.database.sqlite_storage import SQLiteStorage
+
+def load_candidates(candidates_file=CANDIDATES_FILE, journal_file=CANDIDATES_JOURNAL_FILE):
+    """Читает кандидатов из JSON-файла, применяя к нему журнал изменений (STORAGE_BACKEND=journal), если он есть."""
+    journal = CandidateJournal(candidates_file, journal_file, JOURNAL_COMPACT_THRESHOLD)
+    if not os.path.exists(journal_file) and not os.path.exists(journal.tmp_snapshot_file):
+        return DataStorage.load_data(candidates_file, [])
+    # Снимок без журнала устарел: последние изменения кандидатов есть только в журнале
+    candidates = journal.load()
+    logger.info(f"Применен журнал {journal_file}: {journal.entries} записей")
+    return candidates
+
+
+def migrate_json_to_sqlite(candidates_file=CANDIDATES_FILE, vacancies_file=VACANCIES_FILE,
+                           database_file=DATABASE_FILE, journal_file=CANDIDATES_JOURNAL_FILE):
+    """Переносит данные из JSON-файлов (и журнала кандидатов) в базу SQLite, если база еще пуста."""
+    try:
+        candidates = load_candidates(candidates_file, journal_file)
+    except Exception as e:
+        # Перенос одного снимка потерял бы изменения из журнала
+        logger.error(f"Не удалось прочитать журнал кандидатов {journal_file}, миграция отменена: {e}")
+        return False
+    vacancies = DataStorage.load_data(vacancies_file, []) or DEFAULT_VACANCIES
+
+    storage = SQLiteStorage(database_file)
+    try:
+        return storage.migrate(candidates, vacancies)
+    finally:
+        storage.close()
+
+if __name__ == "__main__":
+    if migrate_json_to_sqlite():
+        logger.info(f"Миграция завершена. Установите STORAGE_BACKEND=sqlite, чтобы использовать {DATABASE_FILE}")
+    else:
+        logger.error("Миграция не выполнена")
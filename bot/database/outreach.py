@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+from datetime import datetime
+from bot.config import OUTREACH_FILE
+
+class OutreachStore:
+    """Хранилище рассылок в базе SQLite: кампании и результат отправки каждому получателю.
+
+    Получатель остается в статусе pending, пока результат отправки не записан, поэтому
+    прерванная рассылка продолжается с неотправленных получателей.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS campaigns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            vacancy_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS recipients (
+            campaign_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            PRIMARY KEY (campaign_id, chat_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_recipients_status ON recipients(campaign_id, status);
+    """
+
+    # Виды кампаний: рассылка по списку чатов и ссылка, по которой кандидаты приходят сами
+    KIND_CHATS = 'chats'
+    KIND_LINK = 'link'
+
+    # Статусы кампании
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    DONE = 'done'
+
+    # Статусы получателя
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+    JOINED = 'joined'
+
+    def __init__(self, filename=OUTREACH_FILE):
+        """Инициализация хранилища, соединение открывается при первом обращении."""
+        self.filename = filename
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """Возвращает соединение с базой, создавая схему при первом подключении."""
+        if self._connection is None:
+            connection = sqlite3.connect(self.filename, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def create_campaign(self, kind, vacancy_id, chat_ids=()):
+        """Создает кампанию с получателями (повторы в списке отбрасываются) и возвращает ее ID."""
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO campaigns (kind, vacancy_id, status, created_at) VALUES (?, ?, ?, ?)",
+                (kind, vacancy_id, self.RUNNING, datetime.now().isoformat(timespec='seconds'))
+            )
+            campaign_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO recipients (campaign_id, chat_id, status) VALUES (?, ?, ?)",
+                ((campaign_id, chat_id, self.PENDING) for chat_id in chat_ids)
+            )
+        return campaign_id
+
+    def get_campaigns(self):
+        """Возвращает все кампании: словари с полями id, kind, vacancy_id, status, created_at."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id, kind, vacancy_id, status, created_at FROM campaigns ORDER BY id"
+            ).fetchall()
+        return [
+            {'id': row[0], 'kind': row[1], 'vacancy_id': row[2], 'status': row[3], 'created_at': row[4]}
+            for row in rows
+        ]
+
+    def set_status(self, campaign_id, status):
+        """Меняет статус кампании."""
+        with self._lock, self.connection:
+            self.connection.execute("UPDATE campaigns SET status = ? WHERE id = ?", (status, campaign_id))
+
+    def pending_recipients(self, campaign_id, limit=1000):
+        """Возвращает порцию неотправленных получателей кампании."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT chat_id FROM recipients WHERE campaign_id = ? AND status = ? ORDER BY chat_id LIMIT ?",
+                (campaign_id, self.PENDING, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def save_results(self, results):
+        """Записывает результаты отправки одной транзакцией: (campaign_id, chat_id, статус, ошибка)."""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "UPDATE recipients SET status = ?, error = ? WHERE campaign_id = ? AND chat_id = ?",
+                [(status, error, campaign_id, chat_id) for campaign_id, chat_id, status, error in results]
+            )
+
+    def add_joined(self, campaign_id, chat_id):
+        """Отмечает кандидата, пришедшего по ссылке кампании; возвращает False, если он уже отмечен."""
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO recipients (campaign_id, chat_id, status) VALUES (?, ?, ?)",
+                (campaign_id, chat_id, self.JOINED)
+            )
+        return cursor.rowcount > 0
+
+    def count_recipients(self, campaign_id):
+        """Считает получателей кампании по статусам и ошибки по типам."""
+        with self._lock:
+            statuses = dict(self.connection.execute(
+                "SELECT status, COUNT(*) FROM recipients WHERE campaign_id = ? GROUP BY status", (campaign_id,)
+            ).fetchall())
+            errors = dict(self.connection.execute(
+                "SELECT error, COUNT(*) FROM recipients WHERE campaign_id = ? AND error IS NOT NULL "
+                "GROUP BY error", (campaign_id,)
+            ).fetchall())
+        return statuses, errors
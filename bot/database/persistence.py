@@ -0,0 +1,218 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from telegram.ext import BasePersistence, PersistenceInput
+from bot.config import PERSISTENCE_FILE, PERSISTENCE_INTERVAL, logger
+
+class SQLitePersistence(BasePersistence):
+    """Сохранение состояний диалогов и user_data в SQLite, чтобы перезапуск не прерывал диалоги.
+
+    Записываются только изменившиеся записи: изменения, переданные приложением за один цикл
+    сохранения (раз в update_interval секунд), пишутся на диск одной транзакцией. Если запись
+    не удалась, пакет остается в очереди и повторяется с растущей паузой.
+    """
+
+    # Пауза перед повтором неудавшейся записи (в секундах): удваивается после каждой ошибки
+    RETRY_DELAY = 1.0
+    MAX_RETRY_DELAY = 60.0
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            name TEXT NOT NULL,
+            conversation_key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, conversation_key)
+        );
+        CREATE TABLE IF NOT EXISTS user_data (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, filename=PERSISTENCE_FILE, update_interval=PERSISTENCE_INTERVAL):
+        """Инициализация хранилища состояния бота в файле filename."""
+        # Сохраняем только данные пользователей и диалоги - остальное бот не использует
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.filename = filename
+        self._connection = None
+        self._lock = threading.Lock()
+        # Изменения, ожидающие записи: ключ записи -> значение (None - удалить)
+        self._pending = {}
+        self._flush_task = None
+        # Задача записи ждет паузы перед повтором
+        self._retrying = False
+
+        # Метрики записи
+        self.batches = 0
+        self.written = 0
+        self.failures = 0
+
+    @property
+    def connection(self):
+        """Возвращает соединение с базой, создавая схему при первом подключении."""
+        if self._connection is None:
+            connection = sqlite3.connect(self.filename, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def get_user_data(self):
+        """Загружает user_data всех пользователей при запуске."""
+        with self._lock:
+            rows = self.connection.execute("SELECT user_id, data FROM user_data").fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    async def get_conversations(self, name):
+        """Загружает состояния диалогов ConversationHandler с указанным именем."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT conversation_key, state FROM conversations WHERE name = ?", (name,)
+            ).fetchall()
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name, key, new_state):
+        """Запоминает новое состояние диалога (None - диалог завершен)."""
+        value = None if new_state is None else json.dumps(new_state)
+        self._schedule(('conversation', name, json.dumps(list(key))), value)
+
+    async def update_user_data(self, user_id, data):
+        """Запоминает изменившиеся user_data пользователя."""
+        try:
+            # Сериализуем сразу: словарь может измениться до записи на диск
+            value = json.dumps(data, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Не удалось сохранить user_data пользователя {user_id}: {e}")
+            return
+        self._schedule(('user', user_id), value)
+
+    async def drop_user_data(self, user_id):
+        """Удаляет user_data пользователя."""
+        self._schedule(('user', user_id), None)
+
+    def _schedule(self, key, value):
+        """Добавляет изменение в пакет и планирует запись пакета."""
+        self._pending[key] = value
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_pending())
+
+    async def _flush_pending(self):
+        """Записывает накопленные пакеты изменений в отдельном потоке, повторяя неудавшиеся с паузой."""
+        # Даем остальным изменениям текущего цикла сохранения попасть в тот же пакет
+        await asyncio.sleep(0)
+        delay = self.RETRY_DELAY
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            if await asyncio.get_running_loop().run_in_executor(None, self._write, batch):
+                delay = self.RETRY_DELAY
+                continue
+            self._requeue(batch)
+            # Ошибка диска или блокировка базы обычно не проходит сразу - не повторяем запись вхолостую
+            self._retrying = True
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._retrying = False
+            delay = min(delay * 2, self.MAX_RETRY_DELAY)
+
+    def _requeue(self, batch):
+        """Возвращает неудавшийся пакет в очередь; более новые изменения тех же записей важнее."""
+        for key, value in batch.items():
+            self._pending.setdefault(key, value)
+
+    def _write(self, batch):
+        """Записывает пакет изменений одной транзакцией; возвращает успешность."""
+        try:
+            with self._lock, self.connection:
+                for key, value in batch.items():
+                    if key[0] == 'conversation':
+                        if value is None:
+                            self.connection.execute(
+                                "DELETE FROM conversations WHERE name = ? AND conversation_key = ?", key[1:]
+                            )
+                        else:
+                            self.connection.execute(
+                                "INSERT OR REPLACE INTO conversations (name, conversation_key, state) VALUES (?, ?, ?)",
+                                (*key[1:], value)
+                            )
+                    elif value is None:
+                        self.connection.execute("DELETE FROM user_data WHERE user_id = ?", (key[1],))
+                    else:
+                        self.connection.execute(
+                            "INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)", (key[1], value)
+                        )
+            self.batches += 1
+            self.written += len(batch)
+            return True
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Ошибка записи состояния бота в {self.filename}: {e}")
+            return False
+
+    async def flush(self):
+        """Записывает все ожидающие изменения (вызывается при остановке бота)."""
+        if self._flush_task is not None:
+            if self._retrying:
+                # Пакет уже в очереди, последнюю попытку делаем ниже, не дожидаясь паузы
+                self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        if self._pending:
+            batch, self._pending = self._pending, {}
+            if not self._write(batch):
+                self._requeue(batch)
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self):
+        """Возвращает количество записанных пакетов и изменений, ошибок записи и ожидающих изменений."""
+        return {
+            'batches': self.batches,
+            'written': self.written,
+            'failures': self.failures,
+            'pending': len(self._pending)
+        }
+
+    # Данные чатов, бота и callback_data не сохраняются
+
+    async def get_chat_data(self):
+        """Данные чатов не сохраняются."""
+        return {}
+
+    async def get_bot_data(self):
+        """Данные бота не сохраняются."""
+        return {}
+
+    async def get_callback_data(self):
+        """callback_data не сохраняются."""
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        """Данные чатов не сохраняются."""
+
+    async def update_bot_data(self, data):
+        """Данные бота не сохраняются."""
+
+    async def update_callback_data(self, data):
+        """callback_data не сохраняются."""
+
+    async def drop_chat_data(self, chat_id):
+        """Данные чатов не сохраняются."""
+
+    async def refresh_user_data(self, user_id, user_data):
+        """user_data хранятся в памяти приложения, перечитывать их не нужно."""
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        """Данные чатов не сохраняются."""
+
+    async def refresh_bot_data(self, bot_data):
+        """Данные бота не сохраняются."""
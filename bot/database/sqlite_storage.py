@@ -0,0 +1,291 @@
+import json
+import secrets
+import sqlite3
+import threading
+from bot.config import logger
+
+class SQLiteStorage:
+    """Хранилище кандидатов и вакансий в базе SQLite."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS candidates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid TEXT,
+            name TEXT,
+            vacancy TEXT,
+            status TEXT,
+            rejection_type TEXT,
+            rejection_reason TEXT,
+            date TEXT,
+            updated_at TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_candidates_status ON candidates(status);
+        CREATE INDEX IF NOT EXISTS idx_candidates_vacancy ON candidates(vacancy);
+        CREATE INDEX IF NOT EXISTS idx_candidates_rejection_type ON candidates(rejection_type);
+        CREATE INDEX IF NOT EXISTS idx_candidates_date ON candidates(date);
+
+        CREATE TABLE IF NOT EXISTS vacancies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+    """
+
+    # Колонки кандидата в порядке значений, которые возвращает _columns
+    CANDIDATE_COLUMNS = (
+        'uid', 'name', 'vacancy', 'status', 'rejection_type', 'rejection_reason', 'date', 'updated_at', 'data'
+    )
+    INSERT_CANDIDATE = (
+        f"INSERT INTO candidates ({', '.join(CANDIDATE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in CANDIDATE_COLUMNS)})"
+    )
+    UPDATE_CANDIDATE = f"UPDATE candidates SET {', '.join(f'{column} = ?' for column in CANDIDATE_COLUMNS)}"
+
+    def __init__(self, filename, synchronous='NORMAL'):
+        """Инициализация хранилища, соединение открывается при первом обращении."""
+        self.filename = filename
+        self.synchronous = synchronous
+        self._connection = None
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self):
+        """Возвращает соединение с базой, создавая схему при первом подключении."""
+        if self._connection is None:
+            connection = sqlite3.connect(self.filename, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"PRAGMA synchronous={self.synchronous}")
+            connection.executescript(self.SCHEMA)
+            self._upgrade_schema(connection)
+            self._connection = connection
+        return self._connection
+
+    def _upgrade_schema(self, connection):
+        """Добавляет колонки, появившиеся в новых версиях (uid, updated_at), и заполняет ID кандидатов."""
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(candidates)")}
+        with connection:
+            if 'uid' not in columns:
+                connection.execute("ALTER TABLE candidates ADD COLUMN uid TEXT")
+            if 'updated_at' not in columns:
+                connection.execute("ALTER TABLE candidates ADD COLUMN updated_at TEXT")
+            connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_candidates_uid ON candidates(uid)")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_candidates_updated_at ON candidates(updated_at)")
+
+            rows = connection.execute("SELECT id, data FROM candidates WHERE uid IS NULL").fetchall()
+            for row_id, data in rows:
+                candidate = json.loads(data)
+                candidate['id'] = candidate.get('id') or secrets.token_hex(4)
+                connection.execute(
+                    "UPDATE candidates SET uid = ?, data = ? WHERE id = ?",
+                    (candidate['id'], json.dumps(candidate, ensure_ascii=False), row_id)
+                )
+        if rows:
+            logger.info(f"Кандидатам в базе {self.filename} назначены ID: {len(rows)}")
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @staticmethod
+    def _columns(candidate):
+        """Возвращает значения индексируемых колонок и JSON записи кандидата."""
+        rejection = candidate.get('rejection_reason') or {}
+        return (
+            candidate.get('id'),
+            candidate.get('name'),
+            candidate.get('vacancy'),
+            candidate.get('status'),
+            rejection.get('type'),
+            rejection.get('reason'),
+            candidate.get('date'),
+            candidate.get('updated_at') or candidate.get('date'),
+            json.dumps(candidate, ensure_ascii=False)
+        )
+
+    def get_candidates(self):
+        """Получает список кандидатов в порядке добавления."""
+        with self._lock:
+            rows = self.connection.execute("SELECT data FROM candidates ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_candidates(self, candidates):
+        """Полностью заменяет список кандидатов."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM candidates")
+            self.connection.executemany(
+                self.INSERT_CANDIDATE,
+                [self._columns(candidate) for candidate in candidates]
+            )
+        return True
+
+    def add_candidate(self, candidate_data):
+        """Добавляет нового кандидата, назначая ему ID, если его нет."""
+        with self._lock, self.connection:
+            if not candidate_data.get('id'):
+                candidate_data = dict(candidate_data, id=self._new_uid())
+            self.connection.execute(
+                self.INSERT_CANDIDATE,
+                self._columns(candidate_data)
+            )
+        return True
+
+    def _new_uid(self):
+        """Генерирует короткий ID кандидата, которого еще нет в базе; вызывается под блокировкой."""
+        while True:
+            candidate_id = secrets.token_hex(4)
+            if self.connection.execute("SELECT 1 FROM candidates WHERE uid = ?", (candidate_id,)).fetchone() is None:
+                return candidate_id
+
+    def update_candidate(self, index, candidate_data):
+        """Обновляет кандидата по его позиции в списке."""
+        if index < 0:
+            return False
+        with self._lock, self.connection:
+            row = self.connection.execute(
+                "SELECT id, uid FROM candidates ORDER BY id LIMIT 1 OFFSET ?", (index,)
+            ).fetchone()
+            if row is None:
+                return False
+            # ID кандидата не меняется при обновлении
+            candidate_data = dict(candidate_data, id=row[1])
+            self.connection.execute(
+                self.UPDATE_CANDIDATE + " WHERE id = ?",
+                (*self._columns(candidate_data), row[0])
+            )
+        return True
+
+    def get_candidate(self, candidate_id):
+        """Получает кандидата по ID или None."""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT data FROM candidates WHERE uid = ?", (candidate_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_candidate_by_id(self, candidate_id, candidate_data):
+        """Обновляет кандидата по ID."""
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                self.UPDATE_CANDIDATE + " WHERE uid = ?",
+                (*self._columns(candidate_data), candidate_id)
+            )
+        return cursor.rowcount > 0
+
+    def count_candidates(self):
+        """Возвращает общее количество кандидатов."""
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def get_candidates_page(self, cursor, limit, status=None, vacancy=None):
+        """Получает страницу кандидатов по курсору (id записи) с фильтрами по индексированным колонкам."""
+        conditions = ""
+        params = []
+        if status is not None:
+            conditions += " AND status = ?"
+            params.append(status)
+        if vacancy is not None:
+            conditions += " AND vacancy = ?"
+            params.append(vacancy)
+
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT id, data FROM candidates WHERE id >= ?{conditions} ORDER BY id LIMIT ?",
+                (cursor, *params, limit + 1)
+            ).fetchall()
+            prev_cursor = self.connection.execute(
+                f"SELECT MIN(id) FROM (SELECT id FROM candidates WHERE id < ?{conditions} "
+                f"ORDER BY id DESC LIMIT ?)",
+                (cursor, *params, limit)
+            ).fetchone()[0]
+
+        return {
+            'items': [json.loads(data) for _, data in rows[:limit]],
+            'next_cursor': rows[limit][0] if len(rows) > limit else None,
+            'prev_cursor': prev_cursor
+        }
+
+    def get_statistics(self):
+        """Считает кандидатов по статусам, причинам отказа, вакансиям и дням индексированными запросами."""
+        with self._lock:
+            execute = self.connection.execute
+            return {
+                'total': execute("SELECT COUNT(*) FROM candidates").fetchone()[0],
+                'status_count': dict(execute(
+                    "SELECT status, COUNT(*) FROM candidates GROUP BY status"
+                ).fetchall()),
+                'rejection_count': dict(execute(
+                    "SELECT rejection_type, COUNT(*) FROM candidates "
+                    "WHERE rejection_type IS NOT NULL GROUP BY rejection_type"
+                ).fetchall()),
+                'vacancy_count': dict(execute(
+                    "SELECT vacancy, COUNT(*) FROM candidates GROUP BY vacancy"
+                ).fetchall()),
+                'daily_count': dict(execute(
+                    "SELECT substr(date, 1, 10) AS day, COUNT(*) FROM candidates "
+                    "WHERE date IS NOT NULL GROUP BY day"
+                ).fetchall())
+            }
+
+    def iter_export_rows(self, since=None, batch_size=1000):
+        """Построчно отдает поля кандидатов для экспорта, не загружая всю таблицу.
+
+        Если указан since, отдаются только кандидаты, измененные позже этого момента.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT id, name, vacancy, status, rejection_type, rejection_reason, date "
+                    "FROM candidates WHERE id > ? AND (? IS NULL OR updated_at > ?) ORDER BY id LIMIT ?",
+                    (last_id, since, since, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[1:]
+            last_id = rows[-1][0]
+
+    def get_vacancies(self):
+        """Получает список вакансий."""
+        with self._lock:
+            rows = self.connection.execute("SELECT data FROM vacancies ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def data_version(self):
+        """Номер версии базы: меняется, когда данные изменяет другое соединение (например, правка вакансий)."""
+        with self._lock:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def save_vacancies(self, vacancies):
+        """Полностью заменяет список вакансий."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM vacancies")
+            self.connection.executemany(
+                "INSERT INTO vacancies (title, data) VALUES (?, ?)",
+                [(vacancy['title'], json.dumps(vacancy, ensure_ascii=False)) for vacancy in vacancies]
+            )
+        return True
+
+    def migrate(self, candidates, vacancies):
+        """Переносит кандидатов и вакансии в пустую базу одной транзакцией."""
+        with self._lock, self.connection:
+            existing = self.connection.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+            if existing:
+                logger.warning(f"В базе {self.filename} уже есть {existing} кандидатов, миграция пропущена")
+                return False
+            candidates = [c if c.get('id') else dict(c, id=secrets.token_hex(4)) for c in candidates]
+            self.connection.executemany(
+                self.INSERT_CANDIDATE,
+                [self._columns(candidate) for candidate in candidates]
+            )
+            self.connection.execute("DELETE FROM vacancies")
+            self.connection.executemany(
+                "INSERT INTO vacancies (title, data) VALUES (?, ?)",
+                [(vacancy['title'], json.dumps(vacancy, ensure_ascii=False)) for vacancy in vacancies]
+            )
+        logger.info(f"В базу {self.filename} перенесено кандидатов: {len(candidates)}, вакансий: {len(vacancies)}")
+        return True
@@ -1,12 +1,64 @@
 import json
 import os
-import csv
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
 from datetime import datetime
-from bot.config import logger, CANDIDATES_FILE, VACANCIES_FILE, ANALYTICS_FILE, DEFAULT_VACANCIES
+from bot.config import (
+    logger, CANDIDATES_FILE, VACANCIES_FILE,
+    CANDIDATES_JOURNAL_FILE, STORAGE_BACKEND, JOURNAL_COMPACT_THRESHOLD, DATABASE_FILE,
+    STORAGE_DURABILITY, WRITE_BEHIND_DELAY, VACANCIES_CHECK_INTERVAL
+)
+from bot.database.journal import CandidateJournal
+from bot.database.cache import CandidateCache
+from bot.database.counters import CandidateCounters
+from bot.database.sqlite_storage import SQLiteStorage
+from bot.database.write_behind import WriteBehindWriter
+from bot.database.vacancies import VacancyCatalog
+from bot.utils.metrics import metrics
+
+def synchronized(method):
+    """Выполняет метод DataStorage под общей блокировкой хранилища и замеряет его длительность."""
+    name = method.__name__
+    
+    @wraps(method)
+    def wrapper(cls, *args, **kwargs):
+        if not metrics.enabled:
+            with cls._lock:
+                return method(cls, *args, **kwargs)
+        
+        # Время ожидания блокировки входит в замер: вызывающий код ждет и его
+        started = time.perf_counter()
+        error = False
+        try:
+            with cls._lock:
+                return method(cls, *args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.observe_storage(name, time.perf_counter() - started, error)
+    return wrapper
 
 class DataStorage:
     """Класс для управления хранением данных."""
     
+    # Методы хранилища вызываются из пула потоков AsyncDataStorage
+    _lock = threading.RLock()
+    
+    # Журнал изменений кандидатов (используется при STORAGE_BACKEND=journal)
+    _journal = CandidateJournal(CANDIDATES_FILE, CANDIDATES_JOURNAL_FILE, JOURNAL_COMPACT_THRESHOLD)
+    
+    # Разобранный список кандидатов в памяти, перечитывается только при изменении файлов
+    _cache = CandidateCache(CANDIDATES_FILE, CANDIDATES_JOURNAL_FILE)
+    
+    # База SQLite (используется при STORAGE_BACKEND=sqlite)
+    _sqlite = SQLiteStorage(DATABASE_FILE, synchronous='FULL' if STORAGE_DURABILITY == 'sync' else 'NORMAL')
+    
     @staticmethod
     def load_data(filename, default=None):
         """Загружает данные из JSON-файла."""
@@ -14,90 +66,436 @@ class DataStorage:
             if os.path.exists(filename):
                 with open(filename, 'r', encoding='utf-8') as file:
                     return json.load(file)
-            return default or {}
+            return default if default is not None else {}
+        except json.JSONDecodeError as e:
+            # Сохраняем копию поврежденного файла, чтобы следующая запись не уничтожила данные
+            backup = f"{filename}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            shutil.copyfile(filename, backup)
+            logger.error(f"Файл {filename} поврежден ({e}), копия сохранена в {backup}")
+            return default if default is not None else {}
         except Exception as e:
             logger.error(f"Ошибка загрузки данных из {filename}: {e}")
-            return default or {}
+            return default if default is not None else {}
 
     @staticmethod
     def save_data(filename, data):
-        """Сохраняет данные в JSON-файл."""
+        """Атомарно сохраняет данные в JSON-файл: временный файл, fsync и переименование."""
+        tmp_filename = None
         try:
-            with open(filename, 'w', encoding='utf-8') as file:
+            directory, basename = os.path.split(os.path.abspath(filename))
+            fd, tmp_filename = tempfile.mkstemp(prefix=f"{basename}.", suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
                 json.dump(data, file, ensure_ascii=False, indent=2)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_filename, filename)
             return True
         except Exception as e:
             logger.error(f"Ошибка сохранения данных в {filename}: {e}")
+            if tmp_filename and os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
             return False
     
     @classmethod
+    def _flush_candidates(cls):
+        """Записывает на диск изменения кандидатов, накопленные в кэше."""
+        if cls._cache.candidates is None:
+            return True
+        if STORAGE_BACKEND == 'journal':
+            success = cls._storage_call(cls._journal.sync)
+        else:
+            success = cls.save_data(CANDIDATES_FILE, cls._cache.candidates)
+        if success:
+            cls._cache.touch()
+            cls._cache.pinned = False
+        return success
+    
+    @classmethod
+    def _persist(cls):
+        """Записывает изменения, уже внесенные в кэш, сразу или в ближайшем пакете."""
+        # Пока изменения не записаны, кэш - единственная актуальная копия и не перечитывается
+        cls._cache.pinned = True
+        return cls._writer.write()
+    
+    @classmethod
+    def flush(cls):
+        """Принудительно записывает накопленные изменения кандидатов."""
+        return cls._writer.flush()
+    
+    @classmethod
+    def get_write_stats(cls):
+        """Возвращает метрики записи: задержку и размер пакетов."""
+        return cls._writer.stats()
+    
+    @classmethod
+    def _load_candidates(cls):
+        """Читает список кандидатов с диска."""
+        if STORAGE_BACKEND == 'journal':
+            try:
+                candidates = cls._journal.load()
+            except Exception as e:
+                logger.error(f"Ошибка загрузки журнала кандидатов: {e}")
+                return []
+        else:
+            candidates = cls.load_data(CANDIDATES_FILE, [])
+        
+        # Кандидатам, сохраненным до появления ID, назначаем их один раз и записываем на диск
+        missing = [candidate for candidate in candidates if not candidate.get('id')]
+        if missing:
+            used_ids = {candidate['id'] for candidate in candidates if candidate.get('id')}
+            for candidate in missing:
+                candidate['id'] = cls._new_candidate_id(used_ids)
+                used_ids.add(candidate['id'])
+            if STORAGE_BACKEND == 'journal':
+                cls._storage_call(cls._journal.compact, candidates)
+            else:
+                cls.save_data(CANDIDATES_FILE, candidates)
+            logger.info(f"Кандидатам без ID назначены идентификаторы: {len(missing)}")
+        return candidates
+    
+    @staticmethod
+    def _new_candidate_id(used_ids):
+        """Генерирует короткий ID кандидата, которого нет среди used_ids."""
+        while True:
+            candidate_id = secrets.token_hex(4)
+            if candidate_id not in used_ids:
+                return candidate_id
+    
+    @classmethod
+    @synchronized
+    def get_candidate(cls, candidate_id):
+        """Получает кандидата по ID или None, если такого нет."""
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.get_candidate, candidate_id) or None
+        candidates = cls._cache.get(cls._load_candidates)
+        position = cls._cache.position(candidate_id)
+        return dict(candidates[position]) if position is not None else None
+    
+    @classmethod
+    @synchronized
     def get_candidates(cls):
         """Получает список кандидатов."""
-        return cls.load_data(CANDIDATES_FILE, [])
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.get_candidates) or []
+        # Отдаем копии записей, чтобы изменения в обработчиках не портили кэш
+        return [dict(candidate) for candidate in cls._cache.get(cls._load_candidates)]
+    
+    @classmethod
+    @synchronized
+    def get_candidates_page(cls, cursor=0, limit=10, status=None, vacancy=None):
+        """Получает страницу кандидатов, начиная с курсора, с необязательными фильтрами по статусу и вакансии.
+        
+        Возвращает словарь с кандидатами страницы и курсорами следующей и предыдущей страниц (или None).
+        Стоимость зависит от размера страницы, а не от общего числа кандидатов: без фильтров страница -
+        отрезок списка, с фильтрами позиции подходящих кандидатов берутся из индекса кэша (или базы SQLite).
+        """
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.get_candidates_page, cursor, limit, status, vacancy) or {
+                'items': [], 'next_cursor': None, 'prev_cursor': None
+            }
+        
+        candidates = cls._cache.get(cls._load_candidates)
+        cursor = max(cursor, 0)
+        if status is None and vacancy is None:
+            # Подходит любой кандидат: страница - просто отрезок списка
+            start = min(cursor, len(candidates))
+            items = [dict(candidate) for candidate in candidates[start:start + limit]]
+            next_cursor = start + limit if start + limit < len(candidates) else None
+            prev_cursor = max(start - limit, 0) if start > 0 else None
+            return {'items': items, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+        
+        # Отсортированные позиции подходящих кандидатов: страница находится двоичным поиском
+        positions = cls._cache.filters.positions(status, vacancy)
+        start = bisect_left(positions, cursor)
+        items = [dict(candidates[position]) for position in positions[start:start + limit]]
+        next_cursor = positions[start + limit] if start + limit < len(positions) else None
+        prev_cursor = positions[max(start - limit, 0)] if start > 0 else None
+        
+        return {'items': items, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
     
     @classmethod
+    @synchronized
+    def get_cache_stats(cls):
+        """Возвращает счетчики попаданий и промахов кэша кандидатов."""
+        return cls._cache.stats()
+    
+    @classmethod
+    @synchronized
     def save_candidates(cls, candidates):
         """Сохраняет список кандидатов."""
-        return cls.save_data(CANDIDATES_FILE, candidates)
+        used_ids = {candidate['id'] for candidate in candidates if candidate.get('id')}
+        with_ids = []
+        for candidate in candidates:
+            if not candidate.get('id'):
+                candidate = dict(candidate, id=cls._new_candidate_id(used_ids))
+                used_ids.add(candidate['id'])
+            with_ids.append(candidate)
+        candidates = with_ids
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.save_candidates, candidates)
+        if STORAGE_BACKEND == 'journal':
+            success = cls._storage_call(cls._journal.compact, candidates)
+            if success:
+                cls._cache.store([dict(candidate) for candidate in candidates])
+            else:
+                cls._cache.invalidate()
+            return success
+        
+        cls._cache.store([dict(candidate) for candidate in candidates])
+        return cls._finish_write(cls._persist())
     
     @classmethod
+    @synchronized
     def add_candidate(cls, candidate_data):
         """Добавляет нового кандидата."""
-        candidates = cls.get_candidates()
-        candidates.append(candidate_data)
-        return cls.save_candidates(candidates)
+        candidate_data = dict(candidate_data, updated_at=datetime.now().isoformat())
+        if STORAGE_BACKEND == 'sqlite':
+            # ID нового кандидата назначается в транзакции вставки
+            return cls._storage_call(cls._sqlite.add_candidate, candidate_data)
+        cls._cache.get(cls._load_candidates)
+        # ID назначается под блокировкой хранилища, поэтому два новых кандидата не получат один и тот же
+        if not candidate_data.get('id'):
+            candidate_data['id'] = cls._new_candidate_id(cls._cache.positions)
+        cls._cache.append(dict(candidate_data))
+        
+        if STORAGE_BACKEND == 'journal':
+            success = cls._storage_call(cls._journal.append, 'add', data=candidate_data) and cls._persist()
+        else:
+            success = cls._persist()
+        return cls._finish_write(success)
     
     @classmethod
+    @synchronized
     def update_candidate(cls, index, candidate_data):
-        """Обновляет данные кандидата."""
-        candidates = cls.get_candidates()
-        if 0 <= index < len(candidates):
-            candidates[index] = candidate_data
-            return cls.save_candidates(candidates)
-        return False
+        """Обновляет данные кандидата по позиции в списке."""
+        candidate_data = dict(candidate_data, updated_at=datetime.now().isoformat())
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.update_candidate, index, candidate_data)
+        candidates = cls._cache.get(cls._load_candidates)
+        if not 0 <= index < len(candidates):
+            return False
+        # ID кандидата не меняется при обновлении
+        candidate_data = dict(candidate_data, id=candidates[index]['id'])
+        cls._cache.replace(index, candidate_data)
+        
+        if STORAGE_BACKEND == 'journal':
+            success = cls._storage_call(cls._journal.append, 'update', index=index, data=candidate_data) and cls._persist()
+        else:
+            success = cls._persist()
+        return cls._finish_write(success)
     
     @classmethod
+    @synchronized
+    def update_candidate_by_id(cls, candidate_id, candidate_data):
+        """Обновляет данные кандидата по его ID."""
+        candidate_data = dict(candidate_data, id=candidate_id, updated_at=datetime.now().isoformat())
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.update_candidate_by_id, candidate_id, candidate_data)
+        cls._cache.get(cls._load_candidates)
+        position = cls._cache.position(candidate_id)
+        if position is None:
+            return False
+        cls._cache.replace(position, candidate_data)
+        
+        if STORAGE_BACKEND == 'journal':
+            success = cls._storage_call(cls._journal.append, 'update', id=candidate_id, data=candidate_data) and cls._persist()
+        else:
+            success = cls._persist()
+        return cls._finish_write(success)
+    
+    @classmethod
+    @synchronized
+    def update_candidate_fields(cls, candidate_id, fields):
+        """Атомарно меняет отдельные поля кандидата и возвращает обновленную запись (или None).
+        
+        Чтение и запись выполняются под одной блокировкой, поэтому одновременные изменения
+        разных полей одного кандидата из разных чатов не затирают друг друга.
+        """
+        candidate = cls.get_candidate(candidate_id)
+        if candidate is None:
+            return None
+        candidate.update(fields)
+        if not cls.update_candidate_by_id(candidate_id, candidate):
+            return None
+        return candidate
+    
+    @classmethod
+    @synchronized
     def clear_candidates(cls):
         """Полностью очищает список кандидатов."""
         return cls.save_candidates([])
     
     @classmethod
-    def get_vacancies(cls):
-        """Получает список вакансий."""
-        vacancies = cls.load_data(VACANCIES_FILE, [])
-        if not vacancies:
-            # Если файл с вакансиями пуст, используем примеры
-            cls.save_data(VACANCIES_FILE, DEFAULT_VACANCIES)
-            return DEFAULT_VACANCIES
-        return vacancies
+    @synchronized
+    def compact_candidates(cls):
+        """Сворачивает журнал изменений кандидатов в снимок candidates.json."""
+        if STORAGE_BACKEND != 'journal':
+            return True
+        candidates = cls._cache.get(cls._load_candidates)
+        return cls._finish_write(cls._storage_call(cls._journal.compact, candidates))
     
     @classmethod
-    def export_analytics_to_csv(cls):
-        """Экспортирует данные кандидатов в CSV-файл."""
+    def _finish_write(cls, success):
+        """Синхронизирует кэш с диском после записи изменений, уже внесенных в кэш."""
+        if success:
+            cls._cache.touch()
+        else:
+            # Запись не удалась: на диске осталась прежняя версия, кэш перечитаем
+            cls._cache.invalidate()
+        return success
+    
+    @classmethod
+    def _storage_call(cls, method, *args, **kwargs):
+        """Вызывает операцию журнала или базы, логируя ошибки так же, как save_data."""
         try:
-            candidates = cls.get_candidates()
-            
-            with open(ANALYTICS_FILE, 'w', encoding='utf-8', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(["Имя", "Вакансия", "Статус", "Причина отказа", "Дата"])
-                
-                for candidate in candidates:
-                    rejection_reason = "-"
-                    if candidate.get('rejection_reason'):
-                        rejection_reason = f"{candidate['rejection_reason']['type']}: {candidate['rejection_reason']['reason']}"
-                    
-                    # Форматируем дату
-                    date = datetime.fromisoformat(candidate['date']).strftime("%Y-%m-%d")
-                    
-                    writer.writerow([
-                        candidate['name'],
-                        candidate['vacancy'],
-                        candidate['status'],
-                        rejection_reason,
-                        date
-                    ])
-                    
-            return True
+            return method(*args, **kwargs)
         except Exception as e:
-            logger.error(f"Ошибка экспорта аналитики: {e}")
-            return False 
\ No newline at end of file
+            logger.error(f"Ошибка работы с хранилищем кандидатов ({STORAGE_BACKEND}): {e}")
+            return False
+    
+    @classmethod
+    @synchronized
+    def count_candidates(cls):
+        """Возвращает общее количество кандидатов."""
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.count_candidates) or 0
+        cls._cache.get(cls._load_candidates)
+        return cls._cache.counters.total
+    
+    @classmethod
+    @synchronized
+    def get_statistics(cls):
+        """Возвращает счетчики кандидатов: всего, по статусам, причинам отказа, вакансиям и дням."""
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.get_statistics) or CandidateCounters().snapshot()
+        cls._cache.get(cls._load_candidates)
+        return cls._cache.counters.snapshot()
+    
+    @classmethod
+    @synchronized
+    def rebuild_statistics(cls):
+        """Пересчитывает счетчики кандидатов с нуля полным проходом по списку."""
+        if STORAGE_BACKEND == 'sqlite':
+            return True
+        cls._cache.counters.rebuild(cls._cache.get(cls._load_candidates))
+        return True
+    
+    @classmethod
+    @synchronized
+    def verify_statistics(cls):
+        """Сверяет поддерживаемые счетчики с полным пересчетом списка кандидатов."""
+        if STORAGE_BACKEND == 'sqlite':
+            return True
+        expected = CandidateCounters()
+        expected.rebuild(cls._cache.get(cls._load_candidates))
+        actual = cls._cache.counters.snapshot()
+        if actual != expected.snapshot():
+            logger.error(f"Счетчики кандидатов расходятся с полным пересчетом: {actual} != {expected.snapshot()}")
+            return False
+        return True
+    
+    @classmethod
+    def _load_vacancies(cls):
+        """Читает список вакансий из файла или базы (вызывается каталогом вакансий)."""
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.get_vacancies) or []
+        return cls.load_data(VACANCIES_FILE, [])
+    
+    @classmethod
+    def _vacancies_signature(cls):
+        """Отпечаток источника вакансий: меняется при правке файла или базы."""
+        if STORAGE_BACKEND == 'sqlite':
+            return cls._storage_call(cls._sqlite.data_version)
+        return VacancyCatalog.file_signature(VACANCIES_FILE)
+    
+    @classmethod
+    def get_vacancies(cls):
+        """Получает список вакансий (если источник пуст - примеры из настроек)."""
+        # Каталог держит вакансии в памяти и не требует общей блокировки хранилища
+        return cls._vacancies.get_all()
+    
+    @classmethod
+    def get_vacancy(cls, vacancy_id):
+        """Получает вакансию по ID (поле id вакансии) или None."""
+        return cls._vacancies.get(vacancy_id)
+    
+    @classmethod
+    def find_vacancy(cls, title):
+        """Получает ID вакансии по названию или None."""
+        return cls._vacancies.find(title)
+    
+    @classmethod
+    def get_vacancies_text(cls):
+        """Получает готовый текст списка вакансий."""
+        return cls._vacancies.get_listing_text()
+    
+    @classmethod
+    def add_vacancies_listener(cls, listener):
+        """Подписывает listener(vacancies) на загрузку и перезагрузку списка вакансий."""
+        cls._vacancies.add_listener(listener)
+    
+    @classmethod
+    def vacancies_fresh(cls):
+        """Проверяет, что список вакансий можно отдать из памяти без проверки источника."""
+        return cls._vacancies.is_fresh()
+    
+    @classmethod
+    def get_vacancies_stats(cls):
+        """Возвращает количество вакансий и перезагрузок каталога."""
+        return cls._vacancies.stats()
+    
+    # Заголовок CSV-выгрузки кандидатов
+    EXPORT_HEADER = ["Имя", "Вакансия", "Статус", "Причина отказа", "Дата"]
+    
+    @classmethod
+    def iter_export_rows(cls, since=None):
+        """Построчно отдает поля кандидатов для экспорта: имя, вакансия, статус, тип и причина отказа, дата.
+        
+        Если указан since (ISO-время), отдаются только кандидаты, измененные позже этого момента.
+        """
+        if STORAGE_BACKEND == 'sqlite':
+            yield from cls._sqlite.iter_export_rows(since)
+            return
+        
+        with cls._lock:
+            candidates = list(cls._cache.get(cls._load_candidates))
+        
+        for candidate in candidates:
+            if since and (candidate.get('updated_at') or candidate.get('date') or '') <= since:
+                continue
+            rejection = candidate.get('rejection_reason') or {}
+            yield (
+                candidate['name'],
+                candidate['vacancy'],
+                candidate['status'],
+                rejection.get('type'),
+                rejection.get('reason'),
+                candidate['date']
+            )
+    
+    @staticmethod
+    def format_export_row(row):
+        """Преобразует поля кандидата из iter_export_rows в строку CSV."""
+        name, vacancy, status, rejection_type, reason, date = row
+        rejection_reason = "-"
+        if rejection_type:
+            rejection_reason = f"{rejection_type}: {reason}"
+        
+        # Форматируем дату
+        date = datetime.fromisoformat(date).strftime("%Y-%m-%d")
+        
+        return [name, vacancy, status, rejection_reason, date]
+
+# Отложенная запись кандидатов (STORAGE_DURABILITY=batched) или запись при каждом изменении (sync)
+DataStorage._writer = WriteBehindWriter(
+    DataStorage._flush_candidates,
+    WRITE_BEHIND_DELAY if STORAGE_DURABILITY == 'batched' else 0,
+    DataStorage._lock
+)
+
+# Каталог вакансий в памяти, перечитывается только при изменении файла или базы
+DataStorage._vacancies = VacancyCatalog(
+    DataStorage._load_vacancies,
+    DataStorage._vacancies_signature,
+    VACANCIES_CHECK_INTERVAL
+)
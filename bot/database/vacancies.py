@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+import zlib
+from bot.config import DEFAULT_VACANCIES, logger
+
+class VacancyCatalog:
+    """Каталог вакансий в памяти с индексом по ID и названию.
+
+    Вакансии загружаются один раз и перечитываются, только если изменился источник: проверка
+    отпечатка (время изменения файла или версия базы) выполняется не чаще раза в check_interval
+    секунд. Текст списка для /vacancies собирается при загрузке.
+
+    ID вакансии - ее поле id, а если его нет - число, вычисленное из названия. ID не зависит от
+    положения вакансии в списке, поэтому начатые диалоги, рассылки и кнопки после добавления,
+    удаления или перестановки вакансий продолжают ссылаться на ту же вакансию.
+    """
+
+    def __init__(self, loader, signature, check_interval=1.0):
+        """
+        Инициализация каталога.
+
+        loader - функция, возвращающая список вакансий из источника;
+        signature - функция, возвращающая отпечаток источника (меняется при его изменении).
+        """
+        self.loader = loader
+        self.signature = signature
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = None
+        self._listeners = []
+
+        # Список вакансий, индексы по ID и по названию и готовый текст списка
+        self.vacancies = []
+        self.by_id = {}
+        self.by_title = {}
+        self.listing_text = None
+
+        self.reloads = 0
+
+    @staticmethod
+    def file_signature(path):
+        """Отпечаток файла: inode, время изменения и размер (None, если файла нет)."""
+        try:
+            stat = os.stat(path)
+            return stat.st_ino, stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def vacancy_id(vacancy):
+        """Возвращает ID вакансии: поле id или, если его нет, число из названия."""
+        if vacancy.get('id') is not None:
+            return int(vacancy['id'])
+        return zlib.crc32(vacancy['title'].encode('utf-8'))
+
+    def is_fresh(self):
+        """Проверяет, что каталог загружен и проверять источник еще рано."""
+        return self._checked is not None and time.monotonic() - self._checked < self.check_interval
+
+    def refresh(self):
+        """Перечитывает вакансии, если источник изменился с прошлой загрузки."""
+        if self.is_fresh():
+            return
+        with self._lock:
+            if self.is_fresh():
+                return
+            signature = self.signature()
+            if self._checked is None or signature != self._signature:
+                self._load()
+                self._signature = signature
+            self._checked = time.monotonic()
+
+    def _load(self):
+        """Загружает вакансии, строит индекс и текст списка."""
+        vacancies = self.loader() or []
+        if not vacancies:
+            # Пустой источник не перезаписывается примерами: они используются только в памяти
+            vacancies = DEFAULT_VACANCIES
+
+        self.vacancies = list(vacancies)
+        self.by_id = {}
+        for vacancy in self.vacancies:
+            vacancy_id = self.vacancy_id(vacancy)
+            if vacancy.get('id') is None:
+                logger.warning(f"У вакансии {vacancy['title']} нет поля id, ее ID вычислен из названия: {vacancy_id}")
+            if vacancy_id in self.by_id:
+                logger.error(f"Повторяющийся ID вакансии {vacancy_id}: {vacancy['title']} не будет доступна по ID")
+                continue
+            self.by_id[vacancy_id] = vacancy
+        self.by_title = {vacancy['title']: self.vacancy_id(vacancy) for vacancy in reversed(self.vacancies)}
+        self.listing_text = self.render_listing(self.vacancies)
+        self.reloads += 1
+        if self.reloads > 1:
+            logger.info(f"Список вакансий перечитан: {len(self.vacancies)} вакансий")
+
+        for listener in self._listeners:
+            try:
+                listener(self.vacancies)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке обновленного списка вакансий: {e}")
+
+    @staticmethod
+    def render_listing(vacancies):
+        """Формирует текст списка вакансий для /vacancies."""
+        if not vacancies:
+            return None
+        vacancy_text = "📋 Доступные вакансии:\n\n"
+        for vacancy in vacancies:
+            vacancy_text += f"{VacancyCatalog.vacancy_id(vacancy)}. {vacancy['title']}\n"
+            vacancy_text += f"💼 {vacancy['description']}\n"
+            vacancy_text += f"💰 Зарплата: {vacancy['salary']}\n\n"
+        vacancy_text += "Начать диалог по вакансии: /dialog <номер>"
+        return vacancy_text
+
+    def add_listener(self, listener):
+        """Подписывает listener(vacancies) на загрузку вакансий и сразу вызывает его с текущим списком."""
+        self.refresh()
+        with self._lock:
+            self._listeners.append(listener)
+            listener(self.vacancies)
+
+    def get_all(self):
+        """Возвращает список вакансий (общий для всех вызовов, изменять его нельзя)."""
+        self.refresh()
+        return self.vacancies
+
+    def get(self, vacancy_id):
+        """Возвращает вакансию по ID или None."""
+        self.refresh()
+        return self.by_id.get(vacancy_id)
+
+    def find(self, title):
+        """Возвращает ID вакансии по названию или None."""
+        self.refresh()
+        return self.by_title.get(title)
+
+    def get_listing_text(self):
+        """Возвращает готовый текст списка вакансий."""
+        self.refresh()
+        return self.listing_text
+
+    def stats(self):
+        """Возвращает количество вакансий и перезагрузок каталога."""
+        return {'vacancies': len(self.vacancies), 'reloads': self.reloads}
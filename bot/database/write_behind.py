@@ -0,0 +1,107 @@
+import atexit
+import threading
+import time
+from bot.config import logger
+
+class WriteBehindWriter:
+    """Отложенная запись: изменения за короткое окно сбрасываются на диск одной записью."""
+
+    def __init__(self, flush_func, max_delay, lock):
+        """
+        Инициализация писателя.
+
+        flush_func - функция, записывающая текущее состояние на диск и возвращающая успешность;
+        max_delay - максимальная задержка записи в секундах (0 - запись при каждом изменении);
+        lock - блокировка хранилища, под которой выполняется запись.
+        """
+        self.flush_func = flush_func
+        self.max_delay = max_delay
+        self.lock = lock
+        self.pending = 0
+        self._timer = None
+
+        # Метрики записи
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_changes = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+        atexit.register(self.flush)
+
+    def write(self):
+        """Регистрирует изменение: записывает сразу или планирует запись не позже max_delay."""
+        with self.lock:
+            self.pending += 1
+            if self.max_delay <= 0:
+                return self.flush()
+            if self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return True
+
+    def flush(self):
+        """Записывает все накопленные изменения одной операцией."""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.pending:
+                return True
+
+            batch_size = self.pending
+            started = time.perf_counter()
+            success = False
+            try:
+                success = self.flush_func()
+            except Exception as e:
+                logger.error(f"Ошибка при записи {batch_size} изменений: {e}")
+            finally:
+                latency = time.perf_counter() - started
+                self.last_latency = latency
+                self.max_latency = max(self.max_latency, latency)
+                self.total_latency += latency
+                if success:
+                    self.pending = 0
+                    self.flushes += 1
+                    self.flushed_changes += batch_size
+                    self.last_batch_size = batch_size
+                    self.max_batch_size = max(self.max_batch_size, batch_size)
+                else:
+                    self.failed_flushes += 1
+                    self._requeue(batch_size)
+            return success
+
+    def _requeue(self, batch_size):
+        """Решает судьбу изменений после неудачной записи; вызывается под блокировкой."""
+        if self.max_delay > 0:
+            # Изменения остаются в памяти, повторим запись в следующем окне
+            logger.error(f"Не удалось записать {batch_size} изменений, запись будет повторена")
+            self._timer = threading.Timer(self.max_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+        else:
+            # Без задержки вызывающий сразу получает False и сам откатывает изменения,
+            # поэтому пакет не переносится на следующую запись
+            logger.error(f"Не удалось записать {batch_size} изменений, вызывающему возвращена ошибка")
+            self.pending = 0
+
+    def stats(self):
+        """Возвращает метрики записи: количество, размер пакетов и задержку."""
+        with self.lock:
+            return {
+                'pending': self.pending,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'last_batch_size': self.last_batch_size,
+                'max_batch_size': self.max_batch_size,
+                'avg_batch_size': self.flushed_changes / self.flushes if self.flushes else 0,
+                'last_latency': self.last_latency,
+                'max_latency': self.max_latency,
+                'avg_latency': self.total_latency / (self.flushes + self.failed_flushes)
+                               if self.flushes + self.failed_flushes else 0
+            }
@@ -0,0 +1,158 @@
+import re
+from collections import Counter
+from bot.config import logger
+
+class CallbackCodec:
+    """Кодек данных inline-кнопки: короткий префикс и типизированные поля, разделенные ':'."""
+
+    SEPARATOR = ':'
+    # Ограничение Telegram на длину callback_data в байтах
+    MAX_LENGTH = 64
+    DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+    # Префиксы всех созданных кодеков: по ним метрики отличают кнопки бота от чужих данных
+    prefixes = set()
+
+    def __init__(self, prefix, *fields):
+        """
+        Инициализация кодека.
+
+        prefix - уникальный префикс кнопки без ':';
+        fields - пары (имя поля, тип), тип - int или str. Значение None кодируется пустой строкой.
+        """
+        self.prefix = prefix
+        self.fields = fields
+        CallbackCodec.prefixes.add(prefix)
+        self.pattern = f"^{re.escape(prefix)}({re.escape(self.SEPARATOR)}|$)"
+
+    @classmethod
+    def _encode_int(cls, value):
+        """Кодирует целое число в компактную запись по основанию 36."""
+        if value < 0:
+            return '-' + cls._encode_int(-value)
+        digits = ''
+        while True:
+            value, remainder = divmod(value, 36)
+            digits = cls.DIGITS[remainder] + digits
+            if not value:
+                return digits
+
+    def encode(self, *values):
+        """Кодирует значения полей в строку callback_data."""
+        if len(values) != len(self.fields):
+            raise ValueError(f"{self.prefix}: ожидается {len(self.fields)} полей, передано {len(values)}")
+
+        parts = [self.prefix]
+        for (name, kind), value in zip(self.fields, values):
+            if value is None:
+                parts.append('')
+            elif kind is int:
+                parts.append(self._encode_int(int(value)))
+            else:
+                # Экранируем только '%' и разделитель, чтобы кириллица не раздувала данные
+                parts.append(str(value).replace('%', '%25').replace(self.SEPARATOR, '%3A'))
+
+        data = self.SEPARATOR.join(parts)
+        if len(data.encode('utf-8')) > self.MAX_LENGTH:
+            raise ValueError(f"{self.prefix}: callback_data длиннее {self.MAX_LENGTH} байт: {data}")
+        return data
+
+    def decode(self, data):
+        """Разбирает callback_data в словарь полей; при несовпадении формата вызывает ValueError."""
+        parts = data.split(self.SEPARATOR)
+        if parts[0] != self.prefix or len(parts) != len(self.fields) + 1:
+            raise ValueError(f"{self.prefix}: неверный формат callback_data: {data}")
+
+        payload = {}
+        for (name, kind), part in zip(self.fields, parts[1:]):
+            if part == '':
+                payload[name] = None
+            elif kind is int:
+                payload[name] = int(part, 36)
+            else:
+                payload[name] = part.replace('%3A', self.SEPARATOR).replace('%25', '%')
+        return payload
+
+
+class CallbackRouter:
+    """Маршрутизатор нажатий на кнопки: обработчик выбирается по префиксу callback_data за O(1)."""
+
+    def __init__(self):
+        """Инициализация пустой таблицы маршрутов и счетчиков."""
+        self.routes = {}
+        self.metrics = Counter()
+
+    def register(self, codec, handler):
+        """Регистрирует обработчик handler(query, context, **поля) для кнопок кодека."""
+        if codec.prefix in self.routes:
+            raise ValueError(f"Префикс callback_data уже зарегистрирован: {codec.prefix}")
+        self.routes[codec.prefix] = (codec, handler)
+
+    async def dispatch(self, update, context):
+        """Разбирает callback_data и вызывает зарегистрированный обработчик."""
+        query = update.callback_query
+        await query.answer()
+
+        route = self.routes.get(query.data.split(CallbackCodec.SEPARATOR, 1)[0])
+        if route is None:
+            # Кнопка старого формата или чужая - обработчика для нее нет
+            self.metrics['unknown'] += 1
+            logger.warning(f"Неизвестный формат callback_data: {query.data}")
+            await query.edit_message_text("Неизвестная команда. Пожалуйста, начните с команды /start")
+            return
+
+        codec, handler = route
+        payload = await self.decode(query, codec)
+        if payload is None:
+            return
+        return await handler(query, context, **payload)
+
+    async def decode(self, query, codec, **choices):
+        """
+        Разбирает данные кнопки и учитывает нажатие; для устаревших данных отвечает кандидату и возвращает None.
+
+        Используется и обработчиками, которые выбраны не маршрутизатором (этапы диалога выбирает
+        ConversationHandler), чтобы их нажатия попадали в те же счетчики.
+        choices - допустимые значения полей: значение не из списка тоже считается устаревшим.
+        """
+        try:
+            payload = codec.decode(query.data)
+            for name, allowed in choices.items():
+                if payload[name] not in allowed:
+                    raise ValueError(f"{codec.prefix}: неизвестное значение поля {name}: {payload[name]}")
+        except ValueError as e:
+            # Кнопка из сообщения, отправленного до изменения формата данных
+            self.metrics['stale'] += 1
+            logger.warning(f"Устаревшие данные кнопки: {e}")
+            await query.edit_message_text("Эта кнопка устарела. Пожалуйста, начните заново с команды /start")
+            return None
+
+        self.metrics[codec.prefix] += 1
+        return payload
+
+    def stats(self):
+        """Возвращает количество обработанных, неизвестных и устаревших нажатий."""
+        return dict(self.metrics)
+
+
+# Общий маршрутизатор и счетчики нажатий: кнопки основных команд регистрирует CommandHandlers,
+# кнопки этапов диалога разбираются через него же
+router = CallbackRouter()
+
+# Кнопки основных команд
+MAIN_MENU = CallbackCodec('menu')
+CANDIDATES_PAGE = CallbackCodec('pg', ('action', str), ('cursor', int), ('status_idx', int), ('vacancy_id', int))
+BACK_TO_CANDIDATES = CallbackCodec('bc', ('action', str))
+CANDIDATE = CallbackCodec('c', ('candidate_id', str), ('action', str))
+SET_STATUS = CallbackCodec('ss', ('candidate_id', str), ('status_idx', int))
+REASON_TYPE = CallbackCodec('rt', ('candidate_id', str), ('reason_type', str))
+SET_REASON = CallbackCodec('sr', ('candidate_id', str), ('reason_type', str), ('reason_idx', int))
+CLEAR_CANDIDATES = CallbackCodec('clr')
+CONFIRM_CLEAR_CANDIDATES = CallbackCodec('clry')
+
+# Кнопки диалога с кандидатом
+DIALOG_VACANCY = CallbackCodec('ds', ('vacancy_id', int))
+DIALOG_INTRO = CallbackCodec('di', ('answer', str))
+DIALOG_PRESENTATION = CallbackCodec('dp', ('answer', str))
+DIALOG_INVITATION = CallbackCodec('dv', ('answer', str))
+DIALOG_CONFIRMATION = CallbackCodec('dc', ('answer', str))
+DIALOG_BACK = CallbackCodec('db', ('step', str))
@@ -1,15 +1,24 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from telegram.ext import ContextTypes
 import os
+import re
 import traceback
 
 from bot.config import (
-    STATUS_CALLBACK, REASON_CALLBACK, 
-    CANDIDATE_STATUSES, COMPANY_REJECTION_REASONS, CANDIDATE_REJECTION_REASONS,
-    logger, COMPANY_NAME
+    CANDIDATE_STATUSES, DIALOG_STATUSES, COMPANY_REJECTION_REASONS, CANDIDATE_REJECTION_REASONS,
+    CANDIDATES_PAGE_SIZE, ADMIN_IDS, logger, COMPANY_NAME
 )
-from bot.database.storage import DataStorage
+from bot.database.async_storage import AsyncDataStorage
+from bot.database.vacancies import VacancyCatalog
 from bot.utils.analytics import AnalyticsHelper
+from bot.utils.media import MediaHelper
+from bot.utils.rate_limiter import with_priority, PRIORITY_ANALYTICS
+from bot.utils.outreach import outreach
+from bot.scripts.keyboards import MAIN_MENU_KEYBOARD, status_keyboard, reason_type_keyboard, reason_keyboard
+from bot.handlers.callbacks import (
+    router, MAIN_MENU, CANDIDATES_PAGE, BACK_TO_CANDIDATES, CANDIDATE,
+    SET_STATUS, REASON_TYPE, SET_REASON, CLEAR_CANDIDATES, CONFIRM_CLEAR_CANDIDATES
+)
 
 class CommandHandlers:
     """Класс для обработки основных команд бота."""
@@ -29,360 +38,464 @@ class CommandHandlers:
             "/dialog - Начать диалог с кандидатом\n" \
             "/status - Установить статус кандидата\n" \
             "/rejection - Указать причину отказа\n" \
-            "/analytics - Просмотр аналитики"
+            "/analytics - Просмотр аналитики (/analytics funnel - воронка диалогов, /analytics timing - время на этапах)\n" \
+            "/outreach - Рассылка приветствия кандидатам"
             
         # Отправляем логотип компании с приветственным сообщением
         logo_path = os.path.join('images', 'родан.jpg')
-            
-        if update.callback_query:
-            # Если это callback-запрос, редактируем сообщение
-            if os.path.exists(logo_path):
-                # Отправим новое сообщение, так как редактировать фото нельзя
-                await update.callback_query.message.reply_photo(
-                    photo=open(logo_path, 'rb'),
-                    caption=greeting_text
-                )
-                # Удалим старое сообщение
-                await update.callback_query.message.delete()
-            else:
-                # Если логотип не найден, отправляем только текст
-                await update.callback_query.message.reply_text(greeting_text)
-                # Удалим старое сообщение
-                await update.callback_query.message.delete()
+        message = update.callback_query.message if update.callback_query else update.message
+        
+        if os.path.exists(logo_path):
+            try:
+                # Логотип загружается один раз, дальше отправляется по сохраненному file_id
+                await MediaHelper.reply_photo(message, logo_path, greeting_text)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке логотипа: {e}")
+                await message.reply_text(greeting_text)
         else:
-            # Если это обычное сообщение, отправляем новое сообщение
-            if os.path.exists(logo_path):
-                try:
-                    with open(logo_path, 'rb') as photo_file:
-                        await update.message.reply_photo(
-                            photo=photo_file,
-                            caption=greeting_text
-                        )
-                        logger.info(f"Отправлен логотип из {logo_path}")
-                except Exception as e:
-                    logger.error(f"Ошибка при отправке логотипа: {e}")
-                    await update.message.reply_text(greeting_text)
-            else:
-                # Если логотип не найден, отправляем только текст
-                logger.error(f"Файл логотипа не найден: {logo_path}")
-                await update.message.reply_text(greeting_text)
+            # Если логотип не найден, отправляем только текст
+            logger.error(f"Файл логотипа не найден: {logo_path}")
+            await message.reply_text(greeting_text)
+        
+        if update.callback_query:
+            # Удалим старое сообщение, так как редактировать фото нельзя
+            await update.callback_query.message.delete()
     
     @staticmethod
     async def show_vacancies(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Отображает список вакансий."""
-        vacancies = DataStorage.get_vacancies()
+        # Текст списка собирается каталогом при загрузке вакансий
+        vacancy_text = await AsyncDataStorage.get_vacancies_text()
         
-        if not vacancies:
+        if not vacancy_text:
             await update.message.reply_text("Сейчас нет доступных вакансий.")
             return
         
-        vacancy_text = "📋 Доступные вакансии:\n\n"
-        for vacancy in vacancies:
-            vacancy_text += f"* {vacancy['title']}\n"
-            vacancy_text += f"💼 {vacancy['description']}\n"
-            vacancy_text += f"💰 Зарплата: {vacancy['salary']}\n\n"
-            
         # Создаем клавиатуру с кнопкой возврата в начало
-        keyboard = [
-            [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = MAIN_MENU_KEYBOARD
             
         await update.message.reply_text(vacancy_text, reply_markup=reply_markup)
     
+    # Статусы, по которым можно фильтровать списки кандидатов
+    FILTER_STATUSES = CANDIDATE_STATUSES + DIALOG_STATUSES
+    
     @staticmethod
-    async def set_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Установка статуса кандидата."""
-        # Формируем список кандидатов с кнопками
-        candidates = DataStorage.get_candidates()
+    def parse_candidate_filters(args):
+        """Разбирает аргументы вида status=N vacancy=N в индекс статуса и ID вакансии (или None)."""
+        filters = {'status': None, 'vacancy': None}
+        aliases = {'status': 'status', 'статус': 'status', 'vacancy': 'vacancy', 'вакансия': 'vacancy'}
+        for arg in args or []:
+            key, _, value = arg.partition('=')
+            key = aliases.get(key.lower())
+            if key is None or not value.isdigit() or int(value) < 1:
+                raise ValueError(arg)
+            # Статус указывается номером в списке, вакансия - своим ID
+            filters[key] = int(value) - 1 if key == 'status' else int(value)
+        return filters['status'], filters['vacancy']
+    
+    @staticmethod
+    async def build_candidates_page(context, action, cursor=0, status_idx=None, vacancy_id=None):
+        """Формирует текст и клавиатуру одной страницы списка кандидатов.
         
-        if not candidates:
-            await update.message.reply_text("Нет данных о кандидатах.")
-            return
-            
-        await update.message.reply_text("Выберите кандидата для установки статуса:")
+        Запоминает страницу в user_data, чтобы кнопка "Назад" возвращала на нее же.
+        Возвращает None, если кандидатов с такими фильтрами нет.
+        """
+        status = None
+        if status_idx is not None and status_idx < len(CommandHandlers.FILTER_STATUSES):
+            status = CommandHandlers.FILTER_STATUSES[status_idx]
+        vacancy = None
+        if vacancy_id is not None:
+            selected = await AsyncDataStorage.get_vacancy(vacancy_id)
+            if selected is not None:
+                vacancy = selected['title']
+        
+        page = await AsyncDataStorage.get_candidates_page(cursor, CANDIDATES_PAGE_SIZE, status, vacancy)
+        if not page['items'] and cursor:
+            # Страница могла опустеть после очистки списка - начинаем с первой
+            return await CommandHandlers.build_candidates_page(context, action, 0, status_idx, vacancy_id)
+        
+        context.user_data.setdefault('candidates_page', {})[action] = (cursor, status_idx, vacancy_id)
+        if not page['items']:
+            return None
         
         keyboard = []
-        for i, candidate in enumerate(candidates):
+        for candidate in page['items']:
             keyboard.append([
                 InlineKeyboardButton(
                     f"👤 {candidate['name']} - {candidate['vacancy']}",
-                    callback_data=f"candidate_{i}_status"
+                    callback_data=CANDIDATE.encode(candidate['id'], action)
                 )
             ])
         
-        # Добавляем кнопку для очистки списка
-        keyboard.append([InlineKeyboardButton("🗑️ Очистить список", callback_data="clear_candidates")])
+        # Кнопки перелистывания: в callback_data передаются курсор и индексы фильтров
+        navigation = []
+        if page['prev_cursor'] is not None:
+            navigation.append(InlineKeyboardButton("◀️ Предыдущие", callback_data=CANDIDATES_PAGE.encode(action, page['prev_cursor'], status_idx, vacancy_id)))
+        if page['next_cursor'] is not None:
+            navigation.append(InlineKeyboardButton("Следующие ▶️", callback_data=CANDIDATES_PAGE.encode(action, page['next_cursor'], status_idx, vacancy_id)))
+        if navigation:
+            keyboard.append(navigation)
+        
+        if action == "status":
+            # Добавляем кнопку для очистки списка
+            keyboard.append([InlineKeyboardButton("🗑️ Очистить список", callback_data=CLEAR_CANDIDATES.encode())])
         
         # Добавляем кнопку для возврата в главное меню
-        keyboard.append([InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")])
-            
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text("Кандидаты:", reply_markup=reply_markup)
+        keyboard.append([InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data=MAIN_MENU.encode())])
+        
+        text = "Выберите кандидата для установки статуса:" if action == "status" \
+            else "Выберите кандидата для указания причины отказа:"
+        if status:
+            text += f"\nСтатус: {status}"
+        if vacancy:
+            text += f"\nВакансия: {vacancy}"
+        return text, InlineKeyboardMarkup(keyboard)
     
     @staticmethod
-    async def set_rejection_reason(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Установка причины отказа."""
-        candidates = DataStorage.get_candidates()
+    async def show_candidates_page(update: Update, context: ContextTypes.DEFAULT_TYPE, action):
+        """Отправляет первую страницу кандидатов с учетом фильтров из аргументов команды."""
+        try:
+            status_idx, vacancy_id = CommandHandlers.parse_candidate_filters(context.args)
+        except ValueError:
+            statuses = "\n".join(f"{i}. {status}" for i, status in enumerate(CommandHandlers.FILTER_STATUSES, 1))
+            vacancies = "\n".join(
+                f"{VacancyCatalog.vacancy_id(vacancy)}. {vacancy['title']}"
+                for vacancy in await AsyncDataStorage.get_vacancies()
+            )
+            await update.message.reply_text(
+                "Фильтры указываются так: status=N vacancy=N\n\n"
+                f"Статусы:\n{statuses}\n\nВакансии:\n{vacancies}"
+            )
+            return
         
-        if not candidates:
+        result = await CommandHandlers.build_candidates_page(context, action, 0, status_idx, vacancy_id)
+        if result is None:
             await update.message.reply_text("Нет данных о кандидатах.")
             return
-            
-        await update.message.reply_text("Выберите кандидата для указания причины отказа:")
         
-        keyboard = []
-        for i, candidate in enumerate(candidates):
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"👤 {candidate['name']} - {candidate['vacancy']}",
-                    callback_data=f"candidate_{i}_reason"
-                )
-            ])
-            
-        # Добавляем кнопку для возврата в главное меню
-        keyboard.append([InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")])
-            
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text("Кандидаты:", reply_markup=reply_markup)
+        text, reply_markup = result
+        await update.message.reply_text(text, reply_markup=reply_markup)
+    
+    @staticmethod
+    async def set_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Установка статуса кандидата."""
+        await CommandHandlers.show_candidates_page(update, context, "status")
+    
+    @staticmethod
+    async def set_rejection_reason(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Установка причины отказа."""
+        await CommandHandlers.show_candidates_page(update, context, "reason")
     
     @staticmethod
+    @with_priority(PRIORITY_ANALYTICS)
     async def show_analytics(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Отображает аналитику по кандидатам."""
+        args = [arg.lower() for arg in (context.args or [])]
+        if 'funnel' in args or 'timing' in args:
+            await CommandHandlers.show_funnel(update, args)
+            return
+        
         # Формируем текст аналитики
-        analytics_text = AnalyticsHelper.generate_analytics_text()
+        analytics_text = await AsyncDataStorage.run(AnalyticsHelper.generate_analytics_text)
         
         # Если нет данных, выводим сообщение
         if analytics_text == "Нет данных для аналитики.":
             await update.message.reply_text(analytics_text)
             return
         
-        # Экспортируем данные в CSV
-        export_success = AnalyticsHelper.export_analytics()
-        
         # Создаем клавиатуру с кнопкой возврата в главное меню с красивой иконкой
-        keyboard = [
-            [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = MAIN_MENU_KEYBOARD
         
         # Отправляем результаты
         await update.message.reply_text(analytics_text, reply_markup=reply_markup)
         
-        if export_success:
-            await update.message.reply_text(
-                "📊 Данные аналитики экспортированы в файл analytics.csv"
-            )
-        else:
+        # Выгружаем CSV документом: /analytics gzip - в архиве, /analytics new - только изменения
+        compress = 'gzip' in args
+        incremental = 'new' in args
+        try:
+            export = await AsyncDataStorage.run(AnalyticsHelper.build_export_document, compress, incremental)
+            with export['file']:
+                if incremental and not export['rows']:
+                    await update.message.reply_text("📊 С прошлой выгрузки данные кандидатов не менялись.")
+                    return
+                
+                caption = f"📊 Данные аналитики: {export['rows']} кандидатов"
+                if export['since']:
+                    caption += " (изменения с прошлой выгрузки)"
+                # Файл передается HTTP-клиенту открытым и читается частями при отправке
+                await update.message.reply_document(
+                    document=InputFile(export['file'], filename=export['filename'], read_file_handle=False),
+                    caption=caption
+                )
+            await AsyncDataStorage.run(AnalyticsHelper.save_export_mark, export['started'])
+        except Exception as e:
+            logger.error(f"Ошибка выгрузки аналитики: {e}")
             await update.message.reply_text(
                 "❌ Не удалось экспортировать данные аналитики."
             )
     
+    FUNNEL_HELP = (
+        "Воронка диалогов: /analytics funnel [day|week|month] [<дней>] [v<номер вакансии>], "
+        "например /analytics funnel week 90 v2\n"
+        "Время на этапах диалога: /analytics timing [v<номер вакансии>]"
+    )
+    
     @staticmethod
-    async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработка нажатий на кнопки."""
-        query = update.callback_query
-        await query.answer()
+    async def show_funnel(update: Update, args):
+        """Отображает воронку диалогов или время на этапах: /analytics funnel|timing [day|week|month] [<дней>] [v<номер>]."""
+        period, days, vacancy = 'day', 30, None
+        timing = 'timing' in args
+        for arg in args:
+            if arg in ('funnel', 'timing'):
+                continue
+            if arg in ('day', 'week', 'month'):
+                period = arg
+            elif arg.isdigit() and int(arg) > 0:
+                days = int(arg)
+            elif re.fullmatch(r'v\d+', arg):
+                vacancy = await AsyncDataStorage.get_vacancy(int(arg[1:]))
+                if vacancy is None:
+                    await update.message.reply_text(f"Вакансия №{arg[1:]} не найдена.\n\n{CommandHandlers.FUNNEL_HELP}")
+                    return
+            else:
+                await update.message.reply_text(CommandHandlers.FUNNEL_HELP)
+                return
         
+        vacancy_id = VacancyCatalog.vacancy_id(vacancy) if vacancy else None
         try:
-            data = query.data.split('_')
-            logger.info(f"Получены данные callback: {query.data}")
-            
-            # Обрабатываем специальный случай для /start
-            if len(data) < 2:  
-                if data[0] == "/start":
-                    return await CommandHandlers.start(update, context)
-                return
-                
-            # Очистка списка кандидатов
-            if data[0] == "clear" and len(data) > 1 and data[1] == "candidates":
-                await CommandHandlers.handle_clear_candidates(query)
-                return
-                
-            # Подтверждение очистки списка кандидатов
-            if data[0] == "confirm" and len(data) > 1 and data[1] == "clear" and len(data) > 2 and data[2] == "candidates":
-                await CommandHandlers.handle_confirm_clear_candidates(query)
+            if timing:
+                funnel_text = await AsyncDataStorage.run(AnalyticsHelper.generate_timing_text, vacancy_id)
+            else:
+                funnel_text = await AsyncDataStorage.run(AnalyticsHelper.generate_funnel_text, days, period, vacancy_id)
+        except Exception as e:
+            logger.error(f"Ошибка при построении воронки: {e}")
+            await update.message.reply_text("❌ Не удалось построить воронку диалогов.")
+            return
+        await update.message.reply_text(funnel_text, reply_markup=MAIN_MENU_KEYBOARD)
+    
+    OUTREACH_HELP = (
+        "Рассылка приветствия диалога кандидатам:\n"
+        "/outreach new <номер вакансии> <chat_id> <chat_id> ... - разослать приветствие "
+        "(длинный список можно прислать файлом с подписью /outreach new <номер вакансии>)\n"
+        "/outreach link <номер вакансии> - ссылка, по которой кандидаты сами начинают диалог\n"
+        "/outreach <номер рассылки> - ход рассылки\n"
+        "/outreach pause <номер рассылки>, /outreach resume <номер рассылки>\n"
+        "/outreach - все рассылки"
+    )
+    
+    @staticmethod
+    async def format_campaign(progress, bot_username):
+        """Формирует текст о ходе кампании рассылки."""
+        vacancy = await AsyncDataStorage.get_vacancy(progress['vacancy_id'])
+        title = vacancy['title'] if vacancy else "вакансия удалена"
+        statuses = {'running': "идет", 'paused': "приостановлена", 'done': "завершена"}
+        status = statuses.get(progress['status'], progress['status'])
+        if progress['kind'] == 'link':
+            payload = outreach.deep_link_payload(progress['id'])
+            return (
+                f"🔗 Кампания №{progress['id']} ({title}), {status}: https://t.me/{bot_username}?start={payload}\n"
+                f"Пришли по ссылке: {progress['joined']}"
+            )
+        text = (
+            f"📨 Рассылка №{progress['id']} ({title}), {status}\n"
+            f"Получателей: {progress['total']}, отправлено: {progress['sent']}, ошибок: {progress['failed']}, "
+            f"пропущено: {progress['skipped']}, осталось: {progress['pending']}"
+        )
+        if progress['errors']:
+            text += "\nПричины: " + ", ".join(f"{error} - {count}" for error, count in progress['errors'].items())
+        return text
+    
+    @staticmethod
+    async def check_admin(update: Update):
+        """Проверяет, что команду прислал рекрутер из ADMIN_IDS; остальным отвечает отказом."""
+        user = update.effective_user
+        if user is not None and user.id in ADMIN_IDS:
+            return True
+        logger.warning(f"Отказано в доступе к /outreach, user_id: {user.id if user else None}")
+        await update.message.reply_text("⛔ Рассылки доступны только рекрутерам.")
+        return False
+    
+    @staticmethod
+    async def outreach(update: Update, context: ContextTypes.DEFAULT_TYPE, chat_ids_text=None):
+        """Обработчик команды /outreach: создание рассылок и ссылок кампаний, их ход и приостановка."""
+        if not await CommandHandlers.check_admin(update):
+            return
+        args = context.args if chat_ids_text is None else update.message.caption.split()[1:]
+        command = args[0].lower() if args else None
+        try:
+            if command is None:
+                campaigns = outreach.get_campaigns()
+                if not campaigns:
+                    await update.message.reply_text("Рассылок еще не было.\n\n" + CommandHandlers.OUTREACH_HELP)
+                    return
+                texts = [await CommandHandlers.format_campaign(progress, context.bot.username) for progress in campaigns[-10:]]
+                await update.message.reply_text("\n\n".join(texts), reply_markup=MAIN_MENU_KEYBOARD)
                 return
             
-            # Обработка кнопок "Назад" - особый случай
-            if data[0] == "back":
-                logger.info(f"Обработка кнопки 'Назад': {query.data}")
-                await CommandHandlers.handle_back_button(query, data, context)
+            if command in ('new', 'link') and len(args) >= 2 and args[1].isdigit():
+                vacancy_id = int(args[1])
+                if command == 'link':
+                    campaign_id = await outreach.create_link_campaign(vacancy_id)
+                else:
+                    # ID чатов - из аргументов команды или из присланного файла
+                    source = chat_ids_text if chat_ids_text is not None else " ".join(args[2:])
+                    chat_ids = [int(chat_id) for chat_id in re.findall(r'-?\d+', source)]
+                    campaign_id = await outreach.create_campaign(chat_ids, vacancy_id)
+                text = await CommandHandlers.format_campaign(outreach.progress(campaign_id), context.bot.username)
+                await update.message.reply_text(text)
                 return
             
-            # Обработка выбора кандидата
-            if data[0] == "candidate":
-                await CommandHandlers.handle_candidate_selection(query, data, context)
+            if command in ('pause', 'resume') and len(args) == 2 and args[1].isdigit():
+                campaign_id = int(args[1])
+                changed = await (outreach.pause(campaign_id) if command == 'pause' else outreach.resume(campaign_id))
+                progress = outreach.progress(campaign_id)
+                if progress is None:
+                    await update.message.reply_text(f"Рассылка №{campaign_id} не найдена.")
+                    return
+                text = await CommandHandlers.format_campaign(progress, context.bot.username)
+                await update.message.reply_text(text if changed else f"Статус не изменен.\n{text}")
                 return
-                
-            # Обработка установки статуса
-            elif data[0] == "set" and data[1] == "status" and len(data) >= 4:
-                await CommandHandlers.handle_status_setting(query, data, context)
-                return
-                
-            # Обработка типа причины отказа
-            elif data[0] == "reason" and data[1] == "type":
-                await CommandHandlers.handle_reason_type_selection(query, data, context)
-                return
-                
-            # Обработка установки причины отказа
-            elif data[0] == "set" and data[1] == "reason" and len(data) >= 5:
-                await CommandHandlers.handle_reason_setting(query, data, context)
+            
+            if command.isdigit() and len(args) == 1:
+                progress = outreach.progress(int(command))
+                if progress is None:
+                    await update.message.reply_text(f"Рассылка №{command} не найдена.")
+                    return
+                await update.message.reply_text(await CommandHandlers.format_campaign(progress, context.bot.username))
                 return
-                
-            # Если ни один из вариантов не сработал
-            logger.warning(f"Неизвестный формат callback_data: {query.data}")
-            await query.edit_message_text("Неизвестная команда. Пожалуйста, начните с команды /start")
-                
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        
+        await update.message.reply_text(CommandHandlers.OUTREACH_HELP)
+    
+    @staticmethod
+    async def outreach_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Создает рассылку по списку ID чатов из файла с подписью /outreach new <номер вакансии>."""
+        # Файл не скачиваем, пока не проверен доступ
+        if not await CommandHandlers.check_admin(update):
+            return
+        try:
+            file = await update.message.document.get_file()
+            content = (await file.download_as_bytearray()).decode('utf-8', errors='ignore')
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке списка получателей: {e}")
+            await update.message.reply_text("❌ Не удалось прочитать файл со списком получателей.")
+            return
+        await CommandHandlers.outreach(update, context, chat_ids_text=content)
+    
+    @staticmethod
+    async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработка нажатий на кнопки."""
+        try:
+            logger.info(f"Получены данные callback: {update.callback_query.data}")
+            await CommandHandlers.router.dispatch(update, context)
         except Exception as e:
             error_details = traceback.format_exc()
             logger.error(f"Ошибка при обработке нажатия кнопки: {e}\n{error_details}")
-            await query.edit_message_text(f"Произошла ошибка при обработке запроса. Пожалуйста, начните действие заново с команды /start.")
+            await update.callback_query.edit_message_text(f"Произошла ошибка при обработке запроса. Пожалуйста, начните действие заново с команды /start.")
     
     @staticmethod
-    async def handle_back_button(query, data, context):
-        """Обработка кнопок 'Назад'"""
+    async def handle_back_button(query, context, action):
+        """Обработка кнопок 'Назад' к списку кандидатов"""
         try:
-            if data[1] == "to" and len(data) > 2 and data[2] == "candidates":
-                if len(data) > 3:
-                    action = data[3]  # status, reason или list
-                    logger.info(f"Кнопка 'Назад', действие: {action}")
-                    
-                    candidates = DataStorage.get_candidates()
-                    
-                    if action == "list":
-                        # Возвращаемся к общему списку кандидатов
-                        keyboard = [
-                            [InlineKeyboardButton("📋 Установить статус", callback_data="back_to_candidates_status")],
-                            [InlineKeyboardButton("❌ Указать причину отказа", callback_data="back_to_candidates_reason")],
-                            [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]
-                        ]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        await query.edit_message_text("Выберите действие:", reply_markup=reply_markup)
-                        
-                    elif action == "status":
-                        # Показываем список кандидатов для установки статуса
-                        keyboard = []
-                        for i, candidate in enumerate(candidates):
-                            keyboard.append([
-                                InlineKeyboardButton(
-                                    f"👤 {candidate['name']} - {candidate['vacancy']}",
-                                    callback_data=f"candidate_{i}_status"
-                                )
-                            ])
-                        
-                        # Добавляем кнопку для очистки списка
-                        keyboard.append([InlineKeyboardButton("🗑️ Очистить список", callback_data="clear_candidates")])
-                        
-                        # Добавляем кнопку возврата в главное меню
-                        keyboard.append([InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")])
-                        
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        await query.edit_message_text("Выберите кандидата для установки статуса:", reply_markup=reply_markup)
-                        
-                    elif action == "reason":
-                        # Показываем список кандидатов для указания причины отказа
-                        keyboard = []
-                        for i, candidate in enumerate(candidates):
-                            keyboard.append([
-                                InlineKeyboardButton(
-                                    f"👤 {candidate['name']} - {candidate['vacancy']}",
-                                    callback_data=f"candidate_{i}_reason"
-                                )
-                            ])
-                        
-                        # Добавляем кнопку возврата в главное меню
-                        keyboard.append([InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")])
-                        
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        await query.edit_message_text("Выберите кандидата для указания причины отказа:", reply_markup=reply_markup)
+            logger.info(f"Кнопка 'Назад', действие: {action}")
+            
+            if action == "list":
+                # Возвращаемся к общему списку кандидатов
+                keyboard = [
+                    [InlineKeyboardButton("📋 Установить статус", callback_data=BACK_TO_CANDIDATES.encode("status"))],
+                    [InlineKeyboardButton("❌ Указать причину отказа", callback_data=BACK_TO_CANDIDATES.encode("reason"))],
+                    [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data=MAIN_MENU.encode())]
+                ]
+                reply_markup = InlineKeyboardMarkup(keyboard)
+                await query.edit_message_text("Выберите действие:", reply_markup=reply_markup)
+                
+            elif action in ("status", "reason"):
+                # Возвращаемся на ту страницу списка, с которой выбирали кандидата
+                cursor, status_idx, vacancy_id = context.user_data.get('candidates_page', {}).get(
+                    action, (0, None, None)
+                )
+                result = await CommandHandlers.build_candidates_page(
+                    context, action, cursor, status_idx, vacancy_id
+                )
+                if result is None:
+                    await query.edit_message_text("Нет данных о кандидатах.")
+                    return
+                text, reply_markup = result
+                await query.edit_message_text(text, reply_markup=reply_markup)
         except Exception as e:
             logger.error(f"Ошибка при обработке кнопки 'Назад': {e}")
             await query.edit_message_text("Произошла ошибка. Пожалуйста, начните с команды /start")
     
     @staticmethod
-    async def handle_candidate_selection(query, data, context):
+    async def handle_page(query, context, action, cursor, status_idx, vacancy_id):
+        """Обработка перелистывания страниц списка кандидатов"""
+        result = await CommandHandlers.build_candidates_page(context, action, cursor, status_idx, vacancy_id)
+        if result is None:
+            await query.edit_message_text("Нет данных о кандидатах.")
+            return
+        text, reply_markup = result
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    
+    @staticmethod
+    async def handle_candidate_selection(query, context, candidate_id, action):
         """Обработка выбора кандидата"""
+        # action - status или reason
         try:
-            candidate_idx = int(data[1])
-            action_type = data[2]  # status или reason
-            
-            candidates = DataStorage.get_candidates()
-            if candidate_idx >= len(candidates):
+            candidate = await AsyncDataStorage.get_candidate(candidate_id)
+            if candidate is None:
                 await query.edit_message_text("Ошибка: кандидат не найден.")
                 return
             
-            candidate = candidates[candidate_idx]
-            context.user_data['current_candidate_idx'] = candidate_idx
+            context.user_data['current_candidate_id'] = candidate_id
             
-            if action_type == "status":
-                # Показываем кнопки со статусами
-                keyboard = []
-                
-                # Добавляем эмодзи к статусам
-                status_emojis = ["📞", "📝", "✅", "❌", "🕒"]
-                
-                for i, status in enumerate(CANDIDATE_STATUSES):
-                    emoji = status_emojis[i] if i < len(status_emojis) else "📌"
-                    keyboard.append([InlineKeyboardButton(f"{emoji} {status}", callback_data=f"set_status_{candidate_idx}_{i}")])
-                
-                # Добавляем кнопку "Назад"
-                keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_candidates_status")])
-                    
-                reply_markup = InlineKeyboardMarkup(keyboard)
+            if action == "status":
+                # Показываем кнопки со статусами (клавиатура собирается один раз на кандидата)
+                reply_markup = status_keyboard(candidate_id)
                 await query.edit_message_text(
                     f"Выберите статус для кандидата {candidate['name']}:",
                     reply_markup=reply_markup
                 )
-                logger.info(f"Отображены статусы для кандидата с индексом {candidate_idx}")
+                logger.info(f"Отображены статусы для кандидата {candidate_id}")
             
-            elif action_type == "reason":
+            elif action == "reason":
                 # Показываем кнопки с типами причин отказа
-                keyboard = [
-                    [InlineKeyboardButton("🏢 Отказ компании", callback_data=f"reason_type_{candidate_idx}_company")],
-                    [InlineKeyboardButton("👨‍💼 Отказ кандидата", callback_data=f"reason_type_{candidate_idx}_candidate")],
-                    [InlineKeyboardButton("🔙 Назад", callback_data=f"back_to_candidates_reason")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = reason_type_keyboard(candidate_id)
                 await query.edit_message_text(
                     f"Укажите тип отказа для кандидата {candidate['name']}:",
                     reply_markup=reply_markup
                 )
-                logger.info(f"Отображены типы отказа для кандидата с индексом {candidate_idx}")
-        except ValueError as e:
-            logger.error(f"Ошибка при преобразовании индекса кандидата: {e}")
+                logger.info(f"Отображены типы отказа для кандидата {candidate_id}")
+        except IndexError as e:
+            logger.error(f"Ошибка при разборе данных кнопки кандидата: {e}")
             await query.edit_message_text("Ошибка: некорректный формат данных. Пожалуйста, начните заново.")
         except Exception as e:
             logger.error(f"Непредвиденная ошибка при обработке выбора кандидата: {e}")
             await query.edit_message_text("Произошла ошибка. Пожалуйста, попробуйте еще раз.")
     
     @staticmethod
-    async def handle_status_setting(query, data, context):
+    async def handle_status_setting(query, context, candidate_id, status_idx):
         """Обработка установки статуса"""
         try:
-            candidate_idx = int(data[2])
-            
             # Восстанавливаем статус из значений константы CANDIDATE_STATUSES
-            status_index = int(data[3])
-            logger.info(f"Выбор статуса: индекс кандидата={candidate_idx}, индекс статуса={status_index}")
+            logger.info(f"Выбор статуса: кандидат={candidate_id}, индекс статуса={status_idx}")
             
-            if 0 <= status_index < len(CANDIDATE_STATUSES):
-                status = CANDIDATE_STATUSES[status_index]
+            if 0 <= status_idx < len(CANDIDATE_STATUSES):
+                status = CANDIDATE_STATUSES[status_idx]
             else:
-                await query.edit_message_text(f"Ошибка: недопустимый статус (индекс {status_index}).")
+                await query.edit_message_text(f"Ошибка: недопустимый статус (индекс {status_idx}).")
                 return
             
-            candidates = DataStorage.get_candidates()
-            if candidate_idx < len(candidates):
-                candidate = candidates[candidate_idx]
-                candidate['status'] = status
-                DataStorage.update_candidate(candidate_idx, candidate)
+            # Поле меняется атомарно, чтобы не затереть одновременные правки из других чатов
+            candidate = await AsyncDataStorage.update_candidate_fields(candidate_id, {'status': status})
+            if candidate is not None:
                 
                 # Создаем клавиатуру с кнопками для возврата или новой операции
                 keyboard = [
-                    [InlineKeyboardButton("📋 Вернуться к списку кандидатов", callback_data="back_to_candidates_status")],
-                    [InlineKeyboardButton("🔄 Установить другой статус", callback_data=f"candidate_{candidate_idx}_status")],
-                    [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]
+                    [InlineKeyboardButton("📋 Вернуться к списку кандидатов", callback_data=BACK_TO_CANDIDATES.encode("status"))],
+                    [InlineKeyboardButton("🔄 Установить другой статус", callback_data=CANDIDATE.encode(candidate_id, "status"))],
+                    [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data=MAIN_MENU.encode())]
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 
@@ -391,7 +504,7 @@ class CommandHandlers:
                     reply_markup=reply_markup
                 )
             else:
-                await query.edit_message_text(f"Ошибка: кандидат с индексом {candidate_idx} не найден.")
+                await query.edit_message_text("Ошибка: кандидат не найден.")
         except ValueError as e:
             logger.error(f"Ошибка при преобразовании индексов: {e}")
             await query.edit_message_text("Ошибка: некорректный формат данных. Пожалуйста, начните заново.")
@@ -400,41 +513,19 @@ class CommandHandlers:
             await query.edit_message_text("Произошла ошибка при обновлении статуса. Пожалуйста, попробуйте еще раз.")
     
     @staticmethod
-    async def handle_reason_type_selection(query, data, context):
+    async def handle_reason_type_selection(query, context, candidate_id, reason_type):
         """Обработка выбора типа причины отказа"""
+        # reason_type - company или candidate
         try:
-            candidate_idx = int(data[2])
-            reason_type = data[3]  # company или candidate
-            
-            candidates = DataStorage.get_candidates()
-            if candidate_idx >= len(candidates):
+            candidate = await AsyncDataStorage.get_candidate(candidate_id)
+            if candidate is None:
                 await query.edit_message_text("Ошибка: кандидат не найден.")
                 return
                 
-            keyboard = []
-            reasons_list = COMPANY_REJECTION_REASONS if reason_type == "company" else CANDIDATE_REJECTION_REASONS
-            
-            # Добавляем эмодзи к причинам отказа
-            company_reason_emojis = ["💰", "👨‍💼", "📊", "🏢", "⏱️"]
-            candidate_reason_emojis = ["💰", "📍", "👨‍👩‍👧‍👦", "🏢", "🕒"]
-            
-            reason_emojis = company_reason_emojis if reason_type == "company" else candidate_reason_emojis
-            
-            for i, reason in enumerate(reasons_list):
-                emoji = reason_emojis[i] if i < len(reason_emojis) else "❌"
-                keyboard.append([
-                    InlineKeyboardButton(
-                        f"{emoji} {reason}", 
-                        callback_data=f"set_reason_{candidate_idx}_{reason_type}_{i}"
-                    )
-                ])
-            
-            # Добавляем кнопку "Назад"
-            keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data=f"candidate_{candidate_idx}_reason")])
-                
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            # Кнопки причин отказа выбранного типа
+            reply_markup = reason_keyboard(candidate_id, reason_type)
             await query.edit_message_text(
-                f"Выберите причину отказа для кандидата {candidates[candidate_idx]['name']}:",
+                f"Выберите причину отказа для кандидата {candidate['name']}:",
                 reply_markup=reply_markup
             )
         except ValueError as e:
@@ -445,18 +536,10 @@ class CommandHandlers:
             await query.edit_message_text("Произошла ошибка. Пожалуйста, попробуйте еще раз.")
     
     @staticmethod
-    async def handle_reason_setting(query, data, context):
+    async def handle_reason_setting(query, context, candidate_id, reason_type, reason_idx):
         """Обработка установки причины отказа"""
+        # reason_type - company или candidate
         try:
-            candidate_idx = int(data[2])
-            reason_type = data[3]  # company или candidate
-            reason_idx = int(data[4])
-            
-            candidates = DataStorage.get_candidates()
-            if candidate_idx >= len(candidates):
-                await query.edit_message_text("Ошибка: кандидат не найден.")
-                return
-                
             reasons_list = COMPANY_REJECTION_REASONS if reason_type == "company" else CANDIDATE_REJECTION_REASONS
             if reason_idx >= len(reasons_list):
                 await query.edit_message_text("Ошибка: причина отказа не найдена.")
@@ -464,18 +547,22 @@ class CommandHandlers:
                 
             reason = reasons_list[reason_idx]
             
-            candidate = candidates[candidate_idx]
-            candidate['rejection_reason'] = {
-                'type': 'Компания' if reason_type == "company" else 'Кандидат',
-                'reason': reason
-            }
-            DataStorage.update_candidate(candidate_idx, candidate)
+            # Поле меняется атомарно, чтобы не затереть одновременные правки из других чатов
+            candidate = await AsyncDataStorage.update_candidate_fields(candidate_id, {
+                'rejection_reason': {
+                    'type': 'Компания' if reason_type == "company" else 'Кандидат',
+                    'reason': reason
+                }
+            })
+            if candidate is None:
+                await query.edit_message_text("Ошибка: кандидат не найден.")
+                return
             
             # Создаем клавиатуру с кнопками для возврата
             keyboard = [
-                [InlineKeyboardButton("📋 Вернуться к списку кандидатов", callback_data="back_to_candidates_reason")],
-                [InlineKeyboardButton("🔄 Установить другую причину", callback_data=f"candidate_{candidate_idx}_reason")],
-                [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]
+                [InlineKeyboardButton("📋 Вернуться к списку кандидатов", callback_data=BACK_TO_CANDIDATES.encode("reason"))],
+                [InlineKeyboardButton("🔄 Установить другую причину", callback_data=CANDIDATE.encode(candidate_id, "reason"))],
+                [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data=MAIN_MENU.encode())]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -491,13 +578,13 @@ class CommandHandlers:
             await query.edit_message_text("Произошла ошибка. Пожалуйста, попробуйте еще раз.")
     
     @staticmethod
-    async def handle_clear_candidates(query):
+    async def handle_clear_candidates(query, context):
         """Обработка очистки списка кандидатов"""
         try:
             # Создаем клавиатуру для подтверждения действия
             keyboard = [
-                [InlineKeyboardButton("✅ Да, очистить список", callback_data="confirm_clear_candidates")],
-                [InlineKeyboardButton("❌ Нет, отменить", callback_data="back_to_candidates_status")]
+                [InlineKeyboardButton("✅ Да, очистить список", callback_data=CONFIRM_CLEAR_CANDIDATES.encode())],
+                [InlineKeyboardButton("❌ Нет, отменить", callback_data=BACK_TO_CANDIDATES.encode("status"))]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.edit_message_text(
@@ -509,17 +596,14 @@ class CommandHandlers:
             await query.edit_message_text("Произошла ошибка. Пожалуйста, попробуйте еще раз.")
     
     @staticmethod
-    async def handle_confirm_clear_candidates(query):
+    async def handle_confirm_clear_candidates(query, context):
         """Подтверждение очистки списка кандидатов"""
         try:
             # Очищаем список кандидатов
-            DataStorage.clear_candidates()
+            await AsyncDataStorage.clear_candidates()
             
             # Создаем клавиатуру для возврата в главное меню
-            keyboard = [
-                [InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = MAIN_MENU_KEYBOARD
             await query.edit_message_text(
                 "✅ Список кандидатов успешно очищен.",
                 reply_markup=reply_markup
@@ -527,4 +611,16 @@ class CommandHandlers:
             logger.info("Список кандидатов очищен")
         except Exception as e:
             logger.error(f"Ошибка при очистке списка кандидатов: {e}")
-            await query.edit_message_text("Произошла ошибка при очистке списка. Пожалуйста, попробуйте еще раз.") 
\ No newline at end of file
+            await query.edit_message_text("Произошла ошибка при очистке списка. Пожалуйста, попробуйте еще раз.")
+
+
+# Таблица маршрутов нажатий на кнопки основных команд
+CommandHandlers.router = router
+CommandHandlers.router.register(CANDIDATES_PAGE, CommandHandlers.handle_page)
+CommandHandlers.router.register(BACK_TO_CANDIDATES, CommandHandlers.handle_back_button)
+CommandHandlers.router.register(CANDIDATE, CommandHandlers.handle_candidate_selection)
+CommandHandlers.router.register(SET_STATUS, CommandHandlers.handle_status_setting)
+CommandHandlers.router.register(REASON_TYPE, CommandHandlers.handle_reason_type_selection)
+CommandHandlers.router.register(SET_REASON, CommandHandlers.handle_reason_setting)
+CommandHandlers.router.register(CLEAR_CANDIDATES, CommandHandlers.handle_clear_candidates)
+CommandHandlers.router.register(CONFIRM_CLEAR_CANDIDATES, CommandHandlers.handle_confirm_clear_candidates)
@@ -1,40 +1,85 @@
+import re
 from datetime import datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from bot.config import (
-    INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION,
-    COMPANY_NAME, logger
+    INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION, VACANCY_CHOICE,
+    logger
+)
+from bot.scripts.templates import DialogTemplates
+from bot.scripts.keyboards import (
+    MAIN_MENU_KEYBOARD, MAIN_MENU_SHORT_KEYBOARD, INTRO_KEYBOARD, INTRO_RETRY_KEYBOARD,
+    RESEARCH_KEYBOARD, PRESENTATION_KEYBOARD, INVITATION_KEYBOARD, CONFIRMATION_KEYBOARD, VacancyKeyboards
+)
+from bot.database.async_storage import AsyncDataStorage
+from bot.database.vacancies import VacancyCatalog
+from bot.utils.rate_limiter import with_priority, PRIORITY_DIALOG
+from bot.utils.dialog_tracker import dialog_tracker
+from bot.utils.outreach import outreach
+from bot.utils.funnel import funnel
+from bot.handlers.callbacks import (
+    router, DIALOG_VACANCY, DIALOG_INTRO, DIALOG_PRESENTATION, DIALOG_INVITATION, DIALOG_CONFIRMATION, DIALOG_BACK
 )
-from bot.scripts.dialog import DIALOG_SCRIPTS
-from bot.database.storage import DataStorage
 
 class DialogHandlers:
     """Класс для обработки диалога с кандидатом."""
     
+    # Ссылка на диалог по вакансии: t.me/<бот>?start=v<номер вакансии>, бот получает "/start v<номер>";
+    # ссылка кампании рассылки - t.me/<бот>?start=c<номер кампании>
+    DEEP_LINK_PATTERN = r'^/start [vc]\d+$'
+
+    @staticmethod
+    def deep_link_payload(vacancy_id):
+        """Параметр ссылки t.me/<бот>?start=..., открывающей диалог по вакансии."""
+        return f"v{vacancy_id}"
+
+    @staticmethod
+    async def parse_vacancy_argument(args, chat_id):
+        """Определяет ID вакансии по аргументу команды: номер (ID), v<номер> или c<кампания> из ссылки, название.
+
+        Возвращает None, если аргумента нет, и -1, если такой вакансии нет.
+        """
+        if not args:
+            return None
+        argument = " ".join(args)
+        campaign = re.fullmatch(r'c(\d+)', argument)
+        if campaign:
+            # Кандидат пришел по ссылке кампании - вакансию задает кампания
+            vacancy_id = await outreach.join(int(campaign.group(1)), chat_id)
+            return -1 if vacancy_id is None else vacancy_id
+        match = re.fullmatch(r'v?(\d+)', argument)
+        if match:
+            vacancy_id = int(match.group(1))
+            return vacancy_id if await AsyncDataStorage.get_vacancy(vacancy_id) else -1
+        vacancy_id = await AsyncDataStorage.find_vacancy(argument)
+        return -1 if vacancy_id is None else vacancy_id
+
     @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def start_dialog(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Начинает диалог с кандидатом."""
+        """Начинает диалог с кандидатом по вакансии из аргумента команды или ссылки, иначе предлагает выбрать вакансию."""
         try:
             # Очищаем данные предыдущего диалога, если такие есть
-            for key in list(context.user_data.keys()):
-                if key.startswith(('candidate_', 'dialog_', 'interest', 'invitation', 'confirmation', 'preferred_time', 'vacancy_id')):
-                    del context.user_data[key]
-            
-            intro_message = DIALOG_SCRIPTS[INTRO].format(company=COMPANY_NAME)
+            DialogHandlers.clear_dialog_data(context)
             
-            # Создаем кнопки Да/Нет
-            keyboard = [
-                [InlineKeyboardButton("✅ Да", callback_data="intro_yes")],
-                [InlineKeyboardButton("❌ Нет", callback_data="intro_no")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(intro_message, reply_markup=reply_markup)
+            vacancy_id = await DialogHandlers.parse_vacancy_argument(context.args, update.effective_chat.id)
+            vacancies = await AsyncDataStorage.get_vacancies()
+            if vacancy_id is None and len(vacancies) == 1:
+                vacancy_id = VacancyCatalog.vacancy_id(vacancies[0])
+            if vacancy_id is None or vacancy_id < 0:
+                # Вакансия не указана или не найдена - кандидат выбирает ее сам
+                text = "Выберите вакансию:" if vacancy_id is None \
+                    else "Такой вакансии нет. Выберите вакансию из списка:"
+                await update.message.reply_text(
+                    text, reply_markup=VacancyKeyboards.picker or VacancyKeyboards.warm_up(vacancies)
+                )
+                return VACANCY_CHOICE
             
-            # Сохраняем время начала диалога
-            context.user_data['dialog_start_time'] = datetime.now().isoformat()
-            context.user_data['vacancy_id'] = 0  # Выбираем первую вакансию по умолчанию
+            await update.message.reply_text(
+                await DialogHandlers.begin_vacancy_dialog(context, vacancy_id), reply_markup=INTRO_KEYBOARD
+            )
             logger.info(f"Начат новый диалог с кандидатом, chat_id: {update.effective_chat.id}")
             return INTRO
         except Exception as e:
@@ -45,45 +90,92 @@ class DialogHandlers:
             return ConversationHandler.END
 
     @staticmethod
+    async def begin_vacancy_dialog(context, vacancy_id):
+        """Запоминает вакансию и время начала диалога, отмечает этап приветствия и возвращает его текст."""
+        vacancy = await AsyncDataStorage.get_vacancy(vacancy_id)
+        context.user_data['dialog_start_time'] = datetime.now().isoformat()
+        context.user_data['dialog_vacancy'] = vacancy['title'] if vacancy else "Неизвестная вакансия"
+        context.user_data['vacancy_id'] = vacancy_id
+        funnel.reach(context, INTRO)
+        return DialogTemplates.render(INTRO, vacancy_id)
+
+    @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
+    async def handle_vacancy_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обрабатывает выбор вакансии и начинает по ней диалог."""
+        try:
+            query = update.callback_query
+            await query.answer()
+            
+            payload = await router.decode(query, DIALOG_VACANCY)
+            if payload is None:
+                return ConversationHandler.END
+            vacancy_id = payload['vacancy_id']
+            if await AsyncDataStorage.get_vacancy(vacancy_id) is None:
+                # Кнопка из списка, который с тех пор изменился
+                vacancies = await AsyncDataStorage.get_vacancies()
+                await query.edit_message_text(
+                    "Эта вакансия больше не доступна. Выберите вакансию из списка:",
+                    reply_markup=VacancyKeyboards.picker or VacancyKeyboards.warm_up(vacancies)
+                )
+                return VACANCY_CHOICE
+            
+            await query.edit_message_text(
+                await DialogHandlers.begin_vacancy_dialog(context, vacancy_id), reply_markup=INTRO_KEYBOARD
+            )
+            logger.info(f"Начат новый диалог с кандидатом, chat_id: {update.effective_chat.id}")
+            return INTRO
+        except Exception as e:
+            logger.error(f"Ошибка при выборе вакансии: {e}")
+            if update.callback_query:
+                await update.callback_query.edit_message_text(
+                    "Произошла ошибка. Пожалуйста, начните диалог заново с помощью команды /dialog.",
+                    reply_markup=MAIN_MENU_KEYBOARD
+                )
+            return ConversationHandler.END
+
+    @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def handle_intro_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обрабатывает ответ на начальное приветствие."""
         try:
             query = update.callback_query
             await query.answer()
             
-            if query.data == "intro_yes":
+            payload = await router.decode(query, DIALOG_INTRO, answer=("yes", "no", "called_back", "still_no"))
+            if payload is None:
+                return ConversationHandler.END
+            answer = payload['answer']
+            if answer == "yes":
                 await query.edit_message_text("Отлично! Введите ваше имя и фамилия?")
                 return RESEARCH
-            elif query.data == "intro_no":
-                keyboard = [
-                    [InlineKeyboardButton("✅ Да, откликнулся", callback_data="intro_called_back")],
-                    [InlineKeyboardButton("❌ Возможно позже", callback_data="intro_still_no")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+            elif answer == "no":
+                reply_markup = INTRO_RETRY_KEYBOARD
                 
                 await query.edit_message_text(
                     "Понял Вас, а когда я могу с Вами связаться?", 
                     reply_markup=reply_markup
                 )
                 return INTRO
-            elif query.data == "intro_called_back":
+            elif answer == "called_back":
                 await query.edit_message_text("Отлично! Как ваше имя?")
                 return RESEARCH
-            elif query.data == "intro_still_no":
+            else:
                 # Завершаем диалог, если кандидат недоступен
-                keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = MAIN_MENU_KEYBOARD
                 
                 await query.edit_message_text(
                     "Понял, тогда хочу пожелать хорошего дня, до свидания!",
                     reply_markup=reply_markup
                 )
+                funnel.leave(context)
                 return ConversationHandler.END
         except Exception as e:
             logger.error(f"Ошибка при обработке ответа на приветствие: {e}")
             if update.callback_query:
-                keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = MAIN_MENU_KEYBOARD
                 
                 await update.callback_query.edit_message_text(
                     "Произошла ошибка. Пожалуйста, начните диалог заново с помощью команды /dialog.",
@@ -92,80 +184,75 @@ class DialogHandlers:
             return ConversationHandler.END
 
     @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def handle_research(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка имени кандидата и переход к исследованию."""
         # Сохраняем имя кандидата
         context.user_data['candidate_name'] = update.message.text
         
         # Задаем вопрос из скрипта для этапа исследования
-        research_message = DIALOG_SCRIPTS[RESEARCH].format(name=context.user_data['candidate_name'])
+        research_message = DialogTemplates.render(
+            RESEARCH, context.user_data.get('vacancy_id'), name=context.user_data['candidate_name']
+        )
         
         # Добавляем кнопку "Назад" для возврата к началу диалога
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_intro")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = RESEARCH_KEYBOARD
         
         await update.message.reply_text(research_message, reply_markup=reply_markup)
+        funnel.reach(context, RESEARCH)
         return PRESENTATION
 
     @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def handle_presentation(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка ответа кандидата и переход к презентации возможностей."""
         # Сохраняем ответ кандидата о его предпочтениях
         context.user_data['preferences'] = update.message.text
         
-        # Выбираем вакансию для презентации
-        vacancies = DataStorage.get_vacancies()
-        vacancy_id = context.user_data.get('vacancy_id', 0)
-        if 0 <= vacancy_id < len(vacancies):
-            vacancy = vacancies[vacancy_id]
-        else:
-            vacancy = vacancies[0]
-        
-        # Формируем текст презентации
-        presentation_message = DIALOG_SCRIPTS[PRESENTATION].format(
-            name=context.user_data['candidate_name']
+        # Страница презентации вакансии разобрана заранее, остается подставить имя
+        presentation_message = DialogTemplates.render(
+            PRESENTATION, context.user_data.get('vacancy_id'), name=context.user_data['candidate_name']
         )
         
         # Создаем кнопки Да/Нет для ответа на вопрос о заинтересованности, добавляем кнопку "Назад"
-        keyboard = [
-            [InlineKeyboardButton("✅ Да", callback_data="presentation_yes")],
-            [InlineKeyboardButton("❌ Нет", callback_data="presentation_no")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_research")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = PRESENTATION_KEYBOARD
         
         await update.message.reply_text(presentation_message, reply_markup=reply_markup)
+        funnel.reach(context, PRESENTATION)
         return INVITATION
 
     @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def handle_presentation_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обрабатывает ответ на презентацию вакансии."""
         try:
             query = update.callback_query
             await query.answer()
             
-            if query.data == "presentation_yes":
+            payload = await router.decode(query, DIALOG_PRESENTATION, answer=("yes", "no"))
+            if payload is None:
+                return ConversationHandler.END
+            if payload['answer'] == "yes":
                 # Если кандидат заинтересовался, переходим к приглашению на собеседование
-                invitation_message = DIALOG_SCRIPTS[INVITATION].format(
+                invitation_message = DialogTemplates.render(
+                    INVITATION, context.user_data.get('vacancy_id'),
                     name=context.user_data.get('candidate_name', 'Кандидат')
                 )
                 
                 # Создаем кнопки Да/Нет для ответа на приглашение, добавляем кнопку "Назад"
-                keyboard = [
-                    [InlineKeyboardButton("✅ Да", callback_data="invitation_yes")],
-                    [InlineKeyboardButton("❌ Нет, не получается", callback_data="invitation_no")],
-                    [InlineKeyboardButton("🔙 Назад", callback_data="back_to_presentation")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = INVITATION_KEYBOARD
                 
                 await query.edit_message_text(invitation_message, reply_markup=reply_markup)
                 context.user_data['interest'] = "Да, заинтересован"
+                funnel.reach(context, INVITATION)
                 return INVITATION
             else:
                 # Если кандидат не заинтересовался
                 name = context.user_data.get('candidate_name', 'Кандидат')
-                keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = MAIN_MENU_KEYBOARD
                 
                 await query.edit_message_text(
                     f"Спасибо за ваше время, {name}! "
@@ -173,15 +260,15 @@ class DialogHandlers:
                     reply_markup=reply_markup
                 )
                 context.user_data['interest'] = "Нет, не заинтересован"
+                funnel.leave(context)
                 
                 # Сохраняем данные о кандидате
-                DialogHandlers.save_candidate_data(context)
+                await DialogHandlers.save_candidate_data(context)
                 return ConversationHandler.END
         except Exception as e:
             logger.error(f"Ошибка при обработке ответа на презентацию: {e}")
             if update.callback_query:
-                keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = MAIN_MENU_KEYBOARD
                 
                 await update.callback_query.edit_message_text(
                     "Произошла ошибка. Пожалуйста, начните диалог заново с помощью команды /dialog.",
@@ -190,32 +277,32 @@ class DialogHandlers:
             return ConversationHandler.END
 
     @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def handle_invitation_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обрабатывает ответ на приглашение на собеседование."""
         try:
             query = update.callback_query
             await query.answer()
             
-            if query.data == "invitation_yes":
+            payload = await router.decode(query, DIALOG_INVITATION, answer=("yes", "no"))
+            if payload is None:
+                return ConversationHandler.END
+            if payload['answer'] == "yes":
                 # Если кандидат согласен прийти на собеседование
-                confirmation_message = DIALOG_SCRIPTS[CONFIRMATION]
+                confirmation_message = DialogTemplates.render(CONFIRMATION, context.user_data.get('vacancy_id'))
                 
                 # Создаем кнопки для подтверждения, добавляем кнопку "Назад"
-                keyboard = [
-                    [InlineKeyboardButton("✅ Да", callback_data="confirmation_yes")],
-                    [InlineKeyboardButton("❌ Нет", callback_data="confirmation_no")],
-                    [InlineKeyboardButton("🔙 Назад", callback_data="back_to_invitation")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = CONFIRMATION_KEYBOARD
                 
                 await query.edit_message_text(confirmation_message, reply_markup=reply_markup)
                 context.user_data['invitation_accepted'] = "Да"
+                funnel.reach(context, CONFIRMATION)
                 return CONFIRMATION
             else:
                 # Если кандидат не может прийти
                 name = context.user_data.get('candidate_name', 'Кандидат')
-                keyboard = [[InlineKeyboardButton("🏠 В главное меню", callback_data="/start")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = MAIN_MENU_SHORT_KEYBOARD
                 
                 await query.edit_message_text(
                     f"{name}, тогда обдумайте и сообщите свой ответ удобным для вас способом.  "
@@ -233,6 +320,8 @@ class DialogHandlers:
             return ConversationHandler.END
 
     @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Завершение диалога после получения подтверждения."""
         try:
@@ -240,10 +329,12 @@ class DialogHandlers:
                 query = update.callback_query
                 await query.answer()
                 
-                if query.data == "confirmation_yes":
+                payload = await router.decode(query, DIALOG_CONFIRMATION, answer=("yes", "no"))
+                if payload is None:
+                    return ConversationHandler.END
+                if payload['answer'] == "yes":
                     name = context.user_data.get('candidate_name', 'Кандидат')
-                    keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
+                    reply_markup = MAIN_MENU_KEYBOARD
                     
                     await query.edit_message_text(
                         f"Отлично, {name}! Ждем вас на собеседовании. До встречи!",
@@ -252,8 +343,7 @@ class DialogHandlers:
                     context.user_data['confirmation'] = "Да, подтверждено"
                 else:
                     name = context.user_data.get('candidate_name', 'Кандидат')
-                    keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
+                    reply_markup = MAIN_MENU_KEYBOARD
                     
                     await query.edit_message_text(
                         f"Понял, тогда хочу пожелать хорошего дня, до свидания!",
@@ -264,8 +354,7 @@ class DialogHandlers:
                 # Если это текстовый ответ с предпочтительным временем
                 context.user_data['preferred_time'] = update.message.text
                 name = context.user_data.get('candidate_name', 'Кандидат')
-                keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = MAIN_MENU_KEYBOARD
                 
                 await update.message.reply_text(
                     f"Спасибо, {name}! Будем ждать вас в указанное время. До встречи!",
@@ -273,15 +362,17 @@ class DialogHandlers:
                 )
                 context.user_data['confirmation'] = "Да, назначено альтернативное время"
             
+            # Ответ на последний пройденный этап завершает диалог
+            funnel.leave(context)
+            
             # Сохраняем данные о кандидате
-            DialogHandlers.save_candidate_data(context)
+            await DialogHandlers.save_candidate_data(context)
             return ConversationHandler.END
         except Exception as e:
             logger.error(f"Ошибка при обработке подтверждения: {e}")
             message = (update.callback_query.message if update.callback_query else update.message)
             if message:
-                keyboard = [[InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="/start")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = MAIN_MENU_KEYBOARD
                 
                 await message.reply_text(
                     "Произошла ошибка. Пожалуйста, начните диалог заново с помощью команды /dialog.",
@@ -290,7 +381,14 @@ class DialogHandlers:
             return ConversationHandler.END
 
     @staticmethod
-    def save_candidate_data(context):
+    def clear_dialog_data(context):
+        """Удаляет из контекста данные диалога с кандидатом."""
+        for key in list(context.user_data.keys()):
+            if key.startswith(('candidate_', 'dialog_', 'interest', 'invitation', 'confirmation', 'preferred_time', 'vacancy_id')):
+                del context.user_data[key]
+
+    @staticmethod
+    async def save_candidate_data(context):
         """Сохраняет данные кандидата в хранилище."""
         try:
             # Получаем данные о кандидате из контекста
@@ -300,14 +398,11 @@ class DialogHandlers:
             confirmation = context.user_data.get('confirmation', 'Неизвестно')
             preferred_time = context.user_data.get('preferred_time', '')
             start_time = context.user_data.get('dialog_start_time', datetime.now().isoformat())
+            # Секунды от начала диалога до каждого пройденного этапа
+            stage_times = funnel.compact_times(context)
             
-            # Формируем вакансию (пока берем первую из списка)
-            vacancies = DataStorage.get_vacancies()
-            vacancy_id = context.user_data.get('vacancy_id', 0)
-            if 0 <= vacancy_id < len(vacancies):
-                vacancy_title = vacancies[vacancy_id]['title']
-            else:
-                vacancy_title = "Неизвестная вакансия"
+            # Название вакансии запомнено в начале диалога: каталог мог с тех пор перечитаться
+            vacancy_title = context.user_data.get('dialog_vacancy', "Неизвестная вакансия")
                 
             # Определяем статус
             if confirmation == "Да, подтверждено" or confirmation == "Да, назначено альтернативное время":
@@ -328,15 +423,15 @@ class DialogHandlers:
                 'confirmation': confirmation,
                 'preferred_time': preferred_time
             }
+            if stage_times:
+                candidate_data['stage_times'] = stage_times
             
             # Сохраняем кандидата
-            DataStorage.add_candidate(candidate_data)
+            await AsyncDataStorage.add_candidate(candidate_data)
             logger.info(f"Сохранены данные кандидата: {name} ({vacancy_title})")
             
             # Очищаем данные диалога из контекста
-            for key in list(context.user_data.keys()):
-                if key.startswith(('candidate_', 'dialog_', 'interest', 'invitation', 'confirmation', 'preferred_time', 'vacancy_id')):
-                    del context.user_data[key]
+            DialogHandlers.clear_dialog_data(context)
                     
             return True
         except Exception as e:
@@ -344,62 +439,53 @@ class DialogHandlers:
             return False
 
     @staticmethod
+    @with_priority(PRIORITY_DIALOG)
+    @dialog_tracker.track
     async def handle_back_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обрабатывает нажатие на кнопку 'Назад'."""
         try:
             query = update.callback_query
             await query.answer()
             
-            if query.data == "back_to_intro":
+            payload = await router.decode(query, DIALOG_BACK, step=("intro", "research", "presentation", "invitation"))
+            if payload is None:
+                return ConversationHandler.END
+            step = payload['step']
+            if step == "intro":
                 # Возвращаемся к начальному приветствию
-                intro_message = DIALOG_SCRIPTS[INTRO].format(company=COMPANY_NAME)
+                intro_message = DialogTemplates.render(INTRO, context.user_data.get('vacancy_id'))
                 
-                keyboard = [
-                    [InlineKeyboardButton("✅ Да", callback_data="intro_yes")],
-                    [InlineKeyboardButton("❌ Нет", callback_data="intro_no")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = INTRO_KEYBOARD
                 
                 await query.edit_message_text(intro_message, reply_markup=reply_markup)
                 return INTRO
             
-            elif query.data == "back_to_research":
+            elif step == "research":
                 # Возвращаемся к этапу исследования
                 name = context.user_data.get('candidate_name', 'Кандидат')
-                research_message = DIALOG_SCRIPTS[RESEARCH].format(name=name)
+                research_message = DialogTemplates.render(RESEARCH, context.user_data.get('vacancy_id'), name=name)
                 
-                keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_intro")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = RESEARCH_KEYBOARD
                 
                 await query.edit_message_text(research_message, reply_markup=reply_markup)
                 return PRESENTATION
                 
-            elif query.data == "back_to_presentation":
+            elif step == "presentation":
                 # Возвращаемся к этапу презентации
                 name = context.user_data.get('candidate_name', 'Кандидат')
-                presentation_message = DIALOG_SCRIPTS[PRESENTATION].format(name=name)
+                presentation_message = DialogTemplates.render(PRESENTATION, context.user_data.get('vacancy_id'), name=name)
                 
-                keyboard = [
-                    [InlineKeyboardButton("✅ Да", callback_data="presentation_yes")],
-                    [InlineKeyboardButton("❌ Нет", callback_data="presentation_no")],
-                    [InlineKeyboardButton("🔙 Назад", callback_data="back_to_research")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = PRESENTATION_KEYBOARD
                 
                 await query.edit_message_text(presentation_message, reply_markup=reply_markup)
                 return INVITATION
                 
-            elif query.data == "back_to_invitation":
+            else:
                 # Возвращаемся к этапу приглашения
                 name = context.user_data.get('candidate_name', 'Кандидат')
-                invitation_message = DIALOG_SCRIPTS[INVITATION].format(name=name)
+                invitation_message = DialogTemplates.render(INVITATION, context.user_data.get('vacancy_id'), name=name)
                 
-                keyboard = [
-                    [InlineKeyboardButton("✅ Да", callback_data="invitation_yes")],
-                    [InlineKeyboardButton("❌ Нет, не получается", callback_data="invitation_no")],
-                    [InlineKeyboardButton("🔙 Назад", callback_data="back_to_presentation")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = INVITATION_KEYBOARD
                 
                 await query.edit_message_text(invitation_message, reply_markup=reply_markup)
                 return INVITATION
@@ -0,0 +1,104 @@
+from functools import lru_cache
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.config import CANDIDATE_STATUSES, COMPANY_REJECTION_REASONS, CANDIDATE_REJECTION_REASONS
+from bot.database.vacancies import VacancyCatalog
+from bot.handlers.callbacks import (
+    MAIN_MENU, CANDIDATE, SET_STATUS, REASON_TYPE, SET_REASON, BACK_TO_CANDIDATES,
+    DIALOG_VACANCY, DIALOG_INTRO, DIALOG_PRESENTATION, DIALOG_INVITATION, DIALOG_CONFIRMATION, DIALOG_BACK
+)
+
+# Объекты клавиатур Telegram неизменяемы, поэтому одну клавиатуру можно отправлять в любом ответе
+
+def build_keyboard(*rows):
+    """Собирает клавиатуру из строк кнопок вида (текст, callback_data)."""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row]
+        for row in rows
+    ])
+
+
+# Постоянные клавиатуры, собираемые один раз при запуске
+MAIN_MENU_KEYBOARD = build_keyboard([("🏠 Вернуться в главное меню", MAIN_MENU.encode())])
+MAIN_MENU_SHORT_KEYBOARD = build_keyboard([("🏠 В главное меню", MAIN_MENU.encode())])
+
+INTRO_KEYBOARD = build_keyboard(
+    [("✅ Да", DIALOG_INTRO.encode("yes"))],
+    [("❌ Нет", DIALOG_INTRO.encode("no"))]
+)
+INTRO_RETRY_KEYBOARD = build_keyboard(
+    [("✅ Да, откликнулся", DIALOG_INTRO.encode("called_back"))],
+    [("❌ Возможно позже", DIALOG_INTRO.encode("still_no"))]
+)
+RESEARCH_KEYBOARD = build_keyboard([("🔙 Назад", DIALOG_BACK.encode("intro"))])
+PRESENTATION_KEYBOARD = build_keyboard(
+    [("✅ Да", DIALOG_PRESENTATION.encode("yes"))],
+    [("❌ Нет", DIALOG_PRESENTATION.encode("no"))],
+    [("🔙 Назад", DIALOG_BACK.encode("research"))]
+)
+INVITATION_KEYBOARD = build_keyboard(
+    [("✅ Да", DIALOG_INVITATION.encode("yes"))],
+    [("❌ Нет, не получается", DIALOG_INVITATION.encode("no"))],
+    [("🔙 Назад", DIALOG_BACK.encode("presentation"))]
+)
+CONFIRMATION_KEYBOARD = build_keyboard(
+    [("✅ Да", DIALOG_CONFIRMATION.encode("yes"))],
+    [("❌ Нет", DIALOG_CONFIRMATION.encode("no"))],
+    [("🔙 Назад", DIALOG_BACK.encode("invitation"))]
+)
+
+
+class VacancyKeyboards:
+    """Клавиатура выбора вакансии в начале диалога, пересобираемая при изменении списка вакансий."""
+
+    picker = None
+
+    @classmethod
+    def warm_up(cls, vacancies):
+        """Собирает клавиатуру выбора из текущего списка вакансий."""
+        cls.picker = build_keyboard(*(
+            [(f"💼 {vacancy['title']}", DIALOG_VACANCY.encode(VacancyCatalog.vacancy_id(vacancy)))]
+            for vacancy in vacancies
+        ))
+        return cls.picker
+
+
+# Эмодзи статусов и причин отказа
+STATUS_EMOJIS = ["📞", "📝", "✅", "❌", "🕒"]
+COMPANY_REASON_EMOJIS = ["💰", "👨‍💼", "📊", "🏢", "⏱️"]
+CANDIDATE_REASON_EMOJIS = ["💰", "📍", "👨‍👩‍👧‍👦", "🏢", "🕒"]
+
+
+# Клавиатуры выбора для кандидата собираются один раз на кандидата и переиспользуются
+
+@lru_cache(maxsize=1024)
+def status_keyboard(candidate_id):
+    """Клавиатура выбора статуса кандидата."""
+    rows = [
+        [(f"{STATUS_EMOJIS[i] if i < len(STATUS_EMOJIS) else '📌'} {status}", SET_STATUS.encode(candidate_id, i))]
+        for i, status in enumerate(CANDIDATE_STATUSES)
+    ]
+    rows.append([("🔙 Назад", BACK_TO_CANDIDATES.encode("status"))])
+    return build_keyboard(*rows)
+
+
+@lru_cache(maxsize=1024)
+def reason_type_keyboard(candidate_id):
+    """Клавиатура выбора типа отказа."""
+    return build_keyboard(
+        [("🏢 Отказ компании", REASON_TYPE.encode(candidate_id, "company"))],
+        [("👨‍💼 Отказ кандидата", REASON_TYPE.encode(candidate_id, "candidate"))],
+        [("🔙 Назад", BACK_TO_CANDIDATES.encode("reason"))]
+    )
+
+
+@lru_cache(maxsize=1024)
+def reason_keyboard(candidate_id, reason_type):
+    """Клавиатура выбора причины отказа указанного типа."""
+    reasons = COMPANY_REJECTION_REASONS if reason_type == "company" else CANDIDATE_REJECTION_REASONS
+    emojis = COMPANY_REASON_EMOJIS if reason_type == "company" else CANDIDATE_REASON_EMOJIS
+    rows = [
+        [(f"{emojis[i] if i < len(emojis) else '❌'} {reason}", SET_REASON.encode(candidate_id, reason_type, i))]
+        for i, reason in enumerate(reasons)
+    ]
+    rows.append([("🔙 Назад", CANDIDATE.encode(candidate_id, "reason"))])
+    return build_keyboard(*rows)
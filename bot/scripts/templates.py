@@ -0,0 +1,125 @@
+from string import Formatter
+from bot.config import PRESENTATION, COMPANY_NAME, logger
+from bot.scripts.dialog import DIALOG_SCRIPTS
+from bot.database.vacancies import VacancyCatalog
+
+class CompiledTemplate:
+    """Шаблон сообщения, разобранный один раз: постоянные поля подставлены, остаются только изменяемые."""
+
+    __slots__ = ('parts', 'text')
+
+    # Преобразования !r, !s и !a, как в str.format
+    CONVERSIONS = (None, 'r', 's', 'a')
+
+    def __init__(self, template, **static):
+        """Разбирает шаблон и подставляет постоянные поля (компания, вакансия)."""
+        parts = []
+        literal = ''
+        for text, field, spec, conversion in Formatter().parse(template):
+            literal += text
+            if field is None:
+                continue
+            if conversion not in self.CONVERSIONS:
+                raise ValueError(f"Неизвестное преобразование !{conversion} в поле {{{field}}}")
+            if field in static:
+                literal += format(self.convert(static[field], conversion), spec or '')
+            else:
+                if literal:
+                    parts.append(literal)
+                literal = ''
+                parts.append((field, spec or '', conversion))
+        if literal:
+            parts.append(literal)
+
+        self.parts = tuple(parts)
+        # Если изменяемых полей нет, готовый текст отдается без сборки
+        self.text = parts[0] if len(parts) == 1 and isinstance(parts[0], str) else None
+        if not parts:
+            self.text = ''
+
+    def render(self, **values):
+        """Собирает текст, подставляя изменяемые поля."""
+        if self.text is not None:
+            return self.text
+        return ''.join(
+            part if isinstance(part, str) else format(self.convert(values[part[0]], part[2]), part[1])
+            for part in self.parts
+        )
+
+    @staticmethod
+    def convert(value, conversion):
+        """Применяет к значению преобразование поля (!r, !s, !a) так же, как str.format."""
+        if conversion is None:
+            return value
+        if conversion == 'r':
+            return repr(value)
+        if conversion == 'a':
+            return ascii(value)
+        return str(value)
+
+
+class DialogTemplates:
+    """Страницы диалога, разобранные заранее для каждой вакансии.
+
+    При загрузке списка вакансий для каждой из них разбираются шаблоны всех этапов: компания,
+    название, описание и зарплата подставляются сразу, при отправке остается подставить имя.
+    """
+
+    # Поля, которые подставляются при отправке сообщения
+    DYNAMIC_FIELDS = {'name'}
+
+    # ID вакансии -> {этап: шаблон}; таблица заменяется целиком при перезагрузке вакансий
+    _pages = {}
+    # Страница первой вакансии списка - для неизвестной вакансии
+    _first = None
+    # Шаблоны без вакансии, пока список вакансий не загружен
+    _default = {}
+
+    @classmethod
+    def compile(cls, step, vacancy=None, company=COMPANY_NAME):
+        """Разбирает шаблон этапа для вакансии, подставляя ее поля и компанию."""
+        vacancy = vacancy or {}
+        static = {
+            'company': company,
+            'vacancy': vacancy.get('title', ''),
+            'description': vacancy.get('description', ''),
+            'salary': vacancy.get('salary', ''),
+        }
+        if step == PRESENTATION and vacancy.get('presentation'):
+            try:
+                return cls._checked(CompiledTemplate(vacancy['presentation'], **static))
+            except (ValueError, IndexError) as e:
+                logger.error(f"Ошибка в тексте презентации вакансии {vacancy.get('title')}: {e}")
+        return cls._checked(CompiledTemplate(DIALOG_SCRIPTS[step], **static))
+
+    @classmethod
+    def _checked(cls, template):
+        """Проверяет, что в шаблоне не осталось неизвестных полей."""
+        unknown = {part[0] for part in template.parts if not isinstance(part, str)} - cls.DYNAMIC_FIELDS
+        if unknown:
+            raise ValueError(f"неизвестные поля {', '.join(sorted(unknown))}")
+        return template
+
+    @classmethod
+    def get(cls, step, vacancy_id=None):
+        """Возвращает шаблон этапа для вакансии (для неизвестной вакансии - для первой)."""
+        page = cls._pages.get(vacancy_id) or cls._first
+        if page is not None:
+            return page[step]
+        template = cls._default.get(step)
+        if template is None:
+            template = cls._default[step] = cls.compile(step)
+        return template
+
+    @classmethod
+    def render(cls, step, vacancy_id=None, **values):
+        """Формирует текст этапа диалога для кандидата."""
+        return cls.get(step, vacancy_id).render(**values)
+
+    @classmethod
+    def warm_up(cls, vacancies):
+        """Разбирает страницы всех этапов для каждой вакансии и заменяет ими прежние."""
+        pages = [{step: cls.compile(step, vacancy) for step in DIALOG_SCRIPTS} for vacancy in vacancies]
+        cls._pages = {VacancyCatalog.vacancy_id(vacancy): page for vacancy, page in zip(vacancies, pages)}
+        cls._first = pages[0] if pages else None
+        return len(cls._pages)
@@ -1,5 +1,11 @@
+import csv
+import gzip
+import io
+import tempfile
+from datetime import datetime
 from bot.database.storage import DataStorage
-from bot.config import CANDIDATE_STATUSES
+from bot.utils.funnel import funnel
+from bot.config import CANDIDATE_STATUSES, ANALYTICS_EXPORT_STATE_FILE, EXPORT_MEMORY_LIMIT
 
 class AnalyticsHelper:
     """Класс для работы с аналитикой."""
@@ -7,29 +13,27 @@ class AnalyticsHelper:
     @staticmethod
     def calculate_statistics():
         """Вычисляет статистику по кандидатам."""
-        candidates = DataStorage.get_candidates()
+        # Счетчики поддерживаются хранилищем при каждом изменении кандидатов
+        stats = DataStorage.get_statistics()
         
-        if not candidates:
+        if not stats['total']:
             return None
             
-        # Общее количество кандидатов
-        total_candidates = len(candidates)
-        
         # Считаем по статусам
-        status_count = {}
-        for status in CANDIDATE_STATUSES:
-            status_count[status] = sum(1 for c in candidates if c['status'] == status)
+        status_count = {status: stats['status_count'].get(status, 0) for status in CANDIDATE_STATUSES}
             
         # Считаем по причинам отказа
         rejection_count = {
-            'Компания': sum(1 for c in candidates if c.get('rejection_reason') and c['rejection_reason']['type'] == 'Компания'),
-            'Кандидат': sum(1 for c in candidates if c.get('rejection_reason') and c['rejection_reason']['type'] == 'Кандидат')
+            'Компания': stats['rejection_count'].get('Компания', 0),
+            'Кандидат': stats['rejection_count'].get('Кандидат', 0)
         }
         
         return {
-            'total': total_candidates,
+            'total': stats['total'],
             'status_count': status_count,
-            'rejection_count': rejection_count
+            'rejection_count': rejection_count,
+            'vacancy_count': stats['vacancy_count'],
+            'daily_count': stats['daily_count']
         }
     
     @staticmethod
@@ -59,10 +63,163 @@ class AnalyticsHelper:
             if count > 0:
                 percentage = round((count / total_candidates) * 100, 1)
                 analytics_text += f"- {reason_type}: {count} ({percentage}%)\n"
+        
+        analytics_text += "\nКандидаты по вакансиям:\n"
+        for vacancy, count in sorted(stats['vacancy_count'].items(), key=lambda item: -item[1]):
+            percentage = round((count / total_candidates) * 100, 1)
+            analytics_text += f"- {vacancy}: {count} ({percentage}%)\n"
                 
         return analytics_text
     
+    # Сколько последних периодов и крупнейших вакансий показывается в тексте воронки
+    FUNNEL_MAX_LINES = 31
+    FUNNEL_PERIOD_NAMES = {'day': "по дням", 'week': "по неделям", 'month': "по месяцам"}
+    
+    @staticmethod
+    def format_funnel_counts(counts):
+        """Формирует строку воронки: число кандидатов на каждом этапе и итоговая конверсия."""
+        line = " → ".join(str(count) for count in counts)
+        if counts[0]:
+            line += f" ({round(counts[-1] / counts[0] * 100, 1)}%)"
+        return line
+    
+    @staticmethod
+    def vacancy_title(vacancy_id):
+        """Название вакансии для отчета по ее ID из итогов воронки."""
+        if vacancy_id == funnel.UNKNOWN_VACANCY_ID:
+            return "Неизвестная вакансия"
+        vacancy = DataStorage.get_vacancy(vacancy_id)
+        # Вакансия могла быть удалена из каталога, а ее итоги остались
+        return vacancy['title'] if vacancy else f"Вакансия №{vacancy_id} (удалена)"
+    
+    @staticmethod
+    def generate_funnel_text(days=30, period='day', vacancy_id=None):
+        """Формирует текст воронки диалогов: этапы, конверсия и отсев, по вакансиям и периодам."""
+        report = funnel.report(days, period, vacancy_id)
+        total = report['total']
+        
+        title = f"📈 Воронка диалогов за {days} дн. ({AnalyticsHelper.FUNNEL_PERIOD_NAMES[period]})"
+        if vacancy_id is not None:
+            title += f", вакансия «{AnalyticsHelper.vacancy_title(vacancy_id)}»"
+        if not total[0]:
+            return f"{title}\n\nНет данных для воронки."
+        
+        funnel_text = f"{title}:\n\n"
+        funnel_text += "Этапы (конверсия из предыдущего этапа):\n"
+        for i, (name, count) in enumerate(zip(funnel.STAGE_NAMES, total)):
+            funnel_text += f"- {name}: {count}"
+            if i and total[i - 1]:
+                funnel_text += f" ({round(count / total[i - 1] * 100, 1)}%)"
+            funnel_text += "\n"
+        
+        funnel_text += "\nОтсев (остановились на этапе):\n"
+        for i, name in enumerate(funnel.STAGE_NAMES[:-1]):
+            dropped = total[i] - total[i + 1]
+            if dropped > 0:
+                funnel_text += f"- {name}: {dropped} ({round(dropped / total[i] * 100, 1)}%)\n"
+        
+        if len(report['by_vacancy']) > 1:
+            funnel_text += "\nПо вакансиям:\n"
+            vacancies = sorted(report['by_vacancy'].items(), key=lambda item: -item[1][0])
+            for row_vacancy_id, counts in vacancies[:AnalyticsHelper.FUNNEL_MAX_LINES]:
+                funnel_text += f"- {AnalyticsHelper.vacancy_title(row_vacancy_id)}: {AnalyticsHelper.format_funnel_counts(counts)}\n"
+        
+        periods = list(report['by_period'].items())
+        funnel_text += f"\n{AnalyticsHelper.FUNNEL_PERIOD_NAMES[period].capitalize()}"
+        if len(periods) > AnalyticsHelper.FUNNEL_MAX_LINES:
+            funnel_text += f" (последние {AnalyticsHelper.FUNNEL_MAX_LINES})"
+        funnel_text += ":\n"
+        for start, counts in periods[-AnalyticsHelper.FUNNEL_MAX_LINES:]:
+            funnel_text += f"- {start}: {AnalyticsHelper.format_funnel_counts(counts)}\n"
+        
+        return funnel_text
+    
+    # Перцентили времени на этапах и сколько крупнейших вакансий показывается отдельно
+    TIMING_PERCENTILES = (50, 90, 99)
+    TIMING_MAX_VACANCIES = 10
+    
+    @staticmethod
+    def format_duration(seconds):
+        """Формирует длительность в удобных единицах: секунды, минуты, часы или дни."""
+        if seconds < 60:
+            return f"{seconds:.0f} с"
+        if seconds < 60 * 60:
+            return f"{seconds / 60:.1f} мин"
+        if seconds < 24 * 60 * 60:
+            return f"{seconds / 3600:.1f} ч"
+        return f"{seconds / 86400:.1f} дн"
+    
+    @staticmethod
+    def format_timing(sketch):
+        """Формирует строку перцентилей времени на этапе по наброску."""
+        values = ", ".join(
+            f"p{p} {AnalyticsHelper.format_duration(sketch.quantile(p / 100))}"
+            for p in AnalyticsHelper.TIMING_PERCENTILES
+        )
+        return f"{values} ({sketch.count})"
+    
+    @staticmethod
+    def generate_timing_text(vacancy_id=None):
+        """Формирует текст о времени кандидатов на этапах диалога: перцентили в целом и по вакансиям."""
+        report = funnel.timing_report(vacancy_id)
+        
+        title = "⏱ Время на этапах диалога"
+        if vacancy_id is not None:
+            title += f", вакансия «{AnalyticsHelper.vacancy_title(vacancy_id)}»"
+        if not report['total']:
+            return f"{title}\n\nНет данных о времени на этапах."
+        
+        timing_text = f"{title} (от показа этапа до ответа кандидата, в скобках - число ответов):\n\n"
+        for stage, name in zip(funnel.STAGES, funnel.STAGE_NAMES):
+            if stage in report['total']:
+                timing_text += f"- {name}: {AnalyticsHelper.format_timing(report['total'][stage])}\n"
+        
+        if len(report['by_vacancy']) > 1:
+            vacancies = sorted(
+                report['by_vacancy'].items(),
+                key=lambda item: -sum(sketch.count for sketch in item[1].values())
+            )
+            for row_vacancy_id, sketches in vacancies[:AnalyticsHelper.TIMING_MAX_VACANCIES]:
+                timing_text += f"\n{AnalyticsHelper.vacancy_title(row_vacancy_id)}:\n"
+                for stage, name in zip(funnel.STAGES, funnel.STAGE_NAMES):
+                    if stage in sketches:
+                        timing_text += f"- {name}: {AnalyticsHelper.format_timing(sketches[stage])}\n"
+        
+        return timing_text
+    
+    @staticmethod
+    def build_export_document(compress=False, incremental=False):
+        """Потоково формирует CSV-выгрузку кандидатов в буфере для отправки документом.
+        
+        Строки пишутся по одной, поэтому память не растет с числом кандидатов: буфер держится
+        в памяти до EXPORT_MEMORY_LIMIT байт и дальше переносится во временный файл.
+        В режиме incremental выгружаются только кандидаты, измененные после прошлой выгрузки.
+        """
+        started = datetime.now().isoformat()
+        since = DataStorage.load_data(ANALYTICS_EXPORT_STATE_FILE, {}).get('last_export') if incremental else None
+        
+        buffer = tempfile.SpooledTemporaryFile(max_size=EXPORT_MEMORY_LIMIT)
+        stream = gzip.GzipFile(fileobj=buffer, mode='wb') if compress else buffer
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(DataStorage.EXPORT_HEADER)
+        
+        rows = 0
+        for row in DataStorage.iter_export_rows(since):
+            writer.writerow(DataStorage.format_export_row(row))
+            rows += 1
+        
+        # Отсоединяем обертки, не закрывая сам буфер
+        text.flush()
+        text.detach()
+        if compress:
+            stream.close()
+        buffer.seek(0)
+        
+        filename = f"analytics_{datetime.now().strftime('%Y-%m-%d')}.csv" + (".gz" if compress else "")
+        return {'file': buffer, 'filename': filename, 'rows': rows, 'started': started, 'since': since}
+    
     @staticmethod
-    def export_analytics():
-        """Экспортирует аналитику в CSV и возвращает успешность операции."""
-        return DataStorage.export_analytics_to_csv() 
\ No newline at end of file
+    def save_export_mark(started):
+        """Запоминает момент выгрузки, от которого считается следующая инкрементальная выгрузка."""
+        return DataStorage.save_data(ANALYTICS_EXPORT_STATE_FILE, {'last_export': started}) 
\ No newline at end of file
@@ -0,0 +1,241 @@
+import asyncio
+import time
+from collections import OrderedDict
+from functools import wraps
+from telegram.ext import CallbackContext, ConversationHandler
+
+from bot.config import RESEARCH, PRESENTATION, INVITATION, CONFIRMATION, DIALOG_TIMEOUT, MAX_ACTIVE_DIALOGS, logger
+from bot.utils.update_processor import ChatOrderedUpdateProcessor
+
+class DialogTracker:
+    """Учет незавершенных диалогов с кандидатами и вытеснение брошенных.
+
+    Кандидат, переставший отвечать посреди /dialog, оставляет в памяти этап диалога и user_data.
+    Диалоги без ответа дольше timeout секунд, а при превышении max_dialogs - самые давние,
+    удаляются из памяти. Сохраняются (статус "Обдумывает") только диалоги, в которых кандидат
+    ответил на приветствие или назвал имя; приветствие без ответа (например, из рассылки) просто
+    забывается. Вытеснение идет в очереди обновлений чата, поэтому не пересекается с обработкой
+    сообщения кандидата.
+    """
+
+    # Этапы, до которых кандидат доходит, только ответив на приветствие
+    PROGRESS_STATES = (RESEARCH, PRESENTATION, INVITATION, CONFIRMATION)
+
+    def __init__(self, timeout=DIALOG_TIMEOUT, max_dialogs=MAX_ACTIVE_DIALOGS):
+        """Инициализация учета диалогов."""
+        self.timeout = timeout
+        self.max_dialogs = max_dialogs
+        # Ключ диалога -> (время последнего ответа, chat_id, user_id); порядок - от давних к свежим
+        self._dialogs = OrderedDict()
+        self.application = None
+        self.conversation = None
+        self.on_evict = None
+        self.on_discard = None
+        self._sweep_task = None
+        # Вытеснения сверх лимита, ждущие очереди своего чата
+        self._evictions = set()
+
+        # Метрики вытеснения
+        self.evicted_idle = 0
+        self.evicted_overflow = 0
+        self.discarded = 0
+
+    def attach(self, application, conversation, on_evict, on_discard=None):
+        """
+        Подключает учет к приложению.
+
+        conversation - ConversationHandler диалога;
+        on_evict - корутина, сохраняющая незавершенный диалог по контексту пользователя;
+        on_discard - функция, удаляющая из контекста данные диалога, который не нужно сохранять.
+        """
+        self.application = application
+        self.conversation = conversation
+        self.on_evict = on_evict
+        self.on_discard = on_discard
+
+    def track(self, func):
+        """Декоратор обработчика диалога: отмечает ответ кандидата и завершение диалога."""
+        @wraps(func)
+        async def wrapper(update, context):
+            state = await func(update, context)
+            if self.conversation is not None and update.effective_chat and update.effective_user:
+                key = self.conversation_key(update.effective_chat.id, update.effective_user.id)
+                if state == ConversationHandler.END:
+                    self._dialogs.pop(key, None)
+                elif state is not None:
+                    self._touch(key, update.effective_chat.id, update.effective_user.id)
+                    self._evict_overflow()
+            return state
+        return wrapper
+
+    def _touch(self, key, chat_id, user_id):
+        """Отмечает ответ в диалоге, перенося его в конец очереди вытеснения."""
+        self._dialogs[key] = (time.monotonic(), chat_id, user_id)
+        self._dialogs.move_to_end(key)
+
+    # У ConversationHandler нет открытого способа прочитать или поменять этап чужого диалога,
+    # поэтому учет обращается к его внутренним _conversations и _update_state (python-telegram-bot 20-22).
+    # Все такие обращения собраны в трех методах ниже - при обновлении библиотеки проверять их.
+
+    def _states(self):
+        """Возвращает этапы всех идущих диалогов: {ключ диалога: этап}."""
+        return self.conversation._conversations
+
+    def _get_state(self, key):
+        """Возвращает этап диалога (None - диалог не идет)."""
+        return self._states().get(key)
+
+    def _set_state(self, key, state):
+        """Переводит диалог в этап state (ConversationHandler.END - завершает его)."""
+        self.conversation._update_state(state, key)
+
+    def is_active(self, chat_id, user_id):
+        """Проверяет, идет ли у пользователя диалог."""
+        return self._get_state(self.conversation_key(chat_id, user_id)) is not None
+
+    async def in_chat(self, chat_id, coroutine):
+        """Выполняет coroutine в очереди обновлений чата, чтобы не пересечься с обработкой его сообщений."""
+        processor = self.application.update_processor
+        if isinstance(processor, ChatOrderedUpdateProcessor):
+            return await processor.run_in_chat(chat_id, coroutine)
+        return await coroutine
+
+    def begin(self, chat_id, user_id, state):
+        """Переводит в этап state диалог, начатый ботом (например, рассылкой), и учитывает его.
+
+        Вызывается в очереди чата (in_chat), иначе может пересечься с сообщением кандидата.
+        """
+        key = self.conversation_key(chat_id, user_id)
+        self._set_state(key, state)
+        self._touch(key, chat_id, user_id)
+        self._evict_overflow()
+
+    def conversation_key(self, chat_id, user_id):
+        """Возвращает ключ диалога так же, как его строит ConversationHandler."""
+        key = []
+        if self.conversation.per_chat:
+            key.append(chat_id)
+        if self.conversation.per_user:
+            key.append(user_id)
+        return tuple(key)
+
+    async def start(self):
+        """Учитывает восстановленные после перезапуска диалоги и запускает периодическую очистку."""
+        now = time.monotonic()
+        # Восстановленные диалоги считаются начатыми сейчас: время последнего ответа не сохраняется
+        for key, state in self._states().items():
+            if key not in self._dialogs and state is not None and len(key) == 2:
+                self._dialogs[key] = (now, key[0], key[1])
+        self._evict_overflow()
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def stop(self):
+        """Останавливает периодическую очистку и дожидается начатых вытеснений."""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        await self.settle()
+
+    async def settle(self):
+        """Дожидается вытеснений сверх лимита, ждущих очереди своего чата."""
+        while self._evictions:
+            await asyncio.gather(*self._evictions, return_exceptions=True)
+
+    async def _sweep_loop(self):
+        """Периодически вытесняет диалоги без ответа дольше timeout."""
+        interval = min(60, self.timeout / 4)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Ошибка при очистке брошенных диалогов: {e}")
+
+    async def sweep(self):
+        """Вытесняет диалоги без ответа дольше timeout; возвращает количество вытесненных."""
+        deadline = time.monotonic() - self.timeout
+        expired = []
+        while self._dialogs:
+            # Диалоги упорядочены по времени ответа, дальше идут только свежие
+            key, (last_seen, chat_id, user_id) = next(iter(self._dialogs.items()))
+            if last_seen > deadline:
+                break
+            del self._dialogs[key]
+            expired.append((key, chat_id, user_id))
+        evicted = 0
+        for key, chat_id, user_id in expired:
+            evicted += await self._evict(key, chat_id, user_id)
+        self.evicted_idle += evicted
+        return evicted
+
+    def _evict_overflow(self):
+        """Вытесняет самые давние диалоги сверх max_dialogs.
+
+        Вызывается и из обработчика, занявшего очередь своего чата, поэтому очереди чужих чатов
+        не ждет: вытеснение выполняется отдельной задачей (см. settle).
+        """
+        while len(self._dialogs) > self.max_dialogs:
+            key, (_, chat_id, user_id) = self._dialogs.popitem(last=False)
+            task = asyncio.get_running_loop().create_task(self._evict_overflowed(key, chat_id, user_id))
+            self._evictions.add(task)
+            task.add_done_callback(self._evictions.discard)
+
+    async def _evict_overflowed(self, key, chat_id, user_id):
+        """Вытесняет диалог сверх лимита."""
+        try:
+            self.evicted_overflow += await self._evict(key, chat_id, user_id)
+        except Exception as e:
+            logger.error(f"Ошибка при вытеснении диалога, chat_id: {chat_id}: {e}")
+
+    async def _evict(self, key, chat_id, user_id):
+        """Вытесняет диалог в очереди его чата; возвращает False, если кандидат успел ответить или завершить его."""
+        return await self.in_chat(chat_id, self._end(key, chat_id, user_id))
+
+    async def _end(self, key, chat_id, user_id):
+        """Сохраняет незавершенный диалог, если кандидат в нем продвинулся, и удаляет его этап и данные из памяти."""
+        state = self._get_state(key)
+        if key in self._dialogs or state is None:
+            # Пока вытеснение ждало очереди чата, кандидат ответил или завершил диалог
+            return False
+        # Завершаем диалог до сохранения, чтобы новые сообщения кандидата не попали в старый этап
+        self._set_state(key, ConversationHandler.END)
+
+        context = CallbackContext(self.application, chat_id=chat_id, user_id=user_id)
+        if context.user_data.get('dialog_start_time'):
+            if self._progressed(context, state):
+                await self.on_evict(context)
+            else:
+                # Приветствие без ответа - не кандидат, в базу не попадает
+                self.discarded += 1
+                if self.on_discard is not None:
+                    self.on_discard(context)
+        if context.user_data:
+            self.application.mark_data_for_update_persistence(user_ids=user_id)
+        else:
+            self.application.drop_user_data(user_id)
+        logger.info(f"Диалог без ответа вытеснен из памяти, chat_id: {chat_id}")
+        return True
+
+    def _progressed(self, context, state):
+        """Проверяет, ответил ли кандидат на приветствие: назвал имя или дошел до следующих этапов."""
+        # Кнопка "Назад" может вернуть к приветствию, поэтому учитываются и пройденные этапы воронки
+        return bool(context.user_data.get('candidate_name')) or state in self.PROGRESS_STATES \
+            or len(context.user_data.get('dialog_stage_times') or ()) > 1
+
+    def stats(self):
+        """Возвращает количество активных и вытесненных диалогов."""
+        return {
+            'active': len(self._dialogs),
+            'evicted_idle': self.evicted_idle,
+            'evicted_overflow': self.evicted_overflow,
+            'discarded': self.discarded
+        }
+
+
+# Общий учет диалогов: обработчики диалога отмечаются декоратором dialog_tracker.track
+dialog_tracker = DialogTracker()
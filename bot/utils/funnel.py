@@ -0,0 +1,248 @@
+import math
+import threading
+from datetime import date, datetime, timedelta
+
+from bot.config import INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION, FUNNEL_FLUSH_INTERVAL, logger
+from bot.database.funnel import FunnelStore
+from bot.database.storage import DataStorage
+from bot.database.write_behind import WriteBehindWriter
+
+class QuantileSketch:
+    """Потоковая оценка перцентилей с относительной погрешностью (логарифмические корзины, как в DDSketch).
+
+    Значение x попадает в корзину ceil(log_gamma(x)), поэтому добавление - вычисление индекса
+    и прибавка счетчика, а оценка любого перцентиля отличается от точной не больше чем на accuracy.
+    Наброски с одной точностью складываются по корзинам, поэтому их можно хранить счетчиками
+    корзин и объединять по вакансиям.
+    """
+
+    # Значения меньше этого (в секундах) попадают в одну корзину
+    MIN_VALUE = 0.01
+
+    def __init__(self, accuracy=0.01):
+        """Инициализация пустого наброска с относительной погрешностью accuracy."""
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # Индекс корзины -> количество значений
+        self.counts = {}
+        self.count = 0
+
+    def index(self, value):
+        """Возвращает индекс корзины значения."""
+        return math.ceil(math.log(max(value, self.MIN_VALUE)) / self._log_gamma)
+
+    def add(self, value, count=1):
+        """Добавляет значение."""
+        self.add_bucket(self.index(value), count)
+
+    def add_bucket(self, index, count):
+        """Добавляет count значений в корзину index (например, прочитанную с диска)."""
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+
+    def quantile(self, q):
+        """Возвращает оценку перцентиля q (от 0 до 1) или None для пустого наброска."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                break
+        # Середина корзины (gamma^(i-1), gamma^i] с точки зрения относительной погрешности
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+
+class DialogFunnel:
+    """Воронка диалогов и время на этапах: сколько кандидатов дошли до каждого этапа и как долго на нем были.
+
+    Этап считается пройденным, когда кандидату показан его текст из сценария. Диалог учитывается
+    в день своего начала, поэтому конверсия между этапами считается по одним и тем же кандидатам.
+    Время на этапе - от показа этапа до ответа кандидата, переводящего к следующему этапу или
+    завершающего диалог; оно попадает в набросок перцентилей вакансии и этапа. Счетчики копятся
+    в памяти и не реже FUNNEL_FLUSH_INTERVAL секунд прибавляются к итогам на диске; отчет за
+    период читает только итоги нужных дней.
+    """
+
+    STAGES = (INTRO, RESEARCH, PRESENTATION, INVITATION, CONFIRMATION)
+    STAGE_NAMES = ("Приветствие", "Знакомство", "Презентация", "Приглашение", "Подтверждение")
+    # Группировка дней в отчете
+    PERIODS = ('day', 'week', 'month')
+    # Относительная погрешность перцентилей времени на этапах
+    TIMING_ACCURACY = 0.01
+    # ID в итогах для диалога, вакансия которого неизвестна
+    UNKNOWN_VACANCY_ID = 0
+
+    def __init__(self, store=None, max_delay=FUNNEL_FLUSH_INTERVAL):
+        """Инициализация воронки."""
+        self.store = store or FunnelStore(resolve_title=DataStorage.find_vacancy)
+        self._lock = threading.RLock()
+        # (день, ID вакансии) -> прибавки счетчиков по этапам, еще не записанные на диск
+        self._pending = {}
+        # (ID вакансии, этап, корзина) -> количество переходов, еще не записанных на диск
+        self._timings = {}
+        self._index = QuantileSketch(self.TIMING_ACCURACY).index
+        self._writer = WriteBehindWriter(self._flush_pending, max_delay, self._lock)
+        self.recorded = 0
+        self.timed = 0
+
+    @staticmethod
+    def _offset(context):
+        """Секунды от начала диалога до текущего момента."""
+        now = datetime.now()
+        started = context.user_data.get('dialog_start_time')
+        return round((now - datetime.fromisoformat(started)).total_seconds(), 1) if started else 0.0
+
+    def reach(self, context, stage):
+        """Отмечает, что кандидат дошел до этапа, и время на предыдущем этапе.
+
+        Повторный показ этапа (кнопка "Назад") не учитывается. Время прохождения этапов хранится
+        в user_data['dialog_stage_times'] секундами от начала диалога (None - этап пропущен).
+        """
+        times = context.user_data.setdefault('dialog_stage_times', [])
+        position = self.STAGES.index(stage)
+        if position < len(times) and times[position] is not None:
+            return False
+        offset = self._offset(context)
+        previous = len(times) - 1
+        while previous >= 0 and times[previous] is None:
+            previous -= 1
+        times.extend([None] * (position + 1 - len(times)))
+        times[position] = offset
+
+        day = context.user_data.get('dialog_start_time', datetime.now().isoformat())[:10]
+        vacancy_id = self.vacancy_id(context)
+        with self._lock:
+            counts = self._pending.setdefault((day, vacancy_id), [0] * len(self.STAGES))
+            counts[position] += 1
+            self.recorded += 1
+            if previous >= 0:
+                self._add_timing(vacancy_id, previous, offset - times[previous])
+            self._writer.write()
+        return True
+
+    def leave(self, context):
+        """Отмечает ответ кандидата, завершающий диалог, и время на последнем пройденном этапе."""
+        times = context.user_data.get('dialog_stage_times')
+        if not times or 'dialog_end_time' in context.user_data:
+            return False
+        offset = self._offset(context)
+        context.user_data['dialog_end_time'] = offset
+        previous = max(position for position, reached in enumerate(times) if reached is not None)
+        with self._lock:
+            self._add_timing(self.vacancy_id(context), previous, offset - times[previous])
+            self._writer.write()
+        return True
+
+    @classmethod
+    def vacancy_id(cls, context):
+        """ID вакансии диалога, под которым он учитывается в итогах."""
+        vacancy_id = context.user_data.get('vacancy_id')
+        return cls.UNKNOWN_VACANCY_ID if vacancy_id is None else vacancy_id
+
+    def _add_timing(self, vacancy_id, position, seconds):
+        """Прибавляет время на этапе к корзине наброска; вызывается под блокировкой воронки."""
+        key = (vacancy_id, position, self._index(seconds))
+        self._timings[key] = self._timings.get(key, 0) + 1
+        self.timed += 1
+
+    @staticmethod
+    def compact_times(context):
+        """Время этапов диалога для записи кандидата: секунды от начала до каждого этапа и до ответа на последний."""
+        times = context.user_data.get('dialog_stage_times')
+        if not times:
+            return None
+        compact = {'stages': times}
+        if 'dialog_end_time' in context.user_data:
+            compact['end'] = context.user_data['dialog_end_time']
+        return compact
+
+    def _flush_pending(self):
+        """Прибавляет накопленные счетчики к суточным итогам; вызывается под блокировкой воронки."""
+        if not self._pending and not self._timings:
+            return True
+        try:
+            self.store.add(self._pending, self._timings)
+        except Exception as e:
+            logger.error(f"Ошибка при записи итогов воронки: {e}")
+            return False
+        self._pending = {}
+        self._timings = {}
+        return True
+
+    def flush(self):
+        """Принудительно записывает накопленные счетчики."""
+        return self._writer.flush()
+
+    @staticmethod
+    def bucket(day, period):
+        """Возвращает начало периода, к которому относится день: сам день, понедельник недели или месяц."""
+        if period == 'week':
+            start = date.fromisoformat(day)
+            return (start - timedelta(days=start.weekday())).isoformat()
+        if period == 'month':
+            return day[:7]
+        return day
+
+    def report(self, days=30, period='day', vacancy_id=None, today=None):
+        """
+        Собирает воронку за последние days дней.
+
+        period - группировка: day, week или month; vacancy_id - ID вакансии (None - все).
+        Возвращает итог по этапам, итоги по ID вакансий и по периодам и число прочитанных строк.
+        """
+        if period not in self.PERIODS:
+            raise ValueError(f"Неизвестный период: {period}")
+        # Недавние счетчики записываются до чтения, чтобы отчет их учитывал
+        self.flush()
+        since = ((today or date.today()) - timedelta(days=days - 1)).isoformat()
+        rows = self.store.query(since, vacancy_id)
+
+        total = [0] * len(self.STAGES)
+        by_vacancy = {}
+        by_period = {}
+        for day, row_vacancy_id, counts in rows:
+            for target in (total, by_vacancy.setdefault(row_vacancy_id, [0] * len(self.STAGES)),
+                           by_period.setdefault(self.bucket(day, period), [0] * len(self.STAGES))):
+                for i, count in enumerate(counts):
+                    target[i] += count
+        return {
+            'since': since,
+            'days': days,
+            'period': period,
+            'vacancy_id': vacancy_id,
+            'rows': len(rows),
+            'total': total,
+            'by_vacancy': by_vacancy,
+            'by_period': dict(sorted(by_period.items()))
+        }
+
+    def timing_report(self, vacancy_id=None):
+        """
+        Собирает перцентили времени на этапах.
+
+        vacancy_id - ID вакансии (None - все). Возвращает наброски по этапам в целом и по каждой
+        вакансии: {'total': {этап: QuantileSketch}, 'by_vacancy': {ID вакансии: {этап: ...}}}.
+        """
+        self.flush()
+        total = {}
+        by_vacancy = {}
+        for row_vacancy_id, position, bucket, count in self.store.query_timings(vacancy_id):
+            stage = self.STAGES[position]
+            for sketches in (total, by_vacancy.setdefault(row_vacancy_id, {})):
+                sketch = sketches.get(stage)
+                if sketch is None:
+                    sketch = sketches[stage] = QuantileSketch(self.TIMING_ACCURACY)
+                sketch.add_bucket(bucket, count)
+        return {'vacancy_id': vacancy_id, 'total': total, 'by_vacancy': by_vacancy}
+
+    def stats(self):
+        """Возвращает количество учтенных этапов и замеров времени и метрики записи итогов."""
+        stats = {'recorded': self.recorded, 'timed': self.timed}
+        stats.update(self._writer.stats())
+        return stats
+
+
+# Общая воронка: этапы отмечает DialogHandlers, отчет строит AnalyticsHelper
+funnel = DialogFunnel()
@@ -0,0 +1,72 @@
+import os
+import threading
+from telegram.error import BadRequest
+from bot.config import MEDIA_CACHE_FILE, logger
+from bot.database.storage import DataStorage
+from bot.database.async_storage import AsyncDataStorage
+
+class MediaHelper:
+    """Класс для отправки изображений с кэшированием file_id, выданных Telegram."""
+
+    _lock = threading.Lock()
+    _entries = None
+
+    @staticmethod
+    def _signature(path):
+        """Возвращает подпись файла (время изменения и размер) или None, если файла нет."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    @classmethod
+    def _load(cls):
+        """Загружает сохраненные file_id при первом обращении."""
+        if cls._entries is None:
+            cls._entries = DataStorage.load_data(MEDIA_CACHE_FILE, {})
+        return cls._entries
+
+    @classmethod
+    def get_file_id(cls, path):
+        """Возвращает сохраненный file_id изображения или None, если файл с тех пор изменился."""
+        with cls._lock:
+            entry = cls._load().get(path)
+            if entry and entry.get('signature') == cls._signature(path):
+                return entry['file_id']
+            return None
+
+    @classmethod
+    def remember(cls, path, file_id):
+        """Сохраняет file_id загруженного изображения вместе с подписью файла."""
+        with cls._lock:
+            entries = cls._load()
+            entries[path] = {'file_id': file_id, 'signature': cls._signature(path)}
+            return DataStorage.save_data(MEDIA_CACHE_FILE, entries)
+
+    @classmethod
+    def forget(cls, path):
+        """Удаляет file_id изображения, который Telegram больше не принимает."""
+        with cls._lock:
+            entries = cls._load()
+            if entries.pop(path, None) is not None:
+                DataStorage.save_data(MEDIA_CACHE_FILE, entries)
+
+    @staticmethod
+    async def reply_photo(message, path, caption=None):
+        """Отправляет изображение ответом на сообщение: по file_id, а при его отсутствии - загрузкой файла."""
+        file_id = await AsyncDataStorage.run(MediaHelper.get_file_id, path)
+        if file_id:
+            try:
+                return await message.reply_photo(photo=file_id, caption=caption)
+            except BadRequest as e:
+                logger.warning(f"Сохраненный file_id для {path} не принят, загружаем файл заново: {e}")
+                await AsyncDataStorage.run(MediaHelper.forget, path)
+
+        with open(path, 'rb') as photo_file:
+            sent = await message.reply_photo(photo=photo_file, caption=caption)
+        if sent.photo:
+            # Самый большой вариант фото соответствует исходному изображению
+            await AsyncDataStorage.run(MediaHelper.remember, path, sent.photo[-1].file_id)
+            logger.info(f"Изображение {path} загружено, file_id сохранен")
+        return sent
@@ -0,0 +1,216 @@
+import asyncio
+import re
+import threading
+import time
+from functools import wraps
+from telegram import Update
+from telegram.ext import ConversationHandler, TypeHandler
+
+from bot.config import METRICS_LISTEN, METRICS_PORT, logger
+from bot.handlers.callbacks import CallbackCodec
+
+def escape_label(value):
+    """Экранирует значение метки для текстового формата Prometheus: обратная косая черта, кавычка и перевод строки."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными границами корзин, как в Prometheus."""
+
+    __slots__ = ('counts', 'sum', 'count', 'errors')
+
+    def __init__(self, size):
+        """Инициализация пустой гистограммы на size корзин."""
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+
+class Metrics:
+    """Задержки и количество вызовов обработчиков и хранилища в формате Prometheus.
+
+    Обработчики приложения оборачиваются при вызове instrument(), хранилище передает
+    длительность своих методов в observe_storage(). Если метрики выключены (METRICS_PORT=0),
+    обработчики не оборачиваются, а хранилище проверяет только флаг enabled.
+    """
+
+    # Границы корзин гистограмм в секундах
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    PREFIX = 'hr_bot'
+
+    def __init__(self, enabled=METRICS_PORT > 0):
+        """Инициализация пустого набора метрик."""
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # (handler, prefix) -> Histogram
+        self._handlers = {}
+        # (method, kind) -> Histogram
+        self._storage = {}
+        # Тип обновления -> количество
+        self._updates = {}
+        # Имя -> функция, возвращающая словарь числовых показателей компонента
+        self._collectors = {}
+        self._server = None
+        self.started = time.time()
+
+    def register_collector(self, name, stats):
+        """Добавляет в выдачу показатели компонента: stats() возвращает словарь чисел."""
+        self._collectors[name] = stats
+
+    def instrument(self, application):
+        """Оборачивает обработчики приложения и добавляет подсчет обновлений перед ними."""
+        if not self.enabled:
+            return
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                self._instrument_handler(handler)
+        # Группа -1 обрабатывается раньше всех остальных
+        application.add_handler(TypeHandler(Update, self.count_update), group=-1)
+
+    def _instrument_handler(self, handler):
+        """Оборачивает обработчик, а для диалога - обработчики всех его этапов."""
+        if isinstance(handler, ConversationHandler):
+            nested = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                nested.extend(state_handlers)
+            for inner in nested:
+                self._instrument_handler(inner)
+            return
+        handler.callback = self.timed(handler.callback)
+
+    def timed(self, callback):
+        """Оборачивает обработчик: задержка, количество вызовов и ошибок по обработчику и префиксу кнопки."""
+        name = getattr(callback, '__qualname__', repr(callback))
+
+        @wraps(callback)
+        async def wrapper(update, context):
+            prefix = ''
+            if isinstance(update, Update) and update.callback_query and update.callback_query.data:
+                prefix = update.callback_query.data.split(CallbackCodec.SEPARATOR, 1)[0]
+                # Данные кнопки приходят от клиента: чужие префиксы сводятся к одной метке,
+                # чтобы не плодить ряды метрик, как неизвестные кнопки в CallbackRouter
+                if prefix not in CallbackCodec.prefixes:
+                    prefix = 'unknown'
+            started = time.perf_counter()
+            error = False
+            try:
+                return await callback(update, context)
+            except Exception:
+                error = True
+                raise
+            finally:
+                self._observe(self._handlers, (name, prefix), time.perf_counter() - started, error)
+        return wrapper
+
+    async def count_update(self, update, context):
+        """Считает входящие обновления по типу (регистрируется в группе -1)."""
+        kind = 'other'
+        if update.callback_query is not None:
+            kind = 'callback_query'
+        elif update.message is not None:
+            kind = 'command' if update.message.text and update.message.text.startswith('/') else 'message'
+        self._updates[kind] = self._updates.get(kind, 0) + 1
+
+    def observe_storage(self, method, seconds, error=False):
+        """Записывает длительность метода хранилища (вызывается из потоков хранилища)."""
+        kind = 'read' if method.startswith(('get_', 'count_', 'iter_')) else 'write'
+        self._observe(self._storage, (method, kind), seconds, error)
+
+    def _observe(self, histograms, labels, seconds, error):
+        """Добавляет наблюдение в гистограмму с указанными метками."""
+        with self._lock:
+            histogram = histograms.get(labels)
+            if histogram is None:
+                histogram = histograms[labels] = Histogram(len(self.BUCKETS))
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    histogram.counts[i] += 1
+                    break
+            histogram.sum += seconds
+            histogram.count += 1
+            if error:
+                histogram.errors += 1
+
+    def render(self):
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = [
+            f"# TYPE {self.PREFIX}_uptime_seconds gauge",
+            f"{self.PREFIX}_uptime_seconds {time.time() - self.started:.3f}",
+            f"# TYPE {self.PREFIX}_updates_total counter",
+        ]
+        for kind, count in sorted(self._updates.items()):
+            lines.append(f'{self.PREFIX}_updates_total{{type="{escape_label(kind)}"}} {count}')
+
+        with self._lock:
+            lines.extend(self._render_histograms('handler', ('handler', 'prefix'), self._handlers))
+            lines.extend(self._render_histograms('storage', ('method', 'kind'), self._storage))
+
+        for name, stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.error(f"Ошибка при сборе метрик {name}: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"{self.PREFIX}_{name}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}"
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _render_histograms(self, family, label_names, histograms):
+        """Строки гистограмм длительностей и счетчиков ошибок одного семейства."""
+        seconds = f"{self.PREFIX}_{family}_seconds"
+        errors = f"{self.PREFIX}_{family}_errors_total"
+        lines = [f"# TYPE {seconds} histogram"]
+        error_lines = [f"# TYPE {errors} counter"]
+        for labels, histogram in sorted(histograms.items()):
+            label_text = ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'{seconds}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{seconds}_bucket{{{label_text},le="+Inf"}} {histogram.count}')
+            lines.append(f'{seconds}_sum{{{label_text}}} {histogram.sum:.6f}')
+            lines.append(f'{seconds}_count{{{label_text}}} {histogram.count}')
+            error_lines.append(f'{errors}{{{label_text}}} {histogram.errors}')
+        return lines + error_lines
+
+    async def start_server(self, host=METRICS_LISTEN, port=METRICS_PORT):
+        """Начинает отдавать метрики по адресу http://host:port/metrics."""
+        if not self.enabled or self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info(f"Метрики доступны по адресу http://{host}:{port}/metrics")
+
+    async def stop_server(self):
+        """Прекращает отдачу метрик."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        """Отвечает на один HTTP-запрос метриками и закрывает соединение."""
+        try:
+            request_line = (await asyncio.wait_for(reader.readline(), 5)).decode('latin-1').split()
+            if len(request_line) == 3 and request_line[0] == 'GET' and request_line[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.render().encode()
+            else:
+                status, body = '404 Not Found', b''
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Ошибка при отдаче метрик: {e}")
+        finally:
+            writer.close()
+
+
+# Общий набор метрик бота
+metrics = Metrics()
@@ -0,0 +1,285 @@
+import asyncio
+from collections import Counter
+from telegram.error import BadRequest, Forbidden, NetworkError, TelegramError
+from telegram.ext import CallbackContext
+
+from bot.config import INTRO, OUTREACH_CONCURRENCY, logger
+from bot.database.async_storage import AsyncDataStorage
+from bot.database.outreach import OutreachStore
+from bot.scripts.templates import DialogTemplates
+from bot.scripts.keyboards import INTRO_KEYBOARD
+from bot.utils.dialog_tracker import dialog_tracker
+from bot.utils.rate_limiter import message_priority, PRIORITY_OUTREACH
+
+class OutreachManager:
+    """Рассылка приветствия диалога кандидатам и учет кампаний со ссылкой.
+
+    Приветствия отправляются не больше concurrency одновременно (во всех кампаниях вместе) и с самым
+    низким приоритетом очереди исходящих сообщений, поэтому занимают только свободную пропускную
+    способность и не задерживают ответы в диалогах. Результаты записываются пачками; после перезапуска
+    незавершенные рассылки продолжаются с неотправленных получателей.
+    """
+
+    # Сколько получателей читается из базы за раз и сколько результатов копится до записи
+    BATCH_SIZE = 500
+    FLUSH_SIZE = 100
+    # Повторы при сетевых ошибках
+    RETRIES = 2
+    # Сколько секунд при остановке бота ждать завершения начатых отправок
+    STOP_TIMEOUT = 10
+
+    def __init__(self, store=None, concurrency=OUTREACH_CONCURRENCY):
+        """Инициализация рассылки."""
+        self.store = store or OutreachStore()
+        self.concurrency = concurrency
+        # Места отправки, общие для всех кампаний: одновременные рассылки не умножают нагрузку
+        self._slots = asyncio.Semaphore(concurrency)
+        self.application = None
+        self.begin_dialog = None
+        # ID кампании -> кампания со счетчиками получателей по статусам и ошибок по типам
+        self._campaigns = {}
+        self._tasks = {}
+        self._results = []
+        self._stopping = False
+
+    def attach(self, application, begin_dialog):
+        """
+        Подключает рассылку к приложению.
+
+        begin_dialog(context, vacancy_id) - корутина, запоминающая в user_data вакансию и начало диалога.
+        """
+        self.application = application
+        self.begin_dialog = begin_dialog
+
+    @staticmethod
+    async def _io(func, *args):
+        """Выполняет операцию с базой рассылок в пуле потоков."""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def start(self):
+        """Загружает кампании и продолжает прерванные рассылки."""
+        self._stopping = False
+        for campaign in await self._io(self.store.get_campaigns):
+            statuses, errors = await self._io(self.store.count_recipients, campaign['id'])
+            campaign['counts'] = Counter(statuses)
+            campaign['errors'] = Counter(errors)
+            self._campaigns[campaign['id']] = campaign
+            if campaign['kind'] == OutreachStore.KIND_CHATS and campaign['status'] == OutreachStore.RUNNING:
+                logger.info(f"Рассылка №{campaign['id']} продолжается, осталось: {campaign['counts'][OutreachStore.PENDING]}")
+                self._start_task(campaign['id'])
+
+    async def stop(self):
+        """Дожидается начатых отправок, записывает результаты и останавливает рассылки."""
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=self.STOP_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._flush()
+
+    async def create_campaign(self, chat_ids, vacancy_id):
+        """Создает рассылку приветствия по вакансии списку чатов и запускает ее; возвращает ID."""
+        if await AsyncDataStorage.get_vacancy(vacancy_id) is None:
+            raise ValueError(f"Вакансия №{vacancy_id} не найдена")
+        chat_ids = sorted(set(chat_ids))
+        if not chat_ids:
+            raise ValueError("Список получателей пуст")
+        campaign_id = await self._io(self.store.create_campaign, OutreachStore.KIND_CHATS, vacancy_id, chat_ids)
+        self._campaigns[campaign_id] = {
+            'id': campaign_id, 'kind': OutreachStore.KIND_CHATS, 'vacancy_id': vacancy_id,
+            'status': OutreachStore.RUNNING, 'counts': Counter({OutreachStore.PENDING: len(chat_ids)}),
+            'errors': Counter()
+        }
+        logger.info(f"Создана рассылка №{campaign_id}: {len(chat_ids)} получателей")
+        self._start_task(campaign_id)
+        return campaign_id
+
+    async def create_link_campaign(self, vacancy_id):
+        """Создает кампанию со ссылкой на диалог по вакансии; возвращает ID."""
+        if await AsyncDataStorage.get_vacancy(vacancy_id) is None:
+            raise ValueError(f"Вакансия №{vacancy_id} не найдена")
+        campaign_id = await self._io(self.store.create_campaign, OutreachStore.KIND_LINK, vacancy_id)
+        self._campaigns[campaign_id] = {
+            'id': campaign_id, 'kind': OutreachStore.KIND_LINK, 'vacancy_id': vacancy_id,
+            'status': OutreachStore.RUNNING, 'counts': Counter(), 'errors': Counter()
+        }
+        return campaign_id
+
+    @staticmethod
+    def deep_link_payload(campaign_id):
+        """Параметр ссылки t.me/<бот>?start=..., по которой кандидат приходит в кампанию."""
+        return f"c{campaign_id}"
+
+    async def join(self, campaign_id, chat_id):
+        """Учитывает кандидата, пришедшего по ссылке кампании; возвращает ID вакансии или None."""
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None or campaign['kind'] != OutreachStore.KIND_LINK \
+                or campaign['status'] != OutreachStore.RUNNING:
+            return None
+        if await self._io(self.store.add_joined, campaign_id, chat_id):
+            campaign['counts'][OutreachStore.JOINED] += 1
+        return campaign['vacancy_id']
+
+    async def pause(self, campaign_id):
+        """Приостанавливает кампанию: начатые отправки завершаются, остальные ждут продолжения."""
+        return await self._set_status(campaign_id, OutreachStore.PAUSED)
+
+    async def resume(self, campaign_id):
+        """Продолжает приостановленную кампанию."""
+        if not await self._set_status(campaign_id, OutreachStore.RUNNING):
+            return False
+        if self._campaigns[campaign_id]['kind'] == OutreachStore.KIND_CHATS:
+            self._start_task(campaign_id)
+        return True
+
+    async def _set_status(self, campaign_id, status):
+        """Меняет статус незавершенной кампании."""
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None or campaign['status'] in (status, OutreachStore.DONE):
+            return False
+        campaign['status'] = status
+        await self._io(self.store.set_status, campaign_id, status)
+        return True
+
+    def _start_task(self, campaign_id):
+        """Запускает рассылку кампании, если она еще не идет."""
+        if campaign_id not in self._tasks:
+            self._tasks[campaign_id] = asyncio.get_running_loop().create_task(self._run(campaign_id))
+
+    async def _run(self, campaign_id):
+        """Отправляет приветствие неотправленным получателям кампании порциями."""
+        # Приоритет задается в контексте задачи и действует на все ее отправки
+        message_priority.set(PRIORITY_OUTREACH)
+        campaign = self._campaigns[campaign_id]
+        try:
+            while self._running(campaign):
+                # Результаты предыдущей порции уже записаны, поэтому в выборку попадают только неотправленные
+                chat_ids = await self._io(self.store.pending_recipients, campaign_id, self.BATCH_SIZE)
+                if not chat_ids:
+                    campaign['status'] = OutreachStore.DONE
+                    await self._io(self.store.set_status, campaign_id, OutreachStore.DONE)
+                    logger.info(f"Рассылка №{campaign_id} завершена: {dict(campaign['counts'])}")
+                    break
+                # Получатели разбираются из общего итератора не больше чем concurrency отправителями
+                recipients = iter(chat_ids)
+                await asyncio.gather(*(
+                    self._worker(campaign, recipients) for _ in range(min(self.concurrency, len(chat_ids)))
+                ))
+                await self._flush()
+        except Exception as e:
+            logger.error(f"Ошибка рассылки №{campaign_id}: {e}")
+        finally:
+            self._tasks.pop(campaign_id, None)
+
+    def _running(self, campaign):
+        """Проверяет, можно ли продолжать отправку."""
+        return campaign['status'] == OutreachStore.RUNNING and not self._stopping
+
+    async def _worker(self, campaign, recipients):
+        """Отправляет приветствие получателям из общего итератора по одному."""
+        for chat_id in recipients:
+            if not self._running(campaign):
+                return
+            async with self._slots:
+                status, error = await self._send(campaign, chat_id)
+            campaign['counts'][OutreachStore.PENDING] -= 1
+            campaign['counts'][status] += 1
+            if error:
+                campaign['errors'][error] += 1
+            self._results.append((campaign['id'], chat_id, status, error))
+            if len(self._results) >= self.FLUSH_SIZE:
+                await self._flush()
+
+    async def _send(self, campaign, chat_id):
+        """Отправляет приветствие и начинает диалог; возвращает статус получателя и тип ошибки."""
+        if chat_id < 0:
+            # Диалог ведется только в личном чате
+            return OutreachStore.SKIPPED, 'not_private'
+        # Проверка диалога, отправка и смена этапа идут в очереди чата, чтобы не пересечься
+        # с сообщением, которое кандидат как раз прислал
+        return await dialog_tracker.in_chat(chat_id, self._deliver(campaign, chat_id))
+
+    async def _deliver(self, campaign, chat_id):
+        """Отправляет приветствие в личный чат и начинает диалог, если кандидат его еще не ведет."""
+        if dialog_tracker.is_active(chat_id, chat_id):
+            # Не прерываем диалог, который кандидат уже ведет
+            return OutreachStore.SKIPPED, 'in_dialog'
+
+        vacancy_id = campaign['vacancy_id']
+        for attempt in range(self.RETRIES + 1):
+            try:
+                await self.application.bot.send_message(
+                    chat_id, DialogTemplates.render(INTRO, vacancy_id), reply_markup=INTRO_KEYBOARD
+                )
+                break
+            except (Forbidden, BadRequest) as e:
+                # Бот заблокирован или чата нет - повтор не поможет
+                return OutreachStore.FAILED, type(e).__name__
+            except NetworkError as e:
+                if attempt == self.RETRIES:
+                    return OutreachStore.FAILED, type(e).__name__
+                await asyncio.sleep(attempt + 1)
+            except TelegramError as e:
+                return OutreachStore.FAILED, type(e).__name__
+
+        # В личном чате ID чата совпадает с ID пользователя
+        context = CallbackContext(self.application, chat_id=chat_id, user_id=chat_id)
+        await self.begin_dialog(context, vacancy_id)
+        self.application.mark_data_for_update_persistence(user_ids=chat_id)
+        dialog_tracker.begin(chat_id, chat_id, INTRO)
+        return OutreachStore.SENT, None
+
+    async def _flush(self):
+        """Записывает накопленные результаты отправки."""
+        if not self._results:
+            return
+        results, self._results = self._results, []
+        try:
+            await self._io(self.store.save_results, results)
+        except Exception as e:
+            # Не записанные получатели остаются pending и получат приветствие повторно
+            logger.error(f"Ошибка при записи результатов рассылки: {e}")
+
+    def get_campaigns(self):
+        """Возвращает ход всех кампаний."""
+        return [self.progress(campaign_id) for campaign_id in self._campaigns]
+
+    def progress(self, campaign_id):
+        """Возвращает ход кампании: статус, получателей по статусам и ошибки по типам (или None)."""
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None:
+            return None
+        counts = campaign['counts']
+        return {
+            'id': campaign_id,
+            'kind': campaign['kind'],
+            'vacancy_id': campaign['vacancy_id'],
+            'status': campaign['status'],
+            'total': sum(counts.values()),
+            'pending': counts[OutreachStore.PENDING],
+            'sent': counts[OutreachStore.SENT],
+            'failed': counts[OutreachStore.FAILED],
+            'skipped': counts[OutreachStore.SKIPPED],
+            'joined': counts[OutreachStore.JOINED],
+            'errors': dict(campaign['errors'])
+        }
+
+    def stats(self):
+        """Возвращает количество идущих рассылок и получателей по статусам во всех кампаниях."""
+        totals = Counter()
+        for campaign in self._campaigns.values():
+            totals.update(campaign['counts'])
+        return {
+            'running': len(self._tasks),
+            'pending': totals[OutreachStore.PENDING],
+            'sent': totals[OutreachStore.SENT],
+            'failed': totals[OutreachStore.FAILED],
+            'skipped': totals[OutreachStore.SKIPPED],
+            'joined': totals[OutreachStore.JOINED]
+        }
+
+
+# Общая рассылка: подключается к приложению в HRBot.setup
+outreach = OutreachManager()
@@ -0,0 +1,361 @@
+import asyncio
+import contextvars
+import itertools
+from datetime import timedelta
+from functools import wraps
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from bot.config import (
+    FLOOD_GLOBAL_RATE, FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_GROUP_RATE, FLOOD_MAX_RETRIES, logger
+)
+
+# Приоритеты исходящих сообщений: меньшее значение отправляется раньше
+PRIORITY_DIALOG = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_ANALYTICS = 2
+# Рассылка приветствий занимает только свободную от остальных сообщений пропускную способность
+PRIORITY_OUTREACH = 3
+
+# Приоритет запросов, отправляемых из текущего обработчика
+message_priority = contextvars.ContextVar('message_priority', default=PRIORITY_DEFAULT)
+
+# Методы редактирования, из которых отправляется только последнее изменение сообщения
+MERGEABLE_ENDPOINTS = {'editMessageText', 'editMessageCaption', 'editMessageReplyMarkup'}
+
+
+def with_priority(priority):
+    """Декоратор обработчика: все сообщения, отправленные из него, получают указанный приоритет."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = message_priority.set(priority)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                message_priority.reset(token)
+        return wrapper
+    return decorator
+
+
+class TokenBucket:
+    """Корзина токенов: не больше rate запросов в секунду с запасом на capacity запросов подряд."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate, capacity, now):
+        """Инициализация полной корзины."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def delay(self, now):
+        """Возвращает, сколько секунд ждать до появления токена (0 - токен есть)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        """Забирает токен."""
+        self.tokens -= 1
+
+    def block(self, until):
+        """Запрещает отправку до указанного момента (после RetryAfter)."""
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0
+
+
+class _Request:
+    """Ожидающий отправки запрос в очереди."""
+
+    __slots__ = ('priority', 'seq', 'chat_id', 'merge_key', 'released', 'result', 'active')
+
+    def __init__(self, priority, seq, chat_id, merge_key, result):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.merge_key = merge_key
+        # released - получено разрешение на отправку (или запрос, заменивший этот)
+        self.released = asyncio.get_running_loop().create_future()
+        # result - ответ Telegram, общий для всех попыток и для замененных правок
+        self.result = result
+        self.active = True
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class FloodControlLimiter(BaseRateLimiter):
+    """Очередь исходящих запросов с учетом ограничений Telegram.
+
+    Запросы к чатам проходят через общую корзину токенов и корзину своего чата, отправляются
+    по приоритету, подряд идущие правки одного сообщения сливаются в одну, а при RetryAfter
+    отправка приостанавливается на указанное время и запрос повторяется. Корзины чатов,
+    давно не получавших сообщений, периодически удаляются.
+    """
+
+    # Как часто (в секундах) удалять полные корзины чатов без ожидающих запросов
+    BUCKET_SWEEP_INTERVAL = 60
+
+    def __init__(self, global_rate=FLOOD_GLOBAL_RATE, chat_rate=FLOOD_CHAT_RATE, chat_burst=FLOOD_CHAT_BURST,
+                 group_rate=FLOOD_GROUP_RATE, max_retries=FLOOD_MAX_RETRIES):
+        """Инициализация лимитов: запросов в секунду всего, в личный чат и в группу."""
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+
+        self._queue = []
+        self._pending_edits = {}
+        self._chat_buckets = {}
+        self._global_bucket = None
+        self._seq = itertools.count()
+        self._next_sweep = 0.0
+        self._wakeup = None
+        self._pump_task = None
+
+        # Метрики очереди
+        self.sent = 0
+        self.merged = 0
+        self.retries = 0
+
+    async def initialize(self):
+        """Запускает задачу, выдающую разрешения на отправку."""
+        # Бот инициализируется и приложением, и Updater, а очередь нужна одна
+        if self._pump_task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._global_bucket = TokenBucket(self.global_rate, self.global_rate, loop.time())
+        self._next_sweep = loop.time() + self.BUCKET_SWEEP_INTERVAL
+        self._wakeup = asyncio.Event()
+        self._pump_task = asyncio.create_task(self._pump())
+
+    async def shutdown(self):
+        """Останавливает очередь."""
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+
+    def _chat_bucket(self, chat_id, now):
+        """Возвращает корзину чата, создавая ее при первом запросе."""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Отрицательные идентификаторы у групп и каналов, для них лимит в минуту
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, 1, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _pump(self):
+        """Выдает разрешения ожидающим запросам по приоритету, пока есть токены."""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if now >= self._next_sweep:
+                self._sweep_buckets(now)
+                self._next_sweep = now + self.BUCKET_SWEEP_INTERVAL
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            global_delay = self._global_bucket.delay(now)
+            if global_delay:
+                await self._sleep(global_delay)
+                continue
+
+            # Первый по приоритету запрос, чей чат готов принять сообщение
+            wait = None
+            for request in sorted(self._queue):
+                delay = self._chat_bucket(request.chat_id, now).delay(now)
+                if not delay:
+                    self._queue.remove(request)
+                    self._release(request)
+                    break
+                wait = delay if wait is None else min(wait, delay)
+            else:
+                await self._sleep(wait)
+
+    def _sweep_buckets(self, now):
+        """Удаляет корзины чатов, успевшие наполниться: новая корзина будет такой же."""
+        waiting = {request.chat_id for request in self._queue}
+        idle = [
+            chat_id for chat_id, bucket in self._chat_buckets.items()
+            if chat_id not in waiting and not bucket.delay(now) and bucket.tokens >= bucket.capacity
+        ]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
+
+    async def _sleep(self, delay):
+        """Ждет delay секунд или появления нового запроса."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def _release(self, request):
+        """Разрешает отправку запроса, забирая токены."""
+        self._global_bucket.consume()
+        self._chat_bucket(request.chat_id, asyncio.get_running_loop().time()).consume()
+        if request.merge_key is not None and self._pending_edits.get(request.merge_key) is request:
+            del self._pending_edits[request.merge_key]
+        request.active = False
+        if not request.released.done():
+            request.released.set_result(request)
+
+    def _enqueue(self, chat_id, priority, merge_key, result):
+        """Ставит запрос в очередь; более ранняя правка того же сообщения заменяется новой."""
+        request = _Request(priority, next(self._seq), chat_id, merge_key, result)
+
+        if merge_key is not None:
+            previous = self._pending_edits.get(merge_key)
+            if previous is not None and previous.active:
+                # Старая правка так и не ушла: ее отправитель получит ответ на новую
+                previous.active = False
+                self._queue.remove(previous)
+                previous.released.set_result(request)
+                self.merged += 1
+            self._pending_edits[merge_key] = request
+
+        self._queue.append(request)
+        self._wakeup.set()
+        return request
+
+    def _discard(self, request):
+        """Убирает из очереди запрос, отправитель которого перестал ждать."""
+        if request.active:
+            request.active = False
+            self._queue.remove(request)
+            if request.merge_key is not None and self._pending_edits.get(request.merge_key) is request:
+                del self._pending_edits[request.merge_key]
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        """Отправляет запрос, соблюдая лимиты, приоритет и RetryAfter."""
+        chat_id = data.get('chat_id')
+        if chat_id is None or self._pump_task is None:
+            # Ответы на нажатия и служебные запросы не ограничиваются
+            return await callback(*args, **kwargs)
+
+        priority = message_priority.get()
+        if isinstance(rate_limit_args, dict):
+            priority = rate_limit_args.get('priority', priority)
+        merge_key = None
+        if endpoint in MERGEABLE_ENDPOINTS and data.get('message_id') is not None:
+            merge_key = (endpoint, chat_id, data['message_id'])
+
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        attempt = 0
+        # Более новая правка, ответ которой получит вызывающий вместо отправки своей
+        replaced_by = None
+        while True:
+            if replaced_by is None:
+                request = self._enqueue(chat_id, priority, merge_key, result)
+                try:
+                    released = await request.released
+                except asyncio.CancelledError:
+                    self._discard(request)
+                    result.cancel()
+                    raise
+            else:
+                released, replaced_by = replaced_by, None
+
+            if released is not request:
+                # Правку заменила более новая - возвращаем ее результат
+                try:
+                    value = await asyncio.shield(released.result)
+                except asyncio.CancelledError:
+                    if not released.result.cancelled():
+                        # Отменили самого вызывающего: ждущие его правки получат ответ новой
+                        self._chain(result, released.result)
+                        raise
+                    # Новую правку отменили - отправляем свою, если ее не заменила еще более новая
+                    replaced_by = self._newer_edit(merge_key)
+                    continue
+                except Exception as e:
+                    self._fail(result, e)
+                    raise
+                result.set_result(value)
+                return value
+
+            try:
+                value = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                delay = e.retry_after
+                if isinstance(delay, timedelta):
+                    delay = delay.total_seconds()
+                self.retries += 1
+                # Пауза действует и на остальные чаты: лимит мог быть превышен общим числом запросов
+                until = loop.time() + delay
+                self._global_bucket.block(until)
+                self._chat_bucket(chat_id, loop.time()).block(until)
+                logger.warning(f"Превышен лимит Telegram для чата {chat_id}, повтор через {delay} с")
+                if attempt == self.max_retries:
+                    self._fail(result, e)
+                    raise
+                attempt += 1
+                # Повторная попытка встает в очередь как новый запрос, если правку не заменила более новая
+                replaced_by = self._newer_edit(merge_key)
+                continue
+            except asyncio.CancelledError:
+                result.cancel()
+                raise
+            except Exception as e:
+                self._fail(result, e)
+                raise
+
+            self.sent += 1
+            result.set_result(value)
+            return value
+
+    def _newer_edit(self, merge_key):
+        """Возвращает ожидающую отправки правку того же сообщения, поставленную позже (None - такой нет)."""
+        newer = self._pending_edits.get(merge_key) if merge_key is not None else None
+        if newer is None or not newer.active:
+            return None
+        self.merged += 1
+        return newer
+
+    @classmethod
+    def _chain(cls, result, source):
+        """Передает ожидающим result исход запроса source, когда он станет известен."""
+        def copy(future):
+            if result.done():
+                return
+            if future.cancelled():
+                result.cancel()
+            elif future.exception() is not None:
+                cls._fail(result, future.exception())
+            else:
+                result.set_result(future.result())
+        source.add_done_callback(copy)
+
+    @staticmethod
+    def _fail(result, error):
+        """Передает ошибку ожидающим замененным правкам."""
+        result.set_exception(error)
+        # Исключение уже получил вызывающий, не считаем его потерянным
+        result.exception()
+
+    def stats(self):
+        """Возвращает метрики очереди: отправлено, слито правок, повторов, ожидает и корзин чатов."""
+        return {
+            'sent': self.sent,
+            'merged': self.merged,
+            'retries': self.retries,
+            'queued': len(self._queue),
+            'chat_buckets': len(self._chat_buckets)
+        }
@@ -0,0 +1,90 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений, при которой обновления одного чата идут строго по очереди.
+
+    Обработчики разных чатов выполняются одновременно (не больше max_concurrent_updates),
+    а обновления одного чата ждут завершения предыдущего - так состояние диалога
+    ConversationHandler не ломается от перестановки сообщений.
+    """
+
+    def __init__(self, max_concurrent_updates, max_pending_updates=None):
+        """
+        Инициализация обработчика.
+
+        max_concurrent_updates - сколько обработчиков может выполняться одновременно;
+        max_pending_updates - сколько обновлений может быть принято в работу, включая ожидающие
+        своей очереди в чате (по умолчанию в 16 раз больше max_concurrent_updates).
+        """
+        # Ожидающие своей очереди в чате обновления не занимают места выполняющихся обработчиков,
+        # поэтому общий лимит PTB ограничивает принятые обновления, а свой - выполняющиеся
+        super().__init__(max_pending_updates or max_concurrent_updates * 16)
+        self.max_running_updates = max_concurrent_updates
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self.running = 0
+        # Блокировка и число ожидающих обновлений для каждого чата
+        self._chats = {}
+
+    @staticmethod
+    def chat_key(update):
+        """Возвращает ключ чата, в пределах которого сохраняется порядок (None - без порядка)."""
+        if isinstance(update, Update):
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+            if update.effective_user is not None:
+                return ('user', update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        """Дожидается очереди чата и свободного места, затем выполняет обработчик."""
+        key = self.chat_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        # Задачи PTB запускаются в порядке поступления обновлений, а asyncio.Lock
+        # пропускает ожидающих в порядке очереди, поэтому порядок внутри чата сохраняется
+        await self.run_in_chat(key, self._run(coroutine))
+
+    async def run_in_chat(self, key, coroutine):
+        """Выполняет coroutine в очереди чата key - после уже принятых обновлений этого чата.
+
+        Так бот может сам изменить диалог (вытеснить брошенный, начать рассылкой), не пересекаясь
+        с обработкой сообщения того же чата. Место среди выполняющихся обработчиков не занимается.
+        """
+        entry = self._chats.get(key)
+        if entry is None:
+            entry = self._chats[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[key]
+
+    async def _run(self, coroutine):
+        """Выполняет обработчик, заняв одно из max_concurrent_updates мест."""
+        async with self._running:
+            self.running += 1
+            try:
+                await coroutine
+            finally:
+                self.running -= 1
+
+    def stats(self):
+        """Возвращает число активных чатов и выполняющихся обработчиков."""
+        return {
+            'chats': len(self._chats),
+            'running': self.running,
+            'accepted': self.current_concurrent_updates
+        }
+
+    async def initialize(self):
+        """Ресурсы не требуются."""
+
+    async def shutdown(self):
+        """Ресурсы не требуются."""
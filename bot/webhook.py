@@ -0,0 +1,120 @@
+import asyncio
+import hmac
+import json
+from telegram import Update
+from bot.config import logger
+
+class WebhookServer:
+    """Встроенный HTTP-сервер для приема обновлений Telegram по вебхуку."""
+
+    # Заголовок, в котором Telegram передает секрет, указанный при установке вебхука
+    SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+    # Ограничение размера тела запроса с обновлением
+    MAX_BODY_SIZE = 1024 * 1024
+    READ_TIMEOUT = 10
+
+    STATUS_TEXT = {
+        200: 'OK',
+        400: 'Bad Request',
+        403: 'Forbidden',
+        404: 'Not Found',
+        405: 'Method Not Allowed',
+        408: 'Request Timeout',
+        413: 'Payload Too Large'
+    }
+
+    def __init__(self, application, host, port, path, secret_token=None):
+        """
+        Инициализация сервера.
+
+        application - приложение PTB, в очередь которого передаются обновления;
+        path - путь, на который Telegram отправляет обновления;
+        secret_token - секрет вебхука (запросы без него отклоняются).
+        """
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self._server = None
+
+        # Метрики приема обновлений
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self):
+        """Начинает принимать соединения."""
+        if not self.secret_token:
+            logger.warning("Секрет вебхука не задан: обновления принимаются без проверки отправителя")
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Вебхук слушает http://{self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """Прекращает прием соединений."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        """Читает один HTTP-запрос, обрабатывает его и закрывает соединение."""
+        try:
+            status, body = await asyncio.wait_for(self._read_request(reader), self.READ_TIMEOUT)
+        except asyncio.TimeoutError:
+            status, body = 408, b''
+        except Exception as e:
+            logger.error(f"Ошибка при обработке запроса вебхука: {e}")
+            status, body = 400, b''
+
+        if status != 200:
+            self.rejected += 1
+        try:
+            writer.write(
+                f"HTTP/1.1 {status} {self.STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: text/plain; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Разбирает запрос и возвращает код ответа и тело ответа."""
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            return 400, b''
+        method, target, _ = request_line
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if target.split('?', 1)[0] != self.path:
+            return 404, b''
+        if method != 'POST':
+            return 405, b''
+        if self.secret_token and not hmac.compare_digest(
+                headers.get(self.SECRET_HEADER, '').encode(), self.secret_token.encode()):
+            logger.warning("Запрос вебхука отклонен: неверный секрет")
+            return 403, b''
+
+        length = int(headers.get('content-length', 0))
+        if length > self.MAX_BODY_SIZE:
+            return 413, b''
+        body = await reader.readexactly(length)
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error(f"Некорректное обновление в запросе вебхука: {e}")
+            return 400, b''
+
+        # Обновление обрабатывается приложением так же, как полученное опросом
+        await self.application.update_queue.put(update)
+        self.received += 1
+        return 200, b''
@@ -0,0 +1,14 @@
+import pytest
+
+from bot.database.storage import DataStorage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Пустое хранилище кандидатов в отдельном каталоге: файлы хранилища создаются в текущем каталоге."""
+    monkeypatch.chdir(tmp_path)
+    DataStorage._cache.invalidate()
+    DataStorage.clear_candidates()
+    yield DataStorage
+    DataStorage.flush()
+    DataStorage._cache.invalidate()
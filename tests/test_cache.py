@@ -0,0 +1,102 @@
+"""Проверка кэша кандидатов: перечитывание по отпечатку файлов (inode, время изменения, размер)."""
+import json
+import os
+
+from bot.database.cache import CandidateCache
+
+
+class Loader:
+    """Загрузчик, который читает файл и считает обращения к диску."""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        with open(self.path, encoding='utf-8') as file:
+            return json.load(file)
+
+
+def write(path, candidates, mtime_ns=None):
+    """Записывает список кандидатов и при необходимости выставляет время изменения."""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(candidates, file)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_files_are_served_from_cache(tmp_path):
+    """Пока файлы не менялись, список берется из памяти."""
+    path = str(tmp_path / "candidates.json")
+    write(path, [{'id': 1, 'status': 'new'}])
+    cache, loader = CandidateCache(path), Loader(path)
+
+    for _ in range(3):
+        assert cache.get(loader) == [{'id': 1, 'status': 'new'}]
+    assert loader.calls == 1
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+    assert cache.position(1) == 0
+
+
+def test_each_signature_component_triggers_reload(tmp_path):
+    """Изменение размера, времени изменения или inode файла приводит к перечитыванию."""
+    path = str(tmp_path / "candidates.json")
+    write(path, [{'id': 1, 'status': 'new'}], mtime_ns=1_000_000_000)
+    cache, loader = CandidateCache(path), Loader(path)
+    cache.get(loader)
+
+    # Другой размер при том же времени изменения
+    write(path, [{'id': 1, 'status': 'hired'}], mtime_ns=1_000_000_000)
+    assert cache.get(loader)[0]['status'] == 'hired'
+
+    # Тот же размер, другое время изменения
+    write(path, [{'id': 1, 'status': 'fired'}], mtime_ns=2_000_000_000)
+    assert cache.get(loader)[0]['status'] == 'fired'
+
+    # Тот же размер и время изменения, но файл подменен атомарной записью (новый inode)
+    replacement = str(tmp_path / "candidates.json.tmp")
+    write(replacement, [{'id': 1, 'status': 'spent'}], mtime_ns=2_000_000_000)
+    os.replace(replacement, path)
+    assert cache.get(loader)[0]['status'] == 'spent'
+
+    # Появление файла, которого не было, тоже меняет отпечаток
+    journal = str(tmp_path / "candidates.journal")
+    cache = CandidateCache(path, journal)
+    cache.get(loader)
+    write(journal, [])
+    cache.get(loader)
+    assert loader.calls == 6
+
+
+def test_loader_rewriting_files_does_not_cause_reload(tmp_path):
+    """Если loader сам переписал файл, следующее обращение не перечитывает его повторно."""
+    path = str(tmp_path / "candidates.json")
+    write(path, [{'status': 'new'}])
+    cache = CandidateCache(path)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        write(path, [{'id': 1, 'status': 'new'}])
+        return [{'id': 1, 'status': 'new'}]
+
+    cache.get(loader)
+    cache.get(loader)
+    assert len(calls) == 1
+
+
+def test_pinned_and_invalidated_cache(tmp_path):
+    """Закрепленный кэш не сверяется с диском, сброшенный перечитывается."""
+    path = str(tmp_path / "candidates.json")
+    write(path, [{'id': 1, 'status': 'new'}])
+    cache, loader = CandidateCache(path), Loader(path)
+    cache.get(loader)
+    cache.append({'id': 2, 'status': 'new'})
+    cache.pinned = True
+
+    write(path, [])
+    assert len(cache.get(loader)) == 2 and loader.calls == 1
+
+    cache.invalidate()
+    assert cache.get(loader) == [] and loader.calls == 2
@@ -0,0 +1,45 @@
+"""Проверка уникальности ID кандидатов при одновременном добавлении."""
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.database import storage as storage_module
+from bot.database.async_storage import AsyncDataStorage
+
+COUNT = 50
+
+
+def colliding_token_hex(monkeypatch):
+    """Генератор ID, который выдает каждое значение дважды подряд: совпадения гарантированы."""
+    values = itertools.chain.from_iterable((f"{i:08x}", f"{i:08x}") for i in itertools.count())
+    monkeypatch.setattr(storage_module.secrets, 'token_hex', lambda nbytes: next(values))
+
+
+def assert_unique_ids(storage):
+    """Все кандидаты добавлены, их ID уникальны и сохранились на диске."""
+    ids = [c['id'] for c in storage.get_candidates()]
+    assert len(ids) == COUNT and len(set(ids)) == COUNT
+    storage.flush()
+    storage._cache.invalidate()
+    assert sorted(c['id'] for c in storage.get_candidates()) == sorted(ids)
+
+
+def test_concurrent_add_from_threads(storage, monkeypatch):
+    """Кандидаты, добавленные из нескольких потоков, получают разные ID."""
+    colliding_token_hex(monkeypatch)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: storage.add_candidate({'name': f"Кандидат {i}", 'status': 'new'}), range(COUNT)))
+    assert_unique_ids(storage)
+
+
+def test_concurrent_add_through_async_storage(storage, monkeypatch):
+    """Одновременные вызовы AsyncDataStorage.add_candidate не выдают одинаковых ID."""
+    colliding_token_hex(monkeypatch)
+
+    async def main():
+        return await asyncio.gather(*(
+            AsyncDataStorage.add_candidate({'name': f"Кандидат {i}", 'status': 'new'}) for i in range(COUNT)
+        ))
+
+    assert all(asyncio.run(main()))
+    assert_unique_ids(storage)
@@ -0,0 +1,63 @@
+"""Проверка страниц списка кандидатов с фильтрами по статусу и вакансии."""
+import random
+
+import pytest
+
+from bot.config import STORAGE_BACKEND
+
+STATUSES = ("Новый", "HR интервью", "Отказ")
+VACANCIES = ("Оператор линии", "Наладчик", "Кладовщик")
+
+
+def expected_page(candidates, cursor, limit, status, vacancy):
+    """Страница, найденная полным проходом по списку."""
+    matching = [
+        position for position, candidate in enumerate(candidates)
+        if (status is None or candidate['status'] == status) and (vacancy is None or candidate['vacancy'] == vacancy)
+    ]
+    after = [position for position in matching if position >= cursor]
+    before = [position for position in matching if position < cursor]
+    return {
+        'items': [candidates[position]['name'] for position in after[:limit]],
+        'next_cursor': after[limit] if len(after) > limit else None,
+        'prev_cursor': before[-limit:][0] if before else None,
+    }
+
+
+@pytest.mark.skipif(STORAGE_BACKEND == 'sqlite', reason="курсор SQLite - id записи, а не позиция в списке")
+def test_filtered_pages_match_full_scan(storage):
+    """Страницы из индекса совпадают с полным проходом, в том числе после смены статусов."""
+    rng = random.Random(1)
+    for i in range(300):
+        storage.add_candidate({'name': f"Кандидат {i}", 'status': rng.choice(STATUSES),
+                               'vacancy': rng.choice(VACANCIES), 'date': "2026-10-01"})
+    # Смена статуса переносит кандидата между списками позиций
+    for candidate in rng.sample(storage.get_candidates(), 60):
+        storage.update_candidate_fields(candidate['id'], {'status': rng.choice(STATUSES)})
+
+    candidates = storage.get_candidates()
+    for status in (None,) + STATUSES:
+        for vacancy in (None,) + VACANCIES:
+            for cursor in (0, 1, 57, 150, 299, 400):
+                page = storage.get_candidates_page(cursor, 10, status, vacancy)
+                expected = expected_page(candidates, cursor, 10, status, vacancy)
+                assert [candidate['name'] for candidate in page['items']] == expected['items']
+                assert page['next_cursor'] == expected['next_cursor']
+                assert page['prev_cursor'] == expected['prev_cursor']
+
+
+def test_walk_sparse_filter(storage):
+    """Переход по страницам редкого статуса проходит все подходящие записи ровно один раз."""
+    for i in range(500):
+        storage.add_candidate({'name': f"Кандидат {i}", 'status': "Отказ" if i % 50 == 0 else "Новый",
+                               'vacancy': "Наладчик"})
+    names = []
+    cursor = 0
+    while cursor is not None:
+        page = storage.get_candidates_page(cursor, 3, "Отказ")
+        names += [candidate['name'] for candidate in page['items']]
+        cursor = page['next_cursor']
+    assert names == [f"Кандидат {i}" for i in range(0, 500, 50)]
+    if STORAGE_BACKEND != 'sqlite':
+        # Индекс кэша хранит только позиции подходящих кандидатов
+        assert len(storage._cache.filters.positions("Отказ")) == 10
@@ -0,0 +1,70 @@
+"""Проверка кнопок этапов диалога: разбор через общий маршрутизатор и учет устаревших нажатий."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ConversationHandler
+
+from bot.config import INTRO, RESEARCH, PRESENTATION
+from bot.handlers.callbacks import router, DIALOG_INTRO, DIALOG_BACK, DIALOG_PRESENTATION
+from bot.handlers.dialog_handlers import DialogHandlers
+
+
+class FakeQuery:
+    """Нажатие на кнопку: запоминает ответ и отредактированный текст сообщения."""
+
+    def __init__(self, data):
+        self.data = data
+        self.answered = False
+        self.texts = []
+
+    async def answer(self):
+        self.answered = True
+
+    async def edit_message_text(self, text, reply_markup=None):
+        self.texts.append(text)
+
+
+def press(handler, data):
+    """Вызывает обработчик этапа диалога с нажатием на кнопку и возвращает новый этап и нажатие."""
+    query = FakeQuery(data)
+    update = SimpleNamespace(callback_query=query, effective_chat=None, effective_user=None, message=None)
+    context = SimpleNamespace(user_data={'vacancy_id': 1, 'candidate_name': "Иван"})
+    return asyncio.run(handler(update, context)), query
+
+
+@pytest.fixture
+def counters(tmp_path, monkeypatch):
+    """Изменение счетчиков маршрутизатора за время теста; файлы воронки создаются во временном каталоге."""
+    monkeypatch.chdir(tmp_path)
+    before = dict(router.metrics)
+    return lambda: {key: count - before.get(key, 0) for key, count in router.metrics.items()
+                    if count != before.get(key, 0)}
+
+
+def test_dialog_buttons_are_decoded_and_counted(counters):
+    """Ответы на этапах диалога разбираются кодеком и учитываются по префиксу кнопки."""
+    state, query = press(DialogHandlers.handle_intro_response, DIALOG_INTRO.encode("yes"))
+    assert state == RESEARCH and query.answered
+
+    state, _ = press(DialogHandlers.handle_intro_response, DIALOG_INTRO.encode("no"))
+    assert state == INTRO
+
+    state, _ = press(DialogHandlers.handle_back_button, DIALOG_BACK.encode("research"))
+    assert state == PRESENTATION
+
+    assert counters() == {DIALOG_INTRO.prefix: 2, DIALOG_BACK.prefix: 1}
+
+
+@pytest.mark.parametrize('handler, data', [
+    (DialogHandlers.handle_intro_response, DIALOG_INTRO.encode("maybe")),
+    (DialogHandlers.handle_intro_response, DIALOG_INTRO.prefix),
+    (DialogHandlers.handle_back_button, DIALOG_BACK.encode("vacancy")),
+    (DialogHandlers.handle_presentation_response, f"{DIALOG_PRESENTATION.encode('yes')}:extra"),
+])
+def test_stale_dialog_buttons(counters, handler, data):
+    """Кнопка другого формата или с неизвестным ответом учитывается как устаревшая и завершает диалог."""
+    state, query = press(handler, data)
+    assert state == ConversationHandler.END
+    assert query.answered and "устарела" in query.texts[-1]
+    assert counters() == {'stale': 1}
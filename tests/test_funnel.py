@@ -0,0 +1,204 @@
+"""Проверка воронки диалогов: суточные итоги и время на этапах по ID вакансий, точность наброска перцентилей."""
+import random
+import sqlite3
+from datetime import date
+from types import SimpleNamespace
+
+from bot.config import INTRO, RESEARCH, PRESENTATION, DEFAULT_VACANCIES
+from bot.database.funnel import FunnelStore
+from bot.database.vacancies import VacancyCatalog
+from bot.utils.analytics import AnalyticsHelper
+from bot.utils.funnel import DialogFunnel, QuantileSketch
+
+TODAY = date(2024, 3, 20)
+
+
+def make_funnel(tmp_path, **store_options):
+    """Воронка с базой итогов во временном каталоге, записывающая каждое изменение сразу."""
+    return DialogFunnel(FunnelStore(str(tmp_path / "funnel.db"), **store_options), max_delay=0)
+
+
+def walk(funnel, day, vacancy_id, stages, title="Вакансия"):
+    """Проводит кандидата по этапам диалога, начатого в указанный день."""
+    context = SimpleNamespace(user_data={
+        'dialog_start_time': f"{day}T10:00:00", 'dialog_vacancy': title, 'vacancy_id': vacancy_id
+    })
+    for stage in stages:
+        funnel.reach(context, stage)
+    return context
+
+
+def test_daily_rollup_by_vacancy_and_period(tmp_path):
+    """Итоги копятся по дню и ID вакансии, отчет группирует их по неделям и месяцам."""
+    funnel = make_funnel(tmp_path)
+    walk(funnel, "2024-02-28", 1, [INTRO, RESEARCH])
+    walk(funnel, "2024-03-18", 1, [INTRO, RESEARCH, PRESENTATION])
+    walk(funnel, "2024-03-18", 2, [INTRO])
+    walk(funnel, "2024-03-20", 2, [INTRO, RESEARCH])
+
+    report = funnel.report(days=30, period='day', today=TODAY)
+    assert report['rows'] == 4
+    assert report['total'] == [4, 3, 1, 0, 0]
+    assert report['by_vacancy'] == {1: [2, 2, 1, 0, 0], 2: [2, 1, 0, 0, 0]}
+    assert list(report['by_period']) == ["2024-02-28", "2024-03-18", "2024-03-20"]
+
+    weekly = funnel.report(days=30, period='week', today=TODAY)
+    assert weekly['by_period'] == {"2024-02-26": [1, 1, 0, 0, 0], "2024-03-18": [3, 2, 1, 0, 0]}
+    monthly = funnel.report(days=30, period='month', today=TODAY)
+    assert monthly['by_period'] == {"2024-02": [1, 1, 0, 0, 0], "2024-03": [3, 2, 1, 0, 0]}
+
+    # Отбор по вакансии и по периоду читает только нужные строки
+    assert funnel.report(days=30, vacancy_id=2, today=TODAY)['rows'] == 2
+    assert funnel.report(days=3, today=TODAY)['total'] == [3, 2, 1, 0, 0]
+
+
+def test_renamed_vacancy_keeps_one_history(tmp_path):
+    """Диалоги до и после переименования вакансии попадают в одни и те же итоги."""
+    funnel = make_funnel(tmp_path)
+    walk(funnel, "2024-03-20", 1, [INTRO], title="Оператор")
+    walk(funnel, "2024-03-20", 1, [INTRO, RESEARCH], title="Оператор линии")
+
+    report = funnel.report(days=1, today=TODAY)
+    assert report['rows'] == 1
+    assert report['by_vacancy'] == {1: [2, 1, 0, 0, 0]}
+
+
+def test_repeated_stage_and_unknown_vacancy(tmp_path):
+    """Повторный показ этапа не учитывается, диалог без вакансии учитывается под отдельным ID."""
+    funnel = make_funnel(tmp_path)
+    context = walk(funnel, "2024-03-20", None, [INTRO, RESEARCH])
+    assert not funnel.reach(context, INTRO)
+
+    report = funnel.report(days=1, today=TODAY)
+    assert report['by_vacancy'] == {DialogFunnel.UNKNOWN_VACANCY_ID: [1, 1, 0, 0, 0]}
+
+
+def test_title_keyed_database_is_migrated(tmp_path):
+    """База, в которой итоги записаны по названиям вакансий, переводится на ID при открытии."""
+    path = str(tmp_path / "funnel.db")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE funnel_daily (
+            day TEXT NOT NULL, vacancy TEXT NOT NULL,
+            intro INTEGER NOT NULL DEFAULT 0, research INTEGER NOT NULL DEFAULT 0,
+            presentation INTEGER NOT NULL DEFAULT 0, invitation INTEGER NOT NULL DEFAULT 0,
+            confirmation INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, vacancy)
+        );
+        INSERT INTO funnel_daily VALUES ('2024-03-20', 'Оператор', 3, 2, 1, 0, 0);
+        INSERT INTO funnel_daily VALUES ('2024-03-20', 'Оператор линии', 1, 1, 1, 1, 1);
+        INSERT INTO funnel_daily VALUES ('2024-03-20', 'Архивная', 5, 0, 0, 0, 0);
+        CREATE TABLE stage_timing (
+            vacancy TEXT NOT NULL, stage INTEGER NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL,
+            PRIMARY KEY (vacancy, stage, bucket)
+        );
+        INSERT INTO stage_timing VALUES ('Оператор', 0, 120, 2);
+        INSERT INTO stage_timing VALUES ('Оператор линии', 0, 120, 3);
+    """)
+    connection.close()
+
+    titles = {"Оператор": 1, "Оператор линии": 1}
+    funnel = make_funnel(tmp_path, resolve_title=titles.get)
+    report = funnel.report(days=1, today=TODAY)
+
+    assert report['rows'] == 2
+    assert report['by_vacancy'][1] == [4, 3, 2, 1, 1]
+    # Вакансия, которой уже нет в каталоге, получает ID из названия, как вакансия без поля id
+    assert report['by_vacancy'][VacancyCatalog.vacancy_id({'title': "Архивная"})] == [5, 0, 0, 0, 0]
+
+    assert funnel.store.query_timings() == [(1, 0, 120, 5)]
+
+    walk(funnel, "2024-03-20", 1, [INTRO])
+    assert funnel.report(days=1, today=TODAY)['by_vacancy'][1][0] == 5
+
+
+def test_vacancy_titles_in_report(storage):
+    """Название вакансии подставляется при показе: из каталога или пометкой для удаленной."""
+    vacancy = DEFAULT_VACANCIES[0]
+    assert AnalyticsHelper.vacancy_title(vacancy['id']) == vacancy['title']
+    assert AnalyticsHelper.vacancy_title(DialogFunnel.UNKNOWN_VACANCY_ID) == "Неизвестная вакансия"
+    assert "удалена" in AnalyticsHelper.vacancy_title(987654)
+
+
+def exact_quantile(values, q):
+    """Точный перцентиль с тем же рангом, что и у наброска."""
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+def test_sketch_relative_accuracy():
+    """Оценка перцентиля отличается от точной не больше чем на заданную относительную погрешность."""
+    rng = random.Random(7)
+    # Время ответа от долей секунды до нескольких суток
+    values = [rng.lognormvariate(4, 2) + QuantileSketch.MIN_VALUE for _ in range(20000)]
+    for accuracy in (0.01, 0.05):
+        sketch = QuantileSketch(accuracy)
+        for value in values:
+            sketch.add(value)
+        assert sketch.count == len(values)
+        for q in (0, 0.25, 0.5, 0.9, 0.99, 1):
+            exact = exact_quantile(values, q)
+            assert abs(sketch.quantile(q) - exact) <= accuracy * exact * (1 + 1e-9)
+
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_sketch_buckets_merge():
+    """Набросок, собранный из корзин двух частей, совпадает с наброском всех значений."""
+    rng = random.Random(11)
+    values = [rng.expovariate(1 / 30) + 1 for _ in range(5000)]
+    whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (first if i % 3 else second).add(value)
+
+    merged = QuantileSketch()
+    for part in (first, second):
+        for bucket, count in part.counts.items():
+            merged.add_bucket(bucket, count)
+    assert merged.counts == whole.counts and merged.count == whole.count
+    assert merged.quantile(0.9) == whole.quantile(0.9)
+
+
+def timed_walk(funnel, vacancy_id, durations):
+    """Проводит кандидата по этапам, проводя на каждом заданное число секунд, и завершает диалог."""
+    context = SimpleNamespace(user_data={
+        'dialog_start_time': "2024-03-20T10:00:00", 'vacancy_id': vacancy_id, 'now': 0.0
+    })
+    funnel.reach(context, DialogFunnel.STAGES[0])
+    for stage, duration in zip(DialogFunnel.STAGES[1:], durations):
+        context.user_data['now'] += duration
+        funnel.reach(context, stage)
+    context.user_data['now'] += durations[-1]
+    funnel.leave(context)
+
+
+def test_stage_timing_merges_after_restart(tmp_path, monkeypatch):
+    """Корзины времени на этапах, записанные до и после перезапуска, складываются в один набросок по ID вакансии."""
+    monkeypatch.setattr(DialogFunnel, '_offset', staticmethod(lambda context: context.user_data['now']))
+    rng = random.Random(3)
+    intro_times = {1: [], 2: []}
+
+    for restart in range(2):
+        funnel = make_funnel(tmp_path)
+        for _ in range(200):
+            vacancy_id = rng.choice((1, 2))
+            durations = [round(rng.uniform(1, 600), 1), 5.0]
+            intro_times[vacancy_id].append(durations[0])
+            timed_walk(funnel, vacancy_id, durations)
+        funnel.flush()
+        funnel.store.close()
+
+    report = make_funnel(tmp_path).timing_report()
+    for vacancy_id, values in intro_times.items():
+        sketch = report['by_vacancy'][vacancy_id][INTRO]
+        expected = QuantileSketch(DialogFunnel.TIMING_ACCURACY)
+        for value in values:
+            expected.add(value)
+        assert sketch.counts == expected.counts
+        assert abs(sketch.quantile(0.5) / exact_quantile(values, 0.5) - 1) <= DialogFunnel.TIMING_ACCURACY
+    # Знакомство у всех 400 кандидатов длится 5 секунд
+    assert report['total'][RESEARCH].count == 400
+    assert abs(report['total'][RESEARCH].quantile(0.99) - 5.0) <= 5.0 * DialogFunnel.TIMING_ACCURACY
+
+    only_first = make_funnel(tmp_path).timing_report(vacancy_id=1)
+    assert set(only_first['by_vacancy']) == {1}
+    assert only_first['total'][INTRO].count == len(intro_times[1])
@@ -0,0 +1,124 @@
+"""Проверка журнала кандидатов: повтор после сбоя и восстановление прерванного сворачивания."""
+import json
+import os
+
+import pytest
+
+from bot.database import journal as journal_module
+from bot.database.journal import CandidateJournal
+
+
+def make_journal(tmp_path, threshold=1000):
+    """Журнал с файлами во временном каталоге."""
+    return CandidateJournal(str(tmp_path / "candidates.json"), str(tmp_path / "candidates.journal"), threshold)
+
+
+def candidate(candidate_id, status="new"):
+    """Минимальная запись кандидата."""
+    return {'id': candidate_id, 'name': f"Кандидат {candidate_id}", 'status': status}
+
+
+def test_truncated_last_line_is_skipped_and_overwritten(tmp_path):
+    """Недописанная последняя строка пропускается при повторе и не портит следующую запись."""
+    journal = make_journal(tmp_path)
+    journal.append('add', data=candidate(1))
+    journal.append('add', data=candidate(2))
+    with open(journal.journal_file, 'a', encoding='utf-8') as file:
+        file.write(json.dumps({'op': 'add', 'data': candidate(3)})[:20])
+
+    restarted = make_journal(tmp_path)
+    assert [c['id'] for c in restarted.load()] == [1, 2]
+
+    restarted.append('update', id=2, data=candidate(2, status="interview"))
+    restarted.append('add', data=candidate(4))
+    candidates = make_journal(tmp_path).load()
+    assert [c['id'] for c in candidates] == [1, 2, 4]
+    assert candidates[1]['status'] == "interview"
+
+
+def interrupt_compaction(monkeypatch, journal, candidates):
+    """Выполняет сворачивание, прерванное на подмене снимка."""
+    def crash(*args):
+        raise OSError("сбой при подмене снимка")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(journal_module.os, 'replace', crash)
+        with pytest.raises(OSError):
+            journal.compact(candidates)
+
+
+def test_interrupted_compaction_resumes(tmp_path, monkeypatch):
+    """Сворачивание, прерванное после отметки в журнале, завершается при следующей загрузке."""
+    journal = make_journal(tmp_path)
+    journal.append('add', data=candidate(1))
+    journal.compact(journal.load())
+    journal.append('add', data=candidate(2))
+    journal.append('update', id=1, data=candidate(1, status="hired"))
+
+    interrupt_compaction(monkeypatch, journal, journal.load())
+    # На диске остались старый снимок, полный временный снимок и журнал с отметкой
+    assert os.path.exists(journal.snapshot_file) and os.path.exists(journal.tmp_snapshot_file)
+
+    restarted = make_journal(tmp_path)
+    candidates = restarted.load()
+    assert [c['id'] for c in candidates] == [1, 2]
+    assert candidates[0]['status'] == "hired"
+    assert not os.path.exists(restarted.tmp_snapshot_file)
+    assert restarted.entries == 0
+
+    # Повторная загрузка не применяет записи до отметки второй раз
+    assert [c['id'] for c in make_journal(tmp_path).load()] == [1, 2]
+
+
+def test_incomplete_snapshot_is_discarded(tmp_path):
+    """Временный снимок без отметки в журнале отбрасывается, данные берутся из старого снимка и журнала."""
+    journal = make_journal(tmp_path)
+    journal.append('add', data=candidate(1))
+    with open(journal.tmp_snapshot_file, 'w', encoding='utf-8') as file:
+        file.write('[{"id": 1')
+
+    restarted = make_journal(tmp_path)
+    assert [c['id'] for c in restarted.load()] == [1]
+    assert not os.path.exists(restarted.tmp_snapshot_file)
+
+
+def test_appends_after_checkpoint_survive_compaction(tmp_path, monkeypatch):
+    """Записи, дописанные после отметки прерванного сворачивания, не теряются."""
+    journal = make_journal(tmp_path)
+    journal.append('add', data=candidate(1))
+    interrupt_compaction(monkeypatch, journal, journal.load())
+
+    # Запись после отметки: например, от процесса, который еще не перечитывал журнал
+    with open(journal.journal_file, 'a', encoding='utf-8') as file:
+        file.write(json.dumps({'op': 'add', 'data': candidate(2)}) + "\n")
+
+    restarted = make_journal(tmp_path)
+    assert [c['id'] for c in restarted.load()] == [1, 2]
+    restarted.append('add', data=candidate(3))
+    restarted.compact(restarted.load())
+    assert [c['id'] for c in make_journal(tmp_path).load()] == [1, 2, 3]
+
+
+def test_compaction_by_threshold(tmp_path):
+    """Достигнув порога, журнал сворачивается в снимок без потери записей."""
+    journal = make_journal(tmp_path, threshold=3)
+    for candidate_id in range(1, 6):
+        journal.append('add', data=candidate(candidate_id))
+
+    assert journal.entries == 2
+    with open(journal.snapshot_file, encoding='utf-8') as file:
+        assert [c['id'] for c in json.load(file)] == [1, 2, 3]
+    assert [c['id'] for c in make_journal(tmp_path).load()] == [1, 2, 3, 4, 5]
+
+
+def test_complete_last_line_without_newline_is_kept(tmp_path):
+    """Целая последняя запись без перевода строки применяется, следующая запись дописывается отдельной строкой."""
+    journal = make_journal(tmp_path)
+    journal.append('add', data=candidate(1))
+    with open(journal.journal_file, 'a', encoding='utf-8') as file:
+        file.write(json.dumps({'op': 'add', 'data': candidate(2)}))
+
+    restarted = make_journal(tmp_path)
+    assert [c['id'] for c in restarted.load()] == [1, 2]
+    restarted.append('add', data=candidate(3))
+    assert [c['id'] for c in make_journal(tmp_path).load()] == [1, 2, 3]
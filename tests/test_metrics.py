@@ -0,0 +1,51 @@
+"""Проверка выдачи метрик: метки кнопок и экранирование значений меток в формате Prometheus."""
+import asyncio
+import re
+from datetime import datetime
+from telegram import CallbackQuery, Chat, Message, Update, User
+
+from bot.handlers.callbacks import DIALOG_INTRO
+from bot.utils.metrics import Metrics, escape_label
+
+
+def callback_update(data):
+    """Обновление с нажатием кнопки с указанными данными."""
+    user = User(id=1, first_name="Кандидат", is_bot=False)
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=1, type=Chat.PRIVATE), from_user=user)
+    return Update(update_id=1, callback_query=CallbackQuery(id="1", from_user=user, chat_instance="1",
+                                                            message=message, data=data))
+
+
+def label_values(text, name):
+    """Значения метки во всех строках выдачи."""
+    return set(re.findall(rf'{name}="((?:[^"\\]|\\.)*)"', text))
+
+
+def test_callback_prefix_labels():
+    """Известный префикс становится меткой как есть, чужие данные кнопок - одной меткой unknown."""
+    metrics = Metrics(enabled=True)
+
+    async def handler(update, context):
+        return None
+
+    timed = metrics.timed(handler)
+    for data in (DIALOG_INTRO.encode("Да"), 'x"} 1\nfake_metric 9', "evil\\prefix:1", "другая:кнопка"):
+        asyncio.run(timed(callback_update(data), None))
+
+    text = metrics.render()
+    assert label_values(text, 'prefix') == {DIALOG_INTRO.prefix, 'unknown'}
+    assert 'fake_metric' not in text
+    count = re.search(r'hr_bot_handler_seconds_count\{handler="[^"]*",prefix="unknown"\} (\d+)', text)
+    assert count and count.group(1) == '3'
+
+
+def test_label_values_are_escaped():
+    """Обратная косая черта, кавычка и перевод строки в значении метки экранируются."""
+    assert escape_label('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+
+    metrics = Metrics(enabled=True)
+    metrics.observe_storage('get_"odd"\nmethod', 0.01)
+    text = metrics.render()
+    # Каждая строка выдачи - одна метрика, значение метки не обрывается кавычкой
+    assert all(line.startswith(('#', 'hr_bot_')) for line in text.splitlines())
+    assert 'method="get_\\"odd\\"\\nmethod"' in text
@@ -0,0 +1,82 @@
+"""Проверка рассылки: доступ к /outreach и общий для всех кампаний лимит одновременных отправок."""
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+from bot.database.outreach import OutreachStore
+from bot.handlers import command_handlers
+from bot.handlers.command_handlers import CommandHandlers
+from bot.utils.outreach import OutreachManager
+
+
+class FakeMessage:
+    """Сообщение, запоминающее ответы бота."""
+
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def make_update(user_id):
+    """Обновление с командой от пользователя user_id."""
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=FakeMessage())
+
+
+def test_outreach_only_for_admins(monkeypatch):
+    """Команда /outreach отвечает рекрутерам из ADMIN_IDS и отказывает остальным, ничего не создавая."""
+    monkeypatch.setattr(command_handlers, 'ADMIN_IDS', {1})
+    created = []
+
+    async def create_campaign(chat_ids, vacancy_id):
+        created.append(chat_ids)
+        raise AssertionError("рассылка не должна создаваться")
+
+    monkeypatch.setattr(command_handlers.outreach, 'create_campaign', create_campaign)
+    monkeypatch.setattr(command_handlers.outreach, 'get_campaigns', lambda: [])
+    context = SimpleNamespace(args=['new', '1', '100', '200'], bot=SimpleNamespace(username="hr_test_bot"))
+
+    stranger = make_update(2)
+    asyncio.run(CommandHandlers.outreach(stranger, context))
+    assert not created
+    assert stranger.message.replies == ["⛔ Рассылки доступны только рекрутерам."]
+
+    recruiter = make_update(1)
+    asyncio.run(CommandHandlers.outreach(recruiter, SimpleNamespace(args=[], bot=context.bot)))
+    assert recruiter.message.replies[0].startswith("Рассылок еще не было.")
+
+
+def test_concurrency_shared_between_campaigns(tmp_path):
+    """Две одновременные рассылки вместе отправляют не больше concurrency приветствий сразу."""
+    concurrency = 5
+    manager = OutreachManager(OutreachStore(str(tmp_path / "outreach.db")), concurrency=concurrency)
+    running = 0
+    peak = 0
+
+    async def send(campaign, chat_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.005)
+        running -= 1
+        return OutreachStore.SENT, None
+
+    manager._send = send
+
+    def campaign(campaign_id):
+        return {'id': campaign_id, 'status': OutreachStore.RUNNING, 'counts': Counter(), 'errors': Counter()}
+
+    async def run_campaign(campaign_, recipients):
+        # Как _run: не больше concurrency отправителей на кампанию
+        recipients = iter(recipients)
+        await asyncio.gather(*(manager._worker(campaign_, recipients) for _ in range(concurrency)))
+
+    async def main():
+        first, second = campaign(1), campaign(2)
+        await asyncio.gather(run_campaign(first, range(1, 41)), run_campaign(second, range(101, 141)))
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first['counts'][OutreachStore.SENT] == 40 and second['counts'][OutreachStore.SENT] == 40
+    assert peak == concurrency
@@ -0,0 +1,64 @@
+"""Проверка SQLitePersistence: пакетная запись и повтор неудавшейся записи с паузой."""
+import asyncio
+
+from bot.database.persistence import SQLitePersistence
+
+
+def test_changes_written_in_one_batch(tmp_path):
+    """Изменения одного цикла сохранения записываются одной транзакцией и читаются после перезапуска."""
+    async def main():
+        persistence = SQLitePersistence(str(tmp_path / "state.db"))
+        await persistence.update_user_data(1, {'candidate_name': "Анна"})
+        await persistence.update_conversation("hr_dialog", (1, 1), 2)
+        await persistence.update_user_data(2, {'candidate_name': "Иван"})
+        await persistence.drop_user_data(2)
+        await persistence.flush()
+        stats = persistence.stats()
+
+        restored = SQLitePersistence(str(tmp_path / "state.db"))
+        return stats, await restored.get_user_data(), await restored.get_conversations("hr_dialog")
+
+    stats, user_data, conversations = asyncio.run(main())
+    assert stats['batches'] == 1 and stats['pending'] == 0
+    assert user_data == {1: {'candidate_name': "Анна"}}
+    assert conversations == {(1, 1): 2}
+
+
+def test_failed_write_is_kept_and_retried_with_backoff(tmp_path, monkeypatch):
+    """Пока база недоступна, изменения остаются в очереди, а запись повторяется с растущей паузой."""
+    monkeypatch.setattr(SQLitePersistence, 'RETRY_DELAY', 0.05)
+    # Вместо файла базы - каталог: открыть базу не получится, как при ошибке диска
+    persistence = SQLitePersistence(str(tmp_path))
+
+    async def main():
+        await persistence.update_user_data(1, {'candidate_name': "Анна"})
+        # Паузы 0.05 и 0.1 с: за это время две неудачные попытки, а не тысячи
+        await asyncio.sleep(0.12)
+        during = persistence.stats()
+        # Новое изменение той же записи, пришедшее во время паузы, важнее неудавшегося
+        await persistence.update_user_data(1, {'candidate_name': "Анна Петрова"})
+        persistence.filename = str(tmp_path / "state.db")
+        await persistence._flush_task
+        return during, persistence.stats(), await persistence.get_user_data()
+
+    during, stats, user_data = asyncio.run(main())
+    assert during['failures'] == 2 and during['pending'] == 1 and during['batches'] == 0
+    assert stats['failures'] == 2 and stats['pending'] == 0 and stats['batches'] == 1
+    assert user_data == {1: {'candidate_name': "Анна Петрова"}}
+
+
+def test_flush_does_not_wait_for_retry_pause(tmp_path, monkeypatch):
+    """При остановке бота пауза перед повтором не ждется: сразу делается последняя попытка записи."""
+    monkeypatch.setattr(SQLitePersistence, 'RETRY_DELAY', 60)
+    persistence = SQLitePersistence(str(tmp_path))
+
+    async def main():
+        await persistence.update_user_data(1, {'candidate_name': "Анна"})
+        await asyncio.sleep(0.05)
+        persistence.filename = str(tmp_path / "state.db")
+        await asyncio.wait_for(persistence.flush(), 5)
+        return persistence.stats(), await SQLitePersistence(str(tmp_path / "state.db")).get_user_data()
+
+    stats, user_data = asyncio.run(main())
+    assert stats['failures'] == 1 and stats['pending'] == 0 and stats['batches'] == 1
+    assert user_data == {1: {'candidate_name': "Анна"}}
@@ -0,0 +1,244 @@
+"""Проверка очереди исходящих сообщений FloodControlLimiter на поддельном сервере с лимитами Telegram.
+
+Поддельный сервер отвечает RetryAfter, если в чат или всего уходит больше сообщений, чем позволяет
+лимит; очередь настраивается чуть ниже лимитов сервера, поэтому таких ответов быть не должно.
+Лимиты увеличены в SPEEDUP раз, чтобы тесты занимали секунды.
+"""
+import asyncio
+import time
+from telegram.error import RetryAfter
+
+from bot.utils.rate_limiter import FloodControlLimiter, PRIORITY_DIALOG, PRIORITY_ANALYTICS
+
+SPEEDUP = 10
+GLOBAL_RATE = 30 * SPEEDUP
+CHAT_RATE = 1 * SPEEDUP
+CHAT_BURST = 3
+# Очередь настраивается чуть ниже лимитов сервера, чтобы сетевые задержки не приводили к RetryAfter
+SAFETY = 0.9
+
+
+class FakeTelegram:
+    """Поддельный Bot API с корзинами токенов на чат и общей."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.sent = []
+        self.flood_errors = 0
+
+    def _take(self, key, rate, capacity, now):
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            return False
+        self.buckets[key] = (tokens - 1, now)
+        return True
+
+    async def call(self, endpoint, chat_id, text):
+        """Принимает запрос или отвечает RetryAfter, как сервер Telegram."""
+        await asyncio.sleep(0.001)
+        now = time.monotonic()
+        if not self._take('global', GLOBAL_RATE, GLOBAL_RATE, now) or \
+                not self._take(chat_id, CHAT_RATE, CHAT_BURST, now):
+            self.flood_errors += 1
+            raise RetryAfter(1)
+        self.sent.append((endpoint, chat_id, text, now))
+        return {'ok': True, 'text': text}
+
+
+def make_limiter(**kwargs):
+    """Очередь с лимитами чуть ниже лимитов поддельного сервера."""
+    limits = dict(global_rate=GLOBAL_RATE * SAFETY, chat_rate=CHAT_RATE * SAFETY, chat_burst=CHAT_BURST,
+                  group_rate=CHAT_RATE * SAFETY, max_retries=3)
+    limits.update(kwargs)
+    return FloodControlLimiter(**limits)
+
+
+def run(scenario, **kwargs):
+    """Запускает сценарий с инициализированной очередью."""
+    async def main():
+        limiter = make_limiter(**kwargs)
+        await limiter.initialize()
+        try:
+            return await scenario(limiter)
+        finally:
+            await limiter.shutdown()
+    return asyncio.run(main())
+
+
+async def send(telegram, limiter, endpoint, chat_id, text, priority=None, message_id=None):
+    """Отправляет запрос через очередь; возвращает ответ или ошибку RetryAfter."""
+    data = {'chat_id': chat_id}
+    if message_id is not None:
+        data['message_id'] = message_id
+    rate_limit_args = {'priority': priority} if priority is not None else None
+    try:
+        return await limiter.process_request(
+            telegram.call, (endpoint, chat_id, text), {}, endpoint, data, rate_limit_args
+        )
+    except RetryAfter as e:
+        return e
+
+
+def test_global_rate():
+    """Сообщения во много чатов уходят не быстрее общего лимита и без RetryAfter."""
+    messages = int(GLOBAL_RATE * 1.5)
+
+    async def scenario(limiter):
+        telegram = FakeTelegram()
+        started = time.monotonic()
+        results = await asyncio.gather(*[
+            send(telegram, limiter, 'sendMessage', chat_id, "hello") for chat_id in range(1, messages + 1)
+        ])
+        return telegram, results, time.monotonic() - started
+
+    telegram, results, elapsed = run(scenario)
+    assert not any(isinstance(result, RetryAfter) for result in results)
+    assert telegram.flood_errors == 0
+    assert len(telegram.sent) == messages
+    # Сверх запаса корзины сообщения идут со скоростью общего лимита
+    assert elapsed >= (messages - GLOBAL_RATE * SAFETY) / (GLOBAL_RATE * SAFETY) * 0.9
+
+
+def test_chat_rate():
+    """Сообщения в один чат уходят пачкой не больше CHAT_BURST, дальше - не быстрее лимита чата."""
+    messages = 10
+
+    async def scenario(limiter):
+        telegram = FakeTelegram()
+        results = await asyncio.gather(*[
+            send(telegram, limiter, 'sendMessage', 7, f"message {i}") for i in range(messages)
+        ])
+        return telegram, results
+
+    telegram, results = run(scenario)
+    assert telegram.flood_errors == 0
+    assert [result['text'] for result in results] == [f"message {i}" for i in range(messages)]
+    times = [sent for _, _, _, sent in telegram.sent]
+    interval = 1 / (CHAT_RATE * SAFETY)
+    for earlier, later in zip(times[CHAT_BURST - 1:], times[CHAT_BURST:]):
+        assert later - earlier >= interval * 0.9
+
+
+def test_priority():
+    """Сообщения диалога уходят раньше выгрузки аналитики, поставленной одновременно с ними."""
+    async def scenario(limiter):
+        telegram = FakeTelegram()
+        tasks = [send(telegram, limiter, 'sendMessage', chat_id, f"dialog {step}", PRIORITY_DIALOG)
+                 for chat_id in range(1, 201) for step in range(3)]
+        tasks += [send(telegram, limiter, 'sendMessage', 1000 + part, f"analytics {part}", PRIORITY_ANALYTICS)
+                  for part in range(20)]
+        await asyncio.gather(*tasks)
+        return telegram
+
+    telegram = run(scenario)
+    assert telegram.flood_errors == 0
+    texts = [text for _, _, text, _ in telegram.sent]
+    first_analytics = min(i for i, text in enumerate(texts) if text.startswith('analytics'))
+    assert all(text.startswith('analytics') for text in texts[first_analytics:])
+
+
+def test_edits_merged():
+    """Быстрые правки одного сообщения сливаются: уходит последняя, ответ получают все отправители."""
+    async def scenario(limiter):
+        telegram = FakeTelegram()
+        # Первые правки забирают запас чата, остальные ждут очереди и сливаются
+        results = await asyncio.gather(*[
+            send(telegram, limiter, 'editMessageText', 7, f"page {page}", message_id=42) for page in range(10)
+        ])
+        return telegram, results, limiter.stats()
+
+    telegram, results, stats = run(scenario)
+    assert all(not isinstance(result, RetryAfter) for result in results)
+    assert len(telegram.sent) < len(results)
+    assert telegram.sent[-1][2] == "page 9" and results[-1]['text'] == "page 9"
+    assert stats['merged'] == len(results) - len(telegram.sent)
+
+
+def test_merged_edit_survives_cancelled_newer():
+    """Если отправитель новой правки перестал ждать, слитая с ней старая правка отправляется сама."""
+    async def scenario(limiter):
+        telegram = FakeTelegram()
+        # Забираем запас чата, чтобы правки ждали в очереди
+        await asyncio.gather(*[send(telegram, limiter, 'sendMessage', 7, "fill") for _ in range(CHAT_BURST)])
+        older = asyncio.create_task(send(telegram, limiter, 'editMessageText', 7, "older", message_id=42))
+        await asyncio.sleep(0)
+        newer = asyncio.create_task(send(telegram, limiter, 'editMessageText', 7, "newer", message_id=42))
+        await asyncio.sleep(0)
+        newer.cancel()
+        return await older, newer.cancelled(), telegram
+
+    older, newer_cancelled, telegram = run(scenario)
+    assert newer_cancelled
+    assert older == {'ok': True, 'text': "older"}
+    assert telegram.sent[-1][2] == "older"
+
+
+def test_retry_after_backs_off():
+    """После RetryAfter запрос повторяется не раньше указанной паузы, и пауза действует на все чаты."""
+    pause = 0.3
+
+    async def scenario(limiter):
+        attempts = []
+
+        async def flaky(text):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RetryAfter(pause)
+            return {'ok': True, 'text': text}
+
+        async def other(text):
+            return time.monotonic()
+
+        started = time.monotonic()
+        retried = asyncio.create_task(
+            limiter.process_request(flaky, ("hello",), {}, 'sendMessage', {'chat_id': 99}, None)
+        )
+        while not attempts:
+            await asyncio.sleep(0.01)
+        other_sent = await limiter.process_request(other, ("hi",), {}, 'sendMessage', {'chat_id': 100}, None)
+        result = await retried
+        return attempts, started, other_sent, result, limiter.stats()
+
+    attempts, started, other_sent, result, stats = run(scenario)
+    assert result == {'ok': True, 'text': "hello"}
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= pause * 0.95
+    assert other_sent - started >= pause * 0.95, "пауза RetryAfter должна задерживать и другие чаты"
+    assert stats['retries'] == 1
+
+
+def test_retry_after_gives_up():
+    """После max_retries повторов отправитель получает RetryAfter."""
+    async def scenario(limiter):
+        calls = []
+
+        async def flooded():
+            calls.append(1)
+            raise RetryAfter(0.01)
+
+        try:
+            await limiter.process_request(flooded, (), {}, 'sendMessage', {'chat_id': 5}, None)
+        except RetryAfter:
+            return len(calls)
+        return None
+
+    assert run(scenario, max_retries=2) == 3
+
+
+def test_idle_chat_buckets_swept(monkeypatch):
+    """Корзины чатов, давно не получавших сообщений, удаляются."""
+    monkeypatch.setattr(FloodControlLimiter, 'BUCKET_SWEEP_INTERVAL', 0.1)
+
+    async def scenario(limiter):
+        telegram = FakeTelegram()
+        await asyncio.gather(*[send(telegram, limiter, 'sendMessage', chat_id, "hello") for chat_id in range(1, 51)])
+        before = limiter.stats()['chat_buckets']
+        # Корзины наполняются за 1 / CHAT_RATE с, после этого очистка их удаляет
+        await asyncio.sleep(1 / (CHAT_RATE * SAFETY) + 0.2)
+        await send(telegram, limiter, 'sendMessage', 1000, "hello")
+        return before, limiter.stats()['chat_buckets']
+
+    before, after = run(scenario)
+    assert before == 50
+    assert after <= 1
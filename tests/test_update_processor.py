@@ -0,0 +1,134 @@
+"""Проверка ChatOrderedUpdateProcessor: порядок обновлений внутри чата и параллельность разных чатов."""
+import asyncio
+import random
+from datetime import datetime
+from telegram import Chat, Message, Update, User
+
+from bot.config import CONCURRENT_UPDATES
+from bot.utils.update_processor import ChatOrderedUpdateProcessor
+
+CHATS = 40
+UPDATES_PER_CHAT = 10
+
+
+def make_update(update_id, chat_id, text):
+    """Собирает обновление с текстовым сообщением из указанного чата."""
+    user = User(id=chat_id, first_name="Кандидат", is_bot=False)
+    message = Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        from_user=user, text=text
+    )
+    return Update(update_id=update_id, message=message)
+
+
+def mixed_updates():
+    """Обновления разных чатов вперемешку, внутри чата - по порядку номеров."""
+    updates = [chat_id for _ in range(UPDATES_PER_CHAT) for chat_id in range(1, CHATS + 1)]
+    random.shuffle(updates)
+    counters = {}
+    result = []
+    for chat_id in updates:
+        seq = counters.get(chat_id, 0)
+        counters[chat_id] = seq + 1
+        result.append(make_update(len(result) + 1, chat_id, str(seq)))
+    return result
+
+
+async def process_all(processor, updates, handler):
+    """Как и Application, создает задачу на каждое обновление в порядке поступления."""
+    await asyncio.gather(*[
+        asyncio.create_task(processor.process_update(update, handler(update))) for update in updates
+    ])
+
+
+def test_updates_of_one_chat_in_order():
+    """Обновления одного чата обрабатываются строго по очереди, даже если обработчики идут разное время."""
+    handled = {}
+    running_in_chat = set()
+    overlaps = []
+
+    async def handler(update):
+        chat_id = update.effective_chat.id
+        if chat_id in running_in_chat:
+            overlaps.append(chat_id)
+        running_in_chat.add(chat_id)
+        await asyncio.sleep(random.uniform(0.001, 0.01))
+        handled.setdefault(chat_id, []).append(int(update.message.text))
+        running_in_chat.discard(chat_id)
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(CONCURRENT_UPDATES)
+        await process_all(processor, mixed_updates(), handler)
+        return processor.stats()
+
+    stats = asyncio.run(main())
+    assert not overlaps
+    assert len(handled) == CHATS
+    assert all(seqs == list(range(UPDATES_PER_CHAT)) for seqs in handled.values())
+    # Очереди завершившихся чатов не остаются в памяти
+    assert stats['chats'] == 0 and stats['running'] == 0
+
+
+def test_chats_run_concurrently_up_to_limit():
+    """Обработчики разных чатов выполняются одновременно, но не больше CONCURRENT_UPDATES."""
+    running = 0
+    peak = 0
+
+    async def handler(update):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(CONCURRENT_UPDATES)
+        await process_all(processor, mixed_updates(), handler)
+
+    asyncio.run(main())
+    assert peak == min(CONCURRENT_UPDATES, CHATS)
+
+
+def test_slow_chat_does_not_block_others():
+    """Медленный обработчик одного чата не задерживает остальные чаты."""
+    finished = []
+
+    async def handler(update):
+        chat_id = update.effective_chat.id
+        await asyncio.sleep(0.3 if chat_id == 1 else 0.001)
+        finished.append(chat_id)
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(CONCURRENT_UPDATES)
+        updates = [make_update(1, 1, "0")] + [make_update(i, i, "0") for i in range(2, CHATS + 1)]
+        await process_all(processor, updates, handler)
+
+    asyncio.run(main())
+    assert finished[-1] == 1 and len(finished) == CHATS
+
+
+def test_run_in_chat_waits_for_chat_queue():
+    """run_in_chat выполняется после принятых обновлений чата, не дожидаясь других чатов."""
+    events = []
+
+    async def handler(update):
+        await asyncio.sleep(0.05)
+        events.append(('update', update.effective_chat.id))
+
+    async def bot_action(chat_id):
+        events.append(('action', chat_id))
+        return chat_id
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(CONCURRENT_UPDATES)
+        tasks = [asyncio.create_task(processor.process_update(update, handler(update)))
+                 for update in (make_update(1, 1, "0"), make_update(2, 2, "0"))]
+        await asyncio.sleep(0)
+        result = await processor.run_in_chat(1, bot_action(1))
+        await asyncio.gather(*tasks)
+        return result, processor.stats()
+
+    result, stats = asyncio.run(main())
+    assert result == 1
+    assert events.index(('update', 1)) < events.index(('action', 1))
+    assert stats['chats'] == 0
@@ -0,0 +1,108 @@
+"""Проверка каталога вакансий: перечитывание по отпечатку источника и стабильные ID."""
+import json
+import os
+import time
+
+from bot.config import DEFAULT_VACANCIES
+from bot.database.vacancies import VacancyCatalog
+
+
+def vacancy(title, vacancy_id=None):
+    """Вакансия с обязательными для текста списка полями."""
+    data = {'title': title, 'description': f"Описание: {title}", 'salary': "по договоренности"}
+    if vacancy_id is not None:
+        data['id'] = vacancy_id
+    return data
+
+
+class Source:
+    """Источник вакансий в памяти с версией в качестве отпечатка."""
+
+    def __init__(self, vacancies):
+        self.vacancies = vacancies
+        self.version = 0
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return list(self.vacancies)
+
+    def signature(self):
+        return self.version
+
+    def update(self, vacancies):
+        self.vacancies = vacancies
+        self.version += 1
+
+
+def test_reload_only_when_signature_changes():
+    """Каталог перечитывает источник только при смене отпечатка и не чаще check_interval."""
+    source = Source([vacancy("Python-разработчик", 1)])
+    catalog = VacancyCatalog(source.load, source.signature, check_interval=0.05)
+
+    for _ in range(5):
+        assert [v['title'] for v in catalog.get_all()] == ["Python-разработчик"]
+    time.sleep(0.06)
+    catalog.get_all()
+    assert source.loads == 1
+
+    source.update([vacancy("Python-разработчик", 1), vacancy("Тестировщик", 2)])
+    # Пока интервал проверки не истек, изменения источника не видны
+    assert catalog.get(2) is None
+    time.sleep(0.06)
+    assert catalog.get(2)['title'] == "Тестировщик"
+    assert source.loads == 2 and catalog.stats() == {'vacancies': 2, 'reloads': 2}
+    assert "2. Тестировщик" in catalog.get_listing_text()
+
+
+def test_ids_are_stable_across_reorder_and_insert():
+    """ID вакансии не зависит от ее положения: после вставки и перестановки она находится по тому же ID."""
+    source = Source([vacancy("Python-разработчик", 10), vacancy("Дизайнер")])
+    catalog = VacancyCatalog(source.load, source.signature, check_interval=0)
+    designer_id = catalog.find("Дизайнер")
+    assert catalog.get(10)['title'] == "Python-разработчик"
+    assert designer_id == VacancyCatalog.vacancy_id(vacancy("Дизайнер"))
+
+    source.update([vacancy("Аналитик", 3), vacancy("Дизайнер"), vacancy("Python-разработчик", 10)])
+    assert catalog.get(10)['title'] == "Python-разработчик"
+    assert catalog.get(designer_id)['title'] == "Дизайнер"
+    assert catalog.find("Аналитик") == 3
+
+
+def test_duplicate_ids_and_titles_keep_first_vacancy():
+    """При повторе ID или названия по ним доступна первая вакансия списка."""
+    source = Source([vacancy("Python-разработчик", 1), vacancy("Тестировщик", 1), vacancy("Python-разработчик", 2)])
+    catalog = VacancyCatalog(source.load, source.signature, check_interval=0)
+
+    assert catalog.get(1)['title'] == "Python-разработчик"
+    assert catalog.find("Python-разработчик") == 1
+    assert catalog.get(2)['title'] == "Python-разработчик"
+
+
+def test_empty_source_and_listeners():
+    """Пустой источник заменяется примерами, подписчики получают каждый перечитанный список."""
+    source = Source([])
+    catalog = VacancyCatalog(source.load, source.signature, check_interval=0)
+    received = []
+    catalog.add_listener(lambda vacancies: received.append([v['title'] for v in vacancies]))
+    assert received == [[v['title'] for v in DEFAULT_VACANCIES]]
+
+    source.update([vacancy("Тестировщик", 2)])
+    catalog.refresh()
+    assert received[-1] == ["Тестировщик"]
+    assert len(received) == 2
+
+
+def test_file_source_reloads_after_edit(tmp_path):
+    """Каталог с файловым источником видит правку файла, в том числе атомарную замену."""
+    path = tmp_path / "vacancies.json"
+    path.write_text(json.dumps([vacancy("Python-разработчик", 1)]), encoding='utf-8')
+    catalog = VacancyCatalog(lambda: json.loads(path.read_text(encoding='utf-8')),
+                             lambda: VacancyCatalog.file_signature(str(path)), check_interval=0)
+    assert catalog.get(1)['title'] == "Python-разработчик"
+
+    replacement = tmp_path / "vacancies.json.tmp"
+    replacement.write_text(json.dumps([vacancy("Python-разработчик", 1), vacancy("Тестировщик", 2)]), encoding='utf-8')
+    os.replace(replacement, path)
+    assert catalog.get(2)['title'] == "Тестировщик"
+    assert catalog.stats()['reloads'] == 2
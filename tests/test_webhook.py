@@ -0,0 +1,94 @@
+"""Проверка WebhookServer: обновления принимаются локальными POST-запросами на свободный порт."""
+import asyncio
+import json
+from types import SimpleNamespace
+from telegram import Bot, Update
+
+from bot.webhook import WebhookServer
+
+SECRET = "random-secret"
+PATH = "/telegram"
+
+# Записанное обновление с командой из личного чата
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1, "date": 1700000000,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "/vacancies"
+    }
+}
+
+
+async def post(port, body, secret=None, path=PATH, content_length=None):
+    """Отправляет POST-запрос и возвращает код ответа."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    headers = [f"POST {path} HTTP/1.1", "Host: localhost", "Content-Type: application/json",
+               f"Content-Length: {len(body) if content_length is None else content_length}"]
+    if secret is not None:
+        headers.append(f"X-Telegram-Bot-Api-Secret-Token: {secret}")
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+def run(scenario):
+    """Запускает сервер на свободном порту и выполняет сценарий."""
+    async def main():
+        application = SimpleNamespace(bot=Bot("1:offline"), update_queue=asyncio.Queue())
+        server = WebhookServer(application, '127.0.0.1', 0, PATH, secret_token=SECRET)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(port, application.update_queue), server
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+def test_update_with_secret_is_queued():
+    """Обновление с верным секретом попадает в очередь приложения."""
+    async def scenario(port, queue):
+        status = await post(port, json.dumps(UPDATE).encode(), SECRET)
+        return status, queue.get_nowait()
+
+    (status, update), server = run(scenario)
+    assert status == 200
+    assert isinstance(update, Update) and update.update_id == 1 and update.message.text == "/vacancies"
+    assert server.received == 1 and server.rejected == 0
+
+
+def test_wrong_or_missing_secret_rejected():
+    """Запрос с неверным секретом или без него получает 403, и в очередь ничего не попадает."""
+    async def scenario(port, queue):
+        body = json.dumps(UPDATE).encode()
+        return [await post(port, body, "wrong"), await post(port, body)], queue.qsize()
+
+    (statuses, queued), server = run(scenario)
+    assert statuses == [403, 403]
+    assert queued == 0
+    assert server.received == 0 and server.rejected == 2
+
+
+def test_malformed_body_rejected_without_crash():
+    """Некорректное тело получает 4xx, а сервер продолжает принимать обновления."""
+    async def scenario(port, queue):
+        statuses = [
+            await post(port, b"{not json", SECRET),
+            await post(port, b"[1, 2]", SECRET),
+            await post(port, b"{}", SECRET, content_length="abc"),
+            await post(port, b"{}", SECRET, content_length=WebhookServer.MAX_BODY_SIZE + 1),
+            await post(port, json.dumps(UPDATE).encode(), SECRET, path="/other"),
+        ]
+        queued_before = queue.qsize()
+        statuses.append(await post(port, json.dumps(UPDATE).encode(), SECRET))
+        return statuses, queued_before, queue.qsize()
+
+    (statuses, queued_before, queued_after), server = run(scenario)
+    assert all(400 <= status < 500 for status in statuses[:-1])
+    assert statuses[-1] == 200
+    assert queued_before == 0 and queued_after == 1
@@ -0,0 +1,88 @@
+"""Проверка отложенной записи: неудачная запись, повтор пакета и откат изменений в памяти."""
+import threading
+import time
+
+import pytest
+
+from bot.database.storage import DataStorage
+from bot.database.write_behind import WriteBehindWriter
+
+
+class FlakyFlush:
+    """Функция записи, которая завершается неудачей заданное число раз."""
+
+    def __init__(self, failures, error=None):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            if self.error:
+                raise self.error
+            return False
+        return True
+
+
+def make_writer(flush_func, max_delay):
+    """Писатель с собственной блокировкой, не зарегистрированный в хранилище."""
+    return WriteBehindWriter(flush_func, max_delay, threading.RLock())
+
+
+@pytest.mark.parametrize('error', [None, OSError("диск недоступен")])
+def test_sync_failure_is_reported_and_not_carried_over(error):
+    """Без задержки неудачная запись возвращает False, и пакет не переносится на следующую запись."""
+    flush_func = FlakyFlush(failures=1, error=error)
+    writer = make_writer(flush_func, 0)
+
+    assert writer.write() is False
+    assert writer.stats()['pending'] == 0 and writer.stats()['failed_flushes'] == 1
+
+    assert writer.write() is True
+    stats = writer.stats()
+    assert stats['flushes'] == 1 and stats['last_batch_size'] == 1 and stats['pending'] == 0
+
+
+def test_batched_failure_keeps_changes_and_retries():
+    """С задержкой неудачный пакет остается в памяти и записывается в следующем окне вместе с новыми изменениями."""
+    flush_func = FlakyFlush(failures=1)
+    writer = make_writer(flush_func, 0.05)
+
+    assert writer.write() is True
+    assert writer.write() is True
+    time.sleep(0.08)
+    assert flush_func.calls == 1 and writer.stats()['pending'] == 2
+
+    writer.write()
+    time.sleep(0.08)
+    stats = writer.stats()
+    assert flush_func.calls == 2
+    assert stats['pending'] == 0 and stats['last_batch_size'] == 3 and stats['failed_flushes'] == 1
+
+
+def test_flush_writes_pending_batch_immediately():
+    """flush записывает накопленный пакет, не дожидаясь таймера."""
+    flush_func = FlakyFlush(failures=0)
+    writer = make_writer(flush_func, 60)
+    for _ in range(5):
+        writer.write()
+
+    assert flush_func.calls == 0
+    assert writer.flush() is True
+    assert flush_func.calls == 1 and writer.stats()['max_batch_size'] == 5
+    assert writer._timer is None
+
+
+def test_failed_sync_write_rolls_back_cache(storage, monkeypatch):
+    """Если запись на диск не удалась, добавленный кандидат не остается в памяти."""
+    monkeypatch.setattr(DataStorage, '_writer', make_writer(DataStorage._flush_candidates, 0))
+    assert storage.add_candidate({'name': "Сохраненный", 'status': 'new'})
+
+    monkeypatch.setattr(DataStorage, 'save_data', staticmethod(lambda filename, data: False))
+    monkeypatch.setattr(DataStorage._journal, 'append', lambda op, **payload: False)
+    monkeypatch.setattr(DataStorage._sqlite, 'add_candidate', lambda data: False)
+    assert not storage.add_candidate({'name': "Потерянный", 'status': 'new'})
+
+    assert [c['name'] for c in storage.get_candidates()] == ["Сохраненный"]
+    assert not DataStorage._cache.pinned